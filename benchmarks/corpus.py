@@ -0,0 +1,124 @@
+# Synthetic near duplicate corpora for benchmarking.
+# Authors: Justin Boylan-Toomey
+
+from itertools import combinations
+import numpy as np
+
+
+def generate_corpus(
+        n_documents,
+        duplicate_rate=0.1,
+        jaccard=0.8,
+        words=200,
+        vocabulary=100_000,
+        seed=0
+):
+    """ Generates a seeded corpus of random texts and near duplicates of them.
+
+    Original texts are sequences of words drawn uniformly from a random
+    vocabulary, so distinct originals share almost no shingles. Near duplicates
+    copy an earlier original, replacing a contiguous span of its words with new
+    words, such that the fraction of shared words matches the target Jaccard
+    similarity. Shingles overlapping the edges of the span also differ, so the
+    Jaccard similarity of shingles is slightly lower than the target, use
+    exact_jaccard to measure it.
+
+    Args:
+        n_documents (int): Number of texts to generate.
+        duplicate_rate (float): Probability of each text being a near duplicate.
+        jaccard (float, tuple): Target Jaccard similarity of near duplicates to
+            their original, or a (low, high) range to draw it uniformly from.
+        words (int): Number of words in each text.
+        vocabulary (int): Number of distinct words.
+        seed (int): Seed of the random state used to generate the corpus.
+
+    Returns:
+        List: Generated texts.
+        np.array: Index of the original each text copies, equal to its own index
+            for original texts.
+
+    """
+    if not 0 <= duplicate_rate < 1:
+        raise ValueError(
+            'duplicate_rate must be at least 0 and less than 1.'
+        )
+    random_state = np.random.RandomState(seed)
+    vocabulary = np.array([
+        '{:08x}'.format(word) for word in random_state.randint(
+            0, 1 << 32, size=vocabulary, dtype=np.uint64
+        )
+    ])
+    texts = []
+    sources = np.arange(n_documents)
+    originals = []
+    for i in range(n_documents):
+        document = random_state.randint(0, len(vocabulary), size=words)
+        if originals and random_state.random_sample() < duplicate_rate:
+            source = originals[random_state.randint(len(originals))]
+            if isinstance(jaccard, tuple):
+                similarity = random_state.uniform(*jaccard)
+            else:
+                similarity = jaccard
+            # Replacing n of w words leaves a Jaccard similarity of (w-n)/(w+n).
+            n_replaced = int(round(words * (1 - similarity) / (1 + similarity)))
+            start = random_state.randint(words - n_replaced + 1)
+            replaced = document[:n_replaced]
+            document = texts[source].split()
+            document[start:start + n_replaced] = vocabulary[replaced]
+            sources[i] = source
+        else:
+            document = vocabulary[document]
+            originals.append(i)
+        texts.append(' '.join(document))
+    return texts, sources
+
+
+def exact_jaccard(shingles, texts, pairs):
+    """ Calculates the exact Jaccard similarity of pairs of texts.
+
+    Args:
+        shingles (function): Function returning the set of shingles of a text.
+        texts (list): List of texts.
+        pairs (iterable): Iterable of (index, index) tuples of texts to compare.
+
+    Returns:
+        np.array: Jaccard similarity of each pair.
+
+    """
+    shingle_sets = {}
+    similarities = []
+    for first, second in pairs:
+        for index in [first, second]:
+            if index not in shingle_sets:
+                shingle_sets[index] = shingles(texts[index])
+        first, second = shingle_sets[first], shingle_sets[second]
+        similarities.append(len(first & second) / len(first | second))
+    return np.array(similarities)
+
+
+def duplicate_pairs(shingles, texts, sources, threshold):
+    """ Returns pairs of generated texts with Jaccard similarity of at least threshold.
+
+    Only texts copied from the same original are compared, texts of different
+    originals share almost no shingles.
+
+    Args:
+        shingles (function): Function returning the set of shingles of a text.
+        texts (list): List of texts returned by generate_corpus.
+        sources (np.array): Index of the original each text copies.
+        threshold (float): Minimum Jaccard similarity of returned pairs.
+
+    Returns:
+        Set: (larger, smaller) tuples of indexes of near duplicate texts.
+
+    """
+    groups = {}
+    for index, source in enumerate(sources.tolist()):
+        groups.setdefault(source, []).append(index)
+    pairs = [
+        (second, first)
+        for group in groups.values() if len(group) > 1
+        for first, second in combinations(group, 2)
+    ]
+    similarities = exact_jaccard(shingles, texts, pairs)
+    return {pair for pair, similarity in zip(pairs, similarities) if similarity >= threshold}
@@ -0,0 +1,294 @@
+# Throughput, memory and accuracy benchmarks of MinHash and LSH.
+# Authors: Justin Boylan-Toomey
+
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+from snapy import MinHash, MinHasher, LSH
+from .corpus import generate_corpus, duplicate_pairs, exact_jaccard
+
+METHODS = ['multi_hash', 'k_smallest_values', 'universal_hash', 'one_permutation']
+
+
+def _measure(function, setup=None, memory=True):
+    """ Times a function and measures its peak memory allocation.
+
+    The function is timed without tracing allocations, which slows down Python
+    code, then run again with tracemalloc to measure its peak memory.
+
+    Args:
+        function (function): Function to benchmark, called with the result of setup.
+        setup (function): Function returning fresh state for each run, not timed.
+        memory (bool): If False peak memory is not measured.
+
+    Returns:
+        Any: Result of the timed run.
+        float: Seconds taken by the timed run.
+        float: Peak memory allocated in MB, None if not measured.
+
+    """
+    state = setup() if setup else None
+    start = time.perf_counter()
+    result = function(state)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        state = setup() if setup else None
+        tracemalloc.start()
+        function(state)
+        peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _accuracy(edges, truth, shingles, texts, threshold):
+    """ Calculates recall and precision of LSH edges against exact Jaccard similarity.
+
+    Args:
+        edges (list): (larger, smaller) tuples of text indexes returned by LSH.
+        truth (set): (larger, smaller) tuples of near duplicate text indexes.
+        shingles (function): Function returning the set of shingles of a text.
+        texts (list): List of texts.
+        threshold (float): Jaccard similarity of near duplicates.
+
+    Returns:
+        float: Fraction of near duplicate pairs returned.
+        float: Fraction of returned pairs which are near duplicates.
+
+    """
+    edges = [edge[:2] for edge in edges]
+    recall = len(truth.intersection(edges)) / len(truth) if truth else 1.0
+    precision = 1.0
+    if edges:
+        precision = float(np.mean(exact_jaccard(shingles, texts, edges) >= threshold))
+    return recall, precision
+
+
+def benchmark_minhash(texts, methods, hash_bits, n_gram_types, memory=True):
+    """ Benchmarks signing texts with each MinHash method, hash size and n gram type.
+
+    Args:
+        texts (list): List of texts to sign.
+        methods (list): MinHash methods to benchmark.
+        hash_bits (list): Hash sizes to benchmark.
+        n_gram_types (list): N gram types to benchmark.
+        memory (bool): If False peak memory is not measured.
+
+    Returns:
+        List: Dictionary of results for each benchmark.
+
+    """
+    results = []
+    for method in methods:
+        for bits in hash_bits:
+            if method in ['universal_hash', 'one_permutation'] and bits == 128:
+                continue
+            for n_gram_type in n_gram_types:
+                n_gram = 9 if n_gram_type == 'char' else 2
+                _, seconds, peak = _measure(
+                    lambda state: MinHash(
+                        texts,
+                        n_gram=n_gram,
+                        n_gram_type=n_gram_type,
+                        hash_bits=bits,
+                        method=method,
+                        seed=1
+                    ),
+                    memory=memory
+                )
+                results.append({
+                    'benchmark': 'minhash',
+                    'params': '{} {} bit {}'.format(method, bits, n_gram_type),
+                    'documents': len(texts),
+                    'seconds': seconds,
+                    'docs_per_sec': len(texts) / seconds,
+                    'peak_mb': peak
+                })
+    return results
+
+
+def benchmark_lsh(
+        texts,
+        sources,
+        storages,
+        threshold=0.8,
+        n_queries=1000,
+        store_signatures=False,
+        memory=True
+):
+    """ Benchmarks building, querying and removing from LSH models.
+
+    Recall and precision of edge lists are measured against pairs of texts with
+    an exact Jaccard similarity of at least threshold.
+
+    Args:
+        texts (list): List of texts returned by generate_corpus.
+        sources (np.array): Index of the original each text copies.
+        storages (list): LSH storages to benchmark.
+        threshold (float): Jaccard similarity of near duplicates, used to select
+            the number of bands.
+        n_queries (int): Number of labels queried and removed.
+        store_signatures (bool): If True models store signatures, verifying
+            candidates by estimated Jaccard similarity.
+        memory (bool): If False peak memory is not measured.
+
+    Returns:
+        List: Dictionary of results for each benchmark.
+
+    """
+    minhash = MinHash(texts, method='universal_hash', seed=1)
+    labels = list(range(len(texts)))
+    queries = np.random.RandomState(0).choice(
+        labels, size=min(n_queries, len(labels)), replace=False
+    ).tolist()
+
+    def shingles(text):
+        return set(next(MinHasher()._k_shingles([text])))
+
+    truth = duplicate_pairs(shingles, texts, sources, threshold)
+    results = []
+    for storage in storages:
+
+        def build(state):
+            return LSH(
+                minhash,
+                labels,
+                threshold=threshold,
+                storage=storage,
+                store_signatures=store_signatures
+            )
+
+        lsh, seconds, peak = _measure(build, memory=memory)
+        steps = [
+            ('build', len(labels), seconds, peak, None),
+        ]
+        benchmarks = [
+            ('query', len(queries), lambda state: [lsh.query(label) for label in queries]),
+            ('query_many', len(queries), lambda state: lsh.query_many(queries)),
+            ('adjacency_list', len(labels), lambda state: lsh.adjacency_list()),
+            ('edge_list', len(labels), lambda state: lsh.edge_list()),
+            (
+                'edge_list min_jaccard',
+                len(labels),
+                lambda state: lsh.edge_list(min_jaccard=threshold)
+            ),
+        ]
+        for name, documents, function in benchmarks:
+            result, seconds, peak = _measure(function, memory=memory)
+            accuracy = None
+            if name.startswith('edge_list'):
+                accuracy = _accuracy(result, truth, shingles, texts, threshold)
+            steps.append((name, documents, seconds, peak, accuracy))
+
+        def remove(state):
+            for label in queries:
+                state.remove(label)
+
+        _, seconds, peak = _measure(remove, setup=lambda: build(None), memory=memory)
+        steps.append(('remove', len(queries), seconds, peak, None))
+        for name, documents, seconds, peak, accuracy in steps:
+            result = {
+                'benchmark': name,
+                'params': '{} storage, {} bands'.format(storage, lsh.no_of_bands),
+                'documents': documents,
+                'seconds': seconds,
+                'docs_per_sec': documents / seconds,
+                'peak_mb': peak
+            }
+            if accuracy:
+                result['recall'], result['precision'] = accuracy
+            results.append(result)
+    return results
+
+
+def _format_results(results):
+    """ Formats benchmark results as a table.
+
+    Args:
+        results (list): Dictionary of results for each benchmark.
+
+    Returns:
+        str: Table of results.
+
+    """
+    rows = [['benchmark', 'params', 'documents', 'docs/sec', 'peak MB', 'recall', 'precision']]
+    for result in results:
+        rows.append([
+            result['benchmark'],
+            result['params'],
+            str(result['documents']),
+            '{:.0f}'.format(result['docs_per_sec']),
+            '-' if result['peak_mb'] is None else '{:.1f}'.format(result['peak_mb']),
+            '{:.3f}'.format(result['recall']) if 'recall' in result else '-',
+            '{:.3f}'.format(result['precision']) if 'precision' in result else '-'
+        ])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return '\n'.join(
+        '  '.join(value.ljust(width) for value, width in zip(row, widths))
+        for row in rows
+    )
+
+
+def main(argv=None):
+    """ Runs the benchmarks selected by command line arguments.
+
+    Args:
+        argv (list): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        List: Dictionary of results for each benchmark.
+
+    """
+    parser = argparse.ArgumentParser(description='Benchmark SnaPy MinHash and LSH.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--benchmarks', nargs='+', default=['minhash', 'lsh'],
+                        choices=['minhash', 'lsh'])
+    parser.add_argument('--methods', nargs='+', default=METHODS, choices=METHODS)
+    parser.add_argument('--hash-bits', type=int, nargs='+', default=[32, 64, 128])
+    parser.add_argument('--n-gram-types', nargs='+', default=['char', 'term'],
+                        choices=['char', 'term'])
+    parser.add_argument('--minhash-documents', type=int, default=200,
+                        help='Maximum number of texts signed by each MinHash benchmark.')
+    parser.add_argument('--storages', nargs='+', default=['dict', 'array'],
+                        choices=['dict', 'array', 'sqlite'])
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--jaccard', type=float, nargs='+', default=[0.6, 1.0],
+                        help='Jaccard similarity of near duplicates, or a low and high range.')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--store-signatures', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true',
+                        help='Skip measuring peak memory, halving the run time.')
+    parser.add_argument('--output', help='Path of JSON file to write results to.')
+    args = parser.parse_args(argv)
+    jaccard = args.jaccard[0] if len(args.jaccard) == 1 else tuple(args.jaccard[:2])
+    results = []
+    for size in args.sizes:
+        texts, sources = generate_corpus(
+            size,
+            duplicate_rate=args.duplicate_rate,
+            jaccard=jaccard,
+            seed=args.seed
+        )
+        if 'minhash' in args.benchmarks:
+            results += benchmark_minhash(
+                texts[:args.minhash_documents], args.methods, args.hash_bits, args.n_gram_types,
+                memory=not args.no_memory
+            )
+        if 'lsh' in args.benchmarks:
+            results += benchmark_lsh(
+                texts, sources, args.storages, args.threshold, args.queries,
+                args.store_signatures, memory=not args.no_memory
+            )
+    print(_format_results(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,7 @@ setup(
     url='https://github.com/justinnbt/SnaPy',
     packages=['snapy'],
     install_requires=['numpy'],
+    python_requires='>=3.7',
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',
@@ -1,3 +1,6 @@
-# __init__.py
-from .minhash import MinHash
-from .lsh import LSH
+from .minhash import MinHash, MinHasher
+from .lsh import LSH, optimal_bands
+from .sharded import ShardedLSH
+from .stats import Stats
+from .storage import BaseStorage, SQLiteStorage
+from .concurrency import ConcurrentLSH, AsyncQueryBatcher
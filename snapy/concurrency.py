@@ -0,0 +1,330 @@
+# Classes for querying LSH models from many threads and asyncio tasks.
+# Authors: Justin Boylan-Toomey
+
+from contextlib import contextmanager
+from functools import wraps
+import asyncio
+import threading
+import numpy as np
+from .lsh import LSH
+
+
+class _RWLock:
+    """ Readers-writer lock allowing many readers or one writer at a time.
+
+    Waiting writers block new readers, so a steady stream of queries cannot starve
+    updates. The lock is re-entrant, a thread holding it may acquire it again and
+    the writer may also read, but a reader cannot upgrade to a writer.
+
+    """
+
+    def __init__(self):
+        """ Initialize an unlocked lock. """
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer = None
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    @contextmanager
+    def read_locked(self):
+        """ Holds the lock for reading while the enclosed block runs. """
+        depth = getattr(self._local, 'depth', 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write_locked(self):
+        """ Holds the lock for writing while the enclosed block runs. """
+        if self._writer == threading.get_ident():
+            yield
+            return
+        if getattr(self._local, 'depth', 0):
+            raise RuntimeError(
+                'Cannot acquire the write lock while holding the read lock.'
+            )
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = threading.get_ident()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writer = None
+                self._condition.notify_all()
+
+
+def _read_locked(method):
+    """ Wraps an LSH method to run while holding the model's read lock. """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.read_locked():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+def _write_locked(method):
+    """ Wraps an LSH method to run while holding the model's write lock. """
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock.write_locked():
+            return method(self, *args, **kwargs)
+    return locked
+
+
+class ConcurrentLSH(LSH):
+    """ Locality Sensitive Hashing safe to query and update from many threads.
+
+    Guards an LSH model with a readers-writer lock, so any number of threads can
+    query the model at once, while updates and removals wait for running queries
+    to finish and hold the model exclusively. Methods generating edges, clusters
+    or bucket statistics, and save, also hold the model exclusively as they may
+    compact array storage. iter_edges returns an iterator over edges generated
+    while holding the lock. Parameters, attributes and results are the same as
+    for LSH.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        """ Initialize the lock and the LSH model, see LSH for arguments. """
+        self._lock = _RWLock()
+        super().__init__(*args, **kwargs)
+
+    update = _write_locked(LSH.update)
+    update_unique = _write_locked(LSH.update_unique)
+    merge = _write_locked(LSH.merge)
+    remove = _write_locked(LSH.remove)
+    query = _read_locked(LSH.query)
+    query_many = _read_locked(LSH.query_many)
+    query_signatures = _read_locked(LSH.query_signatures)
+    query_topk = _read_locked(LSH.query_topk)
+    contains = _read_locked(LSH.contains)
+    adjacency_list = _read_locked(LSH.adjacency_list)
+    memory_usage = _read_locked(LSH.memory_usage)
+    bucket_size_histogram = _write_locked(LSH.bucket_size_histogram)
+    edge_arrays = _write_locked(LSH.edge_arrays)
+    edge_list = _write_locked(LSH.edge_list)
+    clusters = _write_locked(LSH.clusters)
+    save = _write_locked(LSH.save)
+
+    @_write_locked
+    def iter_edges(self, min_jaccard=0, jaccard_weighted=False, sensitivity=1):
+        """ Returns an iterator over relationship pairs between related texts.
+
+        All edges are generated while holding the lock, so later updates do not
+        affect iteration.
+
+        Args:
+            min_jaccard (float): Minimum Jaccard Similarity for relationship to be returned.
+            jaccard_weighted (bool): If True yield 3 tuples including the relationship
+                pairs and their associated Jaccard similarity.
+            sensitivity (int): Number of unique buckets two ids must co-occur for relationship
+                to be returned.
+
+        Returns:
+            Iterator: 2 tuple relationship pairs between texts, optionally a weighted
+                3 tuple.
+
+        """
+        return iter(list(
+            super().iter_edges(min_jaccard, jaccard_weighted, sensitivity)
+        ))
+
+
+class AsyncQueryBatcher:
+    """ Batches concurrent single text queries from asyncio tasks.
+
+    Queries arriving together are gathered into one batch, signed at once by the
+    minhasher and looked up with a single call to query_signatures in a worker
+    thread, keeping the event loop responsive. While a batch runs, new queries
+    queue up to form the next batch, so batches grow with load and latency stays
+    close to that of one batch. Use with ConcurrentLSH if the model is updated
+    while queries run.
+
+    Attributes:
+        lsh (LSH): Model queried, an LSH, ConcurrentLSH or ShardedLSH object.
+        minhasher (MinHasher): Object used to sign query texts.
+        max_batch_size (int): Maximum number of texts queried at once.
+        max_delay (float): Seconds waited for more queries before running a batch
+            smaller than max_batch_size.
+
+    """
+
+    def __init__(
+            self,
+            lsh,
+            minhasher,
+            max_batch_size=256,
+            max_delay=0.001,
+            min_jaccard=None,
+            sensitivity=1,
+            executor=None
+    ):
+        """ Initialize the batcher, which starts with the first query.
+
+        Args:
+            lsh (LSH): Model to query, an LSH, ConcurrentLSH or ShardedLSH object.
+            minhasher (MinHasher): MinHasher or MinHash object compatible with the
+                model, used to sign query texts.
+            max_batch_size (int): Maximum number of texts queried at once.
+            max_delay (float): Seconds waited for more queries before running a
+                batch smaller than max_batch_size, 0 runs queries waiting at the
+                time immediately.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned
+                as near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to
+                be considered a near duplicate pair.
+            executor (concurrent.futures.Executor): Executor running batches, the
+                event loop's default executor if None.
+
+        """
+        if max_batch_size < 1:
+            raise ValueError(
+                'max_batch_size must be a positive integer.'
+            )
+        if lsh.fingerprint is not None and lsh.fingerprint != minhasher.fingerprint:
+            raise ValueError(
+                'MinHash parameters and seed must match those used to build LSH model.'
+            )
+        self.lsh = lsh
+        self.minhasher = minhasher
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.min_jaccard = min_jaccard
+        self.sensitivity = sensitivity
+        self._executor = executor
+        self._queue = None
+        self._task = None
+        self._batch = []
+        self._closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def query(self, text):
+        """ Returns near duplicates from the model for a new text.
+
+        Args:
+            text (str): Text content of document.
+
+        Returns:
+            List: Candidate duplicates for the text.
+
+        """
+        if self._closed:
+            raise ValueError(
+                'AsyncQueryBatcher is closed.'
+            )
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.ensure_future(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    def _query_batch(self, texts):
+        """ Signs and queries a batch of texts.
+
+        If signing the batch fails, texts are signed one at a time, so a text which
+        cannot be signed, such as one shorter than n_gram, only fails its own query.
+
+        Args:
+            texts (list): Texts to query.
+
+        Returns:
+            List: List of candidate duplicates for each text, or the exception raised
+                signing it.
+
+        """
+        try:
+            signatures = self.minhasher.transform(texts)
+            errors = [None] * len(texts)
+        except Exception:
+            signatures = []
+            errors = []
+            for text in texts:
+                try:
+                    signatures.append(self.minhasher.transform_one(text))
+                    errors.append(None)
+                except Exception as error:
+                    errors.append(error)
+            if not signatures:
+                return errors
+            signatures = np.stack(signatures)
+        results = iter(self.lsh.query_signatures(
+            signatures, min_jaccard=self.min_jaccard, sensitivity=self.sensitivity
+        ))
+        return [next(results) if error is None else error for error in errors]
+
+    async def _run(self):
+        """ Gathers queued queries into batches and resolves them. """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_delay and self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_delay)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            self._batch = batch
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._query_batch, [text for text, _ in batch]
+                )
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def close(self):
+        """ Stops batching, queries still waiting for results raise a ValueError. """
+        self._closed = True
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future in pending:
+            if not future.done():
+                future.set_exception(ValueError('AsyncQueryBatcher is closed.'))
@@ -1,9 +1,212 @@
 # Class for generating a similarity model from Minhash signature matrices using LSH.
 # Authors: Justin Boylan-Toomey
 
-from collections import defaultdict
+from collections import Counter
+from itertools import islice
+import json
+import os
 import numpy as np
-from copy import copy
+from .minhash import _mix64
+from .stats import _timer
+from .storage import (
+    SignatureStorage, SQLiteStorage, _create_storage, _storage_class, _json_default
+)
+
+# Offset mixed with each band index to seed the hash of that band's rows.
+_BAND_SEED = np.uint64(0x9E3779B97F4A7C15)
+# Maximum number of candidate pairs held in memory while generating edges.
+_PAIR_BLOCK_SIZE = 1 << 24
+# Minimum number of candidates re-ranked by query_topk, also at least 10 * k.
+_TOPK_CANDIDATES = 100
+# Number of pairs of signatures compared at once when weighting edges.
+_VERIFY_CHUNK_SIZE = 1 << 14
+# Number of texts whose buckets are read at once by batch queries.
+_QUERY_BLOCK_SIZE = 1024
+
+
+def _hash_bands(signatures, permutations, total_bands):
+    """ Hashes the bands of every signature to 64 bit bucket ids at once.
+
+    Signatures are split into total_bands bands of consecutive permutations, if
+    permutations is not divisible by total_bands the first bands hold one extra
+    permutation. The values in each band are folded into a 64 bit key seeded by
+    the band index, so equal values in different bands map to different buckets.
+
+    Args:
+        signatures (np.array): MinHash signature Matrix.
+        permutations (int): Number of permutations in each signature.
+        total_bands (int): Number of bands to break signatures into.
+
+    Returns:
+        np.array: np.uint64 matrix of bucket ids, one row per signature and one
+            column per band.
+
+    """
+    signatures = np.asarray(signatures)
+    if signatures.dtype.names:
+        # 128 bit signatures are split into their 64 bit words.
+        words = np.stack([
+            signatures[name].astype(np.uint64) for name in signatures.dtype.names
+        ], axis=-1)
+    else:
+        words = signatures.astype(np.uint64)[..., np.newaxis]
+    n_signatures, _, n_words = words.shape
+    rows, extra_rows = divmod(permutations, total_bands)
+    bucket_ids = np.empty((n_signatures, total_bands), dtype=np.uint64)
+    band, column = 0, 0
+    # Bands with an extra row come first, followed by the remaining bands.
+    for no_of_bands, band_rows in [
+        (extra_rows, rows + 1), (total_bands - extra_rows, rows)
+    ]:
+        if not no_of_bands:
+            continue
+        values = words[:, column:column + no_of_bands * band_rows].reshape(
+            n_signatures, no_of_bands, band_rows * n_words
+        )
+        keys = np.broadcast_to(
+            _mix64(np.arange(band, band + no_of_bands, dtype=np.uint64) + _BAND_SEED),
+            (n_signatures, no_of_bands)
+        )
+        for position in range(band_rows * n_words):
+            keys = _mix64(keys ^ values[:, :, position])
+        bucket_ids[:, band:band + no_of_bands] = keys
+        band += no_of_bands
+        column += no_of_bands * band_rows
+    return bucket_ids
+
+
+def _filter_candidates(candidates, label, sensitivity, jaccard, no_of_bands):
+    """ Applies thresholds to the number of buckets shared with candidate duplicates.
+
+    Args:
+        candidates (dict): Number of shared buckets for each candidate label.
+        label (str, int, float): Text label, None if the text is not in the model.
+        sensitivity (int): Number of identical buckets two ids must occur
+            in to be considered a near duplicate pair.
+        jaccard (float): Minimum Jaccard Similarity for documents to be
+            counted as near duplicates.
+        no_of_bands (int): Number of bands in the model.
+
+    Returns:
+        List: Near duplicate document ids.
+
+    """
+    # Skip the text itself, which occurs in all of its own buckets.
+    if label is not None:
+        candidates.pop(label, None)
+    # Apply sensitivity threshold.
+    if sensitivity > 1:
+        for key in list(candidates):
+            if candidates[key] < sensitivity:
+                del candidates[key]
+    # Apply Jaccard threshold and unzip pairs.
+    if jaccard:
+        for key in list(candidates):
+            jaccard_ratio = candidates[key] / no_of_bands
+            if jaccard_ratio < jaccard:
+                del candidates[key]
+    candidates = list(candidates)
+    return candidates
+
+
+def _integrate(function, start, stop, steps=1000):
+    """ Integrates a function of Jaccard similarity with the trapezoidal rule.
+
+    Args:
+        function (callable): Function mapping an array of similarities to an array
+            with one row per similarity.
+        start (float): Lower bound.
+        stop (float): Upper bound.
+        steps (int): Number of trapezoids.
+
+    Returns:
+        np.array: Integral of each column.
+
+    """
+    values = function(np.linspace(start, stop, steps + 1)[:, np.newaxis])
+    return (values.sum(axis=0) - (values[0] + values[-1]) / 2) * (stop - start) / steps
+
+
+def optimal_bands(
+        threshold,
+        permutations,
+        false_positive_weight=0.5,
+        false_negative_weight=0.5
+):
+    """ Selects the number of bands best separating texts around a Jaccard threshold.
+
+    Texts sharing at least one bucket are candidates, so the probability texts with
+    Jaccard similarity s become candidates follows an S-curve,
+    1 - (1 - s ** rows) ** bands. The false positive rate is the area under the
+    curve below the threshold and the false negative rate the area above the curve
+    above the threshold. Returns the number of bands minimising their weighted sum,
+    with bands of uneven rows when permutations is not divisible by bands.
+
+    Args:
+        threshold (float): Target Jaccard similarity threshold.
+        permutations (int): Number of permutations in MinHash signatures.
+        false_positive_weight (float): Weight of the false positive rate.
+        false_negative_weight (float): Weight of the false negative rate.
+
+    Returns:
+        Tuple: Number of bands, number of rows in the smallest bands and expected
+            candidate rate, the fraction of pairs of texts returned as candidates if
+            their similarities were uniformly distributed.
+
+    """
+    if not 0 < threshold < 1:
+        raise ValueError(
+            'threshold must be between 0 and 1.'
+        )
+    bands = np.arange(1, permutations + 1)
+    rows, extra_rows = np.divmod(permutations, bands)
+
+    def candidate_probability(similarity):
+        return 1 - (
+            (1 - similarity ** (rows + 1)) ** extra_rows
+            * (1 - similarity ** rows) ** (bands - extra_rows)
+        )
+
+    false_positives = _integrate(candidate_probability, 0, threshold)
+    false_negatives = _integrate(
+        lambda similarity: 1 - candidate_probability(similarity), threshold, 1
+    )
+    best = np.argmin(
+        false_positive_weight * false_positives + false_negative_weight * false_negatives
+    )
+    candidate_rate = false_positives[best] + (1 - threshold) - false_negatives[best]
+    return int(bands[best]), int(rows[best]), float(candidate_rate)
+
+
+def _union(parents, first, second):
+    """ Merges the sets of pairs of nodes of an array-backed union-find.
+
+    All pairs are merged at once, pointing the larger root of each pair to the
+    smaller root and compressing paths by pointer jumping, until every pair shares
+    a root. Each set is rooted at its smallest node.
+
+    Args:
+        parents (np.array): np.int64 parent of each node, updated in place.
+        first (np.array): np.int64 first node of each pair.
+        second (np.array): np.int64 second node of each pair.
+
+    """
+    while len(first):
+        # Compress paths so every node points to its root.
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                break
+            parents[:] = grandparents
+        first_roots, second_roots = parents[first], parents[second]
+        different = first_roots != second_roots
+        first, second = first[different], second[different]
+        first_roots, second_roots = first_roots[different], second_roots[different]
+        np.minimum.at(
+            parents,
+            np.maximum(first_roots, second_roots),
+            np.minimum(first_roots, second_roots)
+        )
 
 
 class LSH:
@@ -11,33 +214,96 @@ class LSH:
 
     Attributes:
         no_of_bands (int): Number of bands used in model.
+        threshold (float): Target Jaccard similarity used to select the number of
+            bands, None if not used.
+        max_bucket_size (int): Maximum number of labels in a bucket, None if
+            unlimited.
+        bucket_policy (str): Policy applied to buckets exceeding max_bucket_size.
+        capped_buckets (dict): Total number of labels hashed to each bucket which
+            exceeded max_bucket_size.
         permutations (int): Number of permutations used in MinHash.
+        fingerprint (str): Fingerprint of the MinHash parameters and seeds used to
+            generate signatures in the model, None if unknown.
+        minhash_params (dict): Parameters of the MinHash object used to generate
+            signatures in the model, None if unknown.
+        stats (Stats): Stats object collecting timings and query counters, None if
+            not collected.
 
     """
 
-    def __init__(self, minhash=None, labels=None, no_of_bands=None):
+    def __init__(
+            self,
+            minhash=None,
+            labels=None,
+            no_of_bands=None,
+            storage='dict',
+            threshold=None,
+            store_signatures=False,
+            max_bucket_size=None,
+            bucket_policy='stop',
+            stats=None
+    ):
         """ Initialize the LSH object.
 
         Args:
-            minhash (np.array): Object returned by MinHash class.
+            minhash (MinHash, iterable): Object returned by MinHash class, or an
+                iterable of signature blocks as yielded by MinHash.iter_signatures.
             labels (list, np.array): Iterable, array or pandas series containing labels.
             no_of_bands (int): Number of bands to break minhash signature into.
+            storage (str, BaseStorage): Bucket storage, must be dict to store
+                buckets as dictionaries of lists, array to store them in compact
+                NumPy arrays for large models, sqlite to store them in a temporary
+                SQLite database on disk for models larger than memory, or a storage
+                object such as SQLiteStorage opened on a database file.
+            threshold (float): Target Jaccard similarity, used instead of
+                no_of_bands to select the number of bands with optimal_bands.
+            store_signatures (bool): If True store signatures alongside buckets, to
+                rank candidates by estimated Jaccard similarity with query_topk.
+            max_bucket_size (int): Maximum number of labels in a bucket, bounding
+                the cost of queries when boilerplate shared by many texts fills
+                buckets.
+            bucket_policy (str): Policy for buckets exceeding max_bucket_size, must
+                be stop to keep the first labels hashed to the bucket, sample to keep
+                a uniform random sample of them, or skip to empty the bucket so it is
+                ignored by queries.
+            stats (Stats): If provided, time spent hashing bands, storing buckets
+                and finding candidates, and the number of candidates examined and
+                returned by queries, is recorded to this Stats object.
 
         """
+        if no_of_bands and threshold:
+            raise ValueError(
+                'Only one of no_of_bands and threshold can be provided.'
+            )
+        if bucket_policy not in ['stop', 'sample', 'skip']:
+            raise ValueError(
+                'Only "stop", "sample" and "skip" bucket policies are supported.'
+            )
+        if max_bucket_size is not None and max_bucket_size < 1:
+            raise ValueError(
+                'max_bucket_size must be a positive integer.'
+            )
         # Create default variables
         self.no_of_bands = no_of_bands
-        self._buckets = defaultdict(list)
-        self._i_bucket = defaultdict(list)
+        self.threshold = threshold
+        self._storage = _create_storage(storage)
         self.permutations = None
+        self.fingerprint = None
+        self.minhash_params = None
+        self._signatures = SignatureStorage() if store_signatures else None
+        self.max_bucket_size = max_bucket_size
+        self.bucket_policy = bucket_policy
+        self.capped_buckets = {}
+        self._random_state = np.random.RandomState(0)
+        self.stats = stats
         # Run methods if minhash and labels provided
-        if minhash and labels:
-            self.permutations = minhash.permutations
-            self._lsh(minhash.signatures, labels)
-        elif minhash:
+        if minhash is not None and labels is not None:
+            self.update(minhash, labels)
+        elif minhash is not None:
             raise ValueError(
                 'labels cannot be None if LSH initialised with minhash object.'
             )
-        elif labels:
+        elif labels is not None:
             raise ValueError(
                 'minhash object cannot be None if LSH initialised with labels.'
             )
@@ -50,83 +316,481 @@ class LSH:
             labels (list): List of labels for MinHash signatures.
 
         """
+        self._set_bands()
+        bucket_ids = self._band_keys(signatures)
+        with _timer(self.stats, 'lsh.storage_add'):
+            self._storage.add(labels, bucket_ids)
+        with _timer(self.stats, 'lsh.cap_buckets'):
+            self._cap_buckets(bucket_ids)
+        if self._signatures is not None:
+            with _timer(self.stats, 'lsh.signatures_add'):
+                self._signatures.add(labels, np.asarray(signatures))
+
+    def _set_bands(self):
+        """ Sets the default number of bands and checks it against permutations. """
         if not self.no_of_bands:
-            self.no_of_bands = self.permutations // 2
-        for label, signature in zip(labels, signatures):
-            bands = np.hsplit(
-                np.array(signature), self.no_of_bands
+            if self.threshold:
+                self.no_of_bands = optimal_bands(self.threshold, self.permutations)[0]
+            else:
+                self.no_of_bands = self.permutations // 2
+        if self.no_of_bands > self.permutations:
+            raise ValueError(
+                'Number of bands must be <= number of permutations.'
             )
-            for band in bands:
-                bucket_id = hash(tuple(band))
-                self._buckets[bucket_id].append(label)
-                self._i_bucket[label].append(bucket_id)
 
-    def _candidate_duplicates(self, bucket_ids, label, sensitivity, jaccard):
+    def _cap_buckets(self, bucket_ids, indexed=None, totals=None):
+        """ Applies the bucket policy to buckets grown beyond max_bucket_size.
+
+        Args:
+            bucket_ids (np.array): np.uint64 matrix of bucket ids of newly added
+                labels.
+            indexed (np.array): Boolean matrix, False for bucket ids the labels were
+                not added to. Labels were added to all their buckets if None.
+            totals (dict): Total number of labels hashed to each bucket by the newly
+                added labels, where more than were added, such as the capped
+                buckets of a merged model.
+
+        """
+        if not self.max_bucket_size:
+            return
+        if indexed is not None:
+            bucket_ids = bucket_ids[np.asarray(indexed, dtype=bool)]
+        counts = Counter(bucket_ids.ravel().tolist())
+        totals = totals or {}
+        for bucket_id in totals:
+            counts.setdefault(bucket_id, 0)
+        for bucket_id, added in counts.items():
+            size = self._storage.bucket_size(bucket_id)
+            if (
+                size <= self.max_bucket_size
+                and bucket_id not in self.capped_buckets
+                and bucket_id not in totals
+            ):
+                continue
+            labels = list(self._storage.bucket(bucket_id))
+            # Newly added labels are last in the bucket.
+            kept = labels[:size - added]
+            seen = self.capped_buckets.get(bucket_id, size - added)
+            hashed = totals.get(bucket_id, added)
+            self.capped_buckets[bucket_id] = seen + hashed
+            if self.bucket_policy == 'skip':
+                discarded = labels
+            elif self.bucket_policy == 'stop':
+                discarded = labels[self.max_bucket_size:]
+            else:
+                # Reservoir sampling keeps each label with equal probability.
+                discarded = []
+                # Each added label stands for an equal share of the labels hashed.
+                step = hashed / added if added else 0
+                for label in labels[size - added:]:
+                    seen += step
+                    if len(kept) < self.max_bucket_size:
+                        kept.append(label)
+                        continue
+                    position = self._random_state.randint(int(round(seen)))
+                    if position < self.max_bucket_size:
+                        discarded.append(kept[position])
+                        kept[position] = label
+                    else:
+                        discarded.append(label)
+            if discarded:
+                self._storage.discard(bucket_id, discarded)
+
+    @property
+    def _buckets(self):
+        """ Bucket id to labels dictionary of dict storage. """
+        return self._storage._buckets
+
+    @property
+    def _i_bucket(self):
+        """ Label to bucket ids dictionary of dict storage. """
+        return self._storage._i_bucket
+
+    def _band_keys(self, signatures):
+        """ Hashes the bands of every signature to 64 bit bucket ids at once.
+
+        Args:
+            signatures (np.array): MinHash signature Matrix.
+
+        Returns:
+            np.array: np.uint64 matrix of bucket ids, one row per signature and one
+                column per band.
+
+        """
+        with _timer(self.stats, 'lsh.band_hash'):
+            return _hash_bands(signatures, self.permutations, self.no_of_bands)
+
+    def _candidate_duplicates(
+            self,
+            bucket_ids,
+            label,
+            sensitivity,
+            jaccard,
+            signature=None
+    ):
         """ Identify candidate duplicates and check Jaccard Similarity.
 
+        If the model stores signatures, Jaccard Similarity of all candidates is
+        estimated from their signatures at once, otherwise from the fraction of
+        shared buckets.
+
         Args:
             bucket_ids (list): List of bucket ids.
-            label (str, int, float): Text label.
+            label (str, int, float): Text label, None if the text is not in the model.
+            sensitivity (int): Number of identical buckets two ids must occur
+                in to be considered a near duplicate pair.
+            jaccard (float): Minimum Jaccard Similarity for documents to be
+                counted as near duplicates.
+            signature (np.array): Signature of a text not in the model.
+
+        Returns:
+            List: Near duplicate document ids.
+
+        """
+        with _timer(self.stats, 'lsh.bucket_fanout'):
+            candidates = self._storage.bucket_counts(bucket_ids)
+        return self._filter_counts(candidates, label, sensitivity, jaccard, signature)
+
+    def _candidate_duplicates_many(
+            self,
+            bucket_ids,
+            labels,
+            sensitivity,
+            jaccard,
+            signatures=None
+    ):
+        """ Identify candidate duplicates of a batch of texts in blocks.
+
+        Buckets shared by several texts of a block are read from storage once.
+
+        Args:
+            bucket_ids (list): List of bucket ids of each text.
+            labels (list): Label of each text, None for texts not in the model.
+            sensitivity (int): Number of identical buckets two ids must occur
+                in to be considered a near duplicate pair.
+            jaccard (float): Minimum Jaccard Similarity for documents to be
+                counted as near duplicates.
+            signatures (np.array): Signatures of texts not in the model.
+
+        Returns:
+            List: List of near duplicate document ids for each text.
+
+        """
+        duplicates = []
+        for start in range(0, len(bucket_ids), _QUERY_BLOCK_SIZE):
+            stop = start + _QUERY_BLOCK_SIZE
+            with _timer(self.stats, 'lsh.bucket_fanout'):
+                counts = self._storage.bucket_counts_many(bucket_ids[start:stop])
+            for i, candidates in enumerate(counts, start):
+                duplicates.append(self._filter_counts(
+                    candidates,
+                    labels[i],
+                    sensitivity,
+                    jaccard,
+                    None if signatures is None else signatures[i]
+                ))
+        return duplicates
+
+    def _filter_counts(self, candidates, label, sensitivity, jaccard, signature):
+        """ Verifies the candidates of a query, recording stats if enabled.
+
+        Args:
+            candidates (dict): Number of buckets shared with each candidate label.
+            label (str, int, float): Text label, None if the text is not in the model.
+            sensitivity (int): Number of identical buckets two ids must occur
+                in to be considered a near duplicate pair.
+            jaccard (float): Minimum Jaccard Similarity for documents to be
+                counted as near duplicates.
+            signature (np.array): Signature of a text not in the model.
+
+        Returns:
+            List: Near duplicate document ids.
+
+        """
+        if self.stats is None:
+            return self._verify_candidates(
+                candidates, label, sensitivity, jaccard, signature
+            )
+        # Candidates are filtered in place, so count them first.
+        examined = len(candidates) - (label in candidates)
+        with self.stats.timer('lsh.filter'):
+            duplicates = self._verify_candidates(
+                candidates, label, sensitivity, jaccard, signature
+            )
+        self.stats.increment('lsh.queries')
+        self.stats.increment('lsh.candidates_examined', examined)
+        self.stats.increment('lsh.candidates_returned', len(duplicates))
+        return duplicates
+
+    def _verify_candidates(self, candidates, label, sensitivity, jaccard, signature):
+        """ Filters candidates by shared buckets and Jaccard Similarity.
+
+        Args:
+            candidates (dict): Number of buckets shared with each candidate label.
+            label (str, int, float): Text label, None if the text is not in the model.
             sensitivity (int): Number of identical buckets two ids must occur
                 in to be considered a near duplicate pair.
             jaccard (float): Minimum Jaccard Similarity for documents to be
                 counted as near duplicates.
+            signature (np.array): Signature of a text not in the model.
 
         Returns:
             List: Near duplicate document ids.
 
         """
-        candidates = defaultdict(int)
-        # Retrieve candidate duplicate pairs from model.
-        for bucket_id in bucket_ids:
-            matches = copy(self._buckets.get(bucket_id))
-            matches.remove(label)
-            for match in matches:
-                candidates[match] += 1
-        # Apply sensitivity threshold.
-        if sensitivity > 1:
-            for key in list(candidates):
-                if candidates[key] < sensitivity:
-                    del candidates[key]
-        # Apply Jaccard threshold and unzip pairs.
-        if jaccard:
-            for key in list(candidates):
-                jaccard_ratio = candidates[key] / self.no_of_bands
-                if jaccard_ratio < jaccard:
-                    del candidates[key]
-        candidates = list(candidates)
-        return candidates
+        if self._signatures is None or not jaccard:
+            return _filter_candidates(
+                candidates, label, sensitivity, jaccard, self.no_of_bands
+            )
+        candidates = _filter_candidates(
+            candidates, label, sensitivity, None, self.no_of_bands
+        )
+        if not candidates:
+            return candidates
+        if signature is None:
+            signature = self._signatures.get([label])[0]
+        estimates = self._signature_jaccard(self._signatures.get(candidates), signature)
+        return [
+            candidate for candidate, estimate in zip(candidates, estimates.tolist())
+            if estimate >= jaccard
+        ]
+
+    def _signature_jaccard(self, signatures, other_signatures):
+        """ Estimates Jaccard Similarity from the fraction of equal signature values.
+
+        Signatures compressed to b bits collide by chance with probability 2 ** -b,
+        which is corrected for using the b_bits parameter of the MinHash object.
+
+        Args:
+            signatures (np.array): MinHash signature matrix.
+            other_signatures (np.array): Signature, or signature matrix with one row
+                per row of signatures, to compare with.
+
+        Returns:
+            np.array: Estimated Jaccard Similarity for each row of signatures.
+
+        """
+        estimates = np.mean(signatures == other_signatures, axis=-1)
+        b_bits = (self.minhash_params or {}).get('b_bits')
+        if b_bits:
+            collisions = 2.0 ** -b_bits
+            estimates = np.maximum((estimates - collisions) / (1 - collisions), 0)
+        return estimates
 
     def update(self, minhash, new_labels):
         """ Updates LSH object with new MinHash matrix and labels.
 
+        Signatures may be provided as a stream of blocks, for example from
+        MinHash.iter_signatures, in which case the model is updated one block at a
+        time and labels are consumed alongside each block.
+
         Args:
-            minhash (minhash): MinHash object containing new minhash signatures to
-                add to LSH object.
-            new_labels (list): List of new labels to add to LSH object.
+            minhash (MinHash, np.array, iterable): MinHash object containing new
+                minhash signatures to add to LSH object, a signature matrix, or an
+                iterable of signature blocks.
+            new_labels (list, iterable): Labels to add to LSH object.
 
         """
-        if self._i_bucket:
+        fingerprint = None
+        params = None
+        if hasattr(minhash, 'signatures'):
+            if minhash.signatures is None:
+                raise ValueError(
+                    'minhash object does not contain any signatures.'
+                )
+            blocks = [minhash.signatures]
+            fingerprint = minhash.fingerprint
+            params = minhash.get_params()
+        elif isinstance(minhash, np.ndarray) and minhash.ndim == 2:
+            blocks = [minhash]
+        else:
+            blocks = minhash
+        new_labels = iter(new_labels)
+        for signatures in blocks:
+            labels = list(islice(new_labels, len(signatures)))
+            if len(labels) != len(signatures):
+                raise ValueError(
+                    'Number of labels must match number of minhash signatures.'
+                )
+            self._check_update(np.shape(signatures)[1], labels, fingerprint, params)
+            # Update model.
+            self._lsh(signatures, labels)
+
+    def update_unique(self, minhash, new_labels, min_jaccard=None, sensitivity=1):
+        """ Adds only texts which are not near duplicates of texts already in the model.
+
+        Texts are checked and added one at a time, so near duplicates within the new
+        texts are found too, while their band keys are hashed in one pass.
+
+        Args:
+            minhash (MinHash, np.array): MinHash object containing new minhash
+                signatures, or a signature matrix.
+            new_labels (list): Labels of the new texts.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be
+                considered near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: Label of a near duplicate already in the model for each new text,
+                None for texts added to the model.
+
+        """
+        fingerprint = None
+        params = None
+        if hasattr(minhash, 'signatures'):
+            if minhash.signatures is None:
+                raise ValueError(
+                    'minhash object does not contain any signatures.'
+                )
+            signatures = minhash.signatures
+            fingerprint = minhash.fingerprint
+            params = minhash.get_params()
+        else:
+            signatures = np.asarray(minhash)
+        new_labels = list(new_labels)
+        if len(new_labels) != len(signatures):
+            raise ValueError(
+                'Number of labels must match number of minhash signatures.'
+            )
+        self._check_update(np.shape(signatures)[1], new_labels, fingerprint, params)
+        self._set_bands()
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        bucket_ids = self._band_keys(signatures)
+        matches = []
+        for i, label in enumerate(new_labels):
+            candidates = self._candidate_duplicates(
+                bucket_ids[i].tolist(), None, sensitivity, min_jaccard, signatures[i]
+            )
+            if candidates:
+                matches.append(candidates[0])
+                continue
+            self._storage.add([label], bucket_ids[i:i + 1])
+            self._cap_buckets(bucket_ids[i:i + 1])
+            if self._signatures is not None:
+                self._signatures.add([label], signatures[i:i + 1])
+            matches.append(None)
+        return matches
+
+    def _check_update(self, permutations, new_labels, fingerprint=None, params=None):
+        """ Checks new signatures and labels can be added to the model.
+
+        Args:
+            permutations (int): Number of permutations in the new signatures.
+            new_labels (list): List of new labels for MinHash signatures.
+            fingerprint (str): Fingerprint of the MinHash object which generated the
+                signatures, None if unknown.
+            params (dict): Parameters of the MinHash object which generated the
+                signatures, None if unknown.
+
+        """
+        if len(self._storage):
             # Check if texts already exist in model.
-            if set(
-                    self._i_bucket.keys()
-            ).intersection(
-                set(new_labels)
-            ) != set():
+            if any(label in self._storage for label in new_labels):
                 raise ValueError(
                     'At least one provided label already exists in model.'
                 )
-            if self.permutations != minhash.permutations:
+            if self.permutations != permutations:
                 raise ValueError(
                     'Number of permutations in minhash must be {} to match LSH model.'.format(
                         self.permutations
                     )
                 )
+            if fingerprint and self.fingerprint and fingerprint != self.fingerprint:
+                raise ValueError(
+                    'MinHash parameters and seed must match those used to build LSH model.'
+                )
         else:
             # Create parameters for new model.
-            self.permutations = minhash.permutations
-        # Update model.
-        self._lsh(minhash.signatures, new_labels)
+            self.permutations = permutations
+            self.fingerprint = fingerprint
+            self.minhash_params = params
+
+    def merge(self, other):
+        """ Merges the texts of another LSH model into the model.
+
+        Bucket ids of the other model are added in bulk, without rehashing
+        signatures, so models built independently, for example in separate
+        processes, can be combined cheaply.
+
+        Args:
+            other (LSH): Model to merge, built with the same MinHash parameters and
+                number of bands.
+
+        """
+        if not len(other._storage):
+            return
+        if self.no_of_bands and self.no_of_bands != other.no_of_bands:
+            raise ValueError(
+                'Number of bands must be {} to match LSH model.'.format(
+                    self.no_of_bands
+                )
+            )
+        if self._signatures is not None and other._signatures is None:
+            raise ValueError(
+                'Models must both store signatures to be merged.'
+            )
+        labels, bucket_ids, indexed = other._storage.label_bucket_ids()
+        self._check_update(
+            other.permutations, labels, other.fingerprint, other.minhash_params
+        )
+        self.no_of_bands = other.no_of_bands
+        self._storage.add(labels, bucket_ids, indexed)
+        self._cap_buckets(bucket_ids, indexed, other.capped_buckets)
+        if self._signatures is not None:
+            self._signatures.add(labels, other._signatures.get(labels))
+
+    @classmethod
+    def merge_many(cls, models, storage='dict'):
+        """ Returns a new model containing the texts of many LSH models.
+
+        The merged model takes its threshold, signature storage and bucket size
+        limits from the first model.
+
+        Args:
+            models (iterable): LSH models built with the same MinHash parameters and
+                number of bands.
+            storage (str, BaseStorage): Bucket storage of the merged model, see LSH.
+
+        Returns:
+            LSH: Merged model.
+
+        """
+        models = iter(models)
+        first = next(models, None)
+        if first is None:
+            return cls(storage=storage)
+        lsh = cls(
+            storage=storage,
+            store_signatures=first._signatures is not None,
+            max_bucket_size=first.max_bucket_size,
+            bucket_policy=first.bucket_policy
+        )
+        lsh.threshold = first.threshold
+        lsh.merge(first)
+        for model in models:
+            lsh.merge(model)
+        return lsh
+
+    def is_compatible(self, minhash):
+        """ Checks whether signatures from a MinHash object can be added to the model.
+
+        Args:
+            minhash (MinHasher): MinHash or MinHasher object.
+
+        Returns:
+            bool: True if the MinHash parameters and seeds match those used to build
+                the model, or the model is empty.
+
+        """
+        if not len(self._storage):
+            return True
+        if self.permutations != minhash.permutations:
+            return False
+        return not self.fingerprint or self.fingerprint == minhash.fingerprint
 
     def query(self, label, min_jaccard=None, sensitivity=1):
         """ Returns near duplicates from model.
@@ -151,7 +815,7 @@ class LSH:
             raise ValueError(
                 'Sensitivity must be <= no of bands.'
             )
-        buckets = self._i_bucket.get(label)
+        buckets = self._storage.bucket_ids(label)
         if not buckets:
             raise KeyError(
                 'Label {} does not exist in model'.format(label)
@@ -160,6 +824,89 @@ class LSH:
             buckets, label, sensitivity, min_jaccard
         )
 
+    def query_many(self, labels, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicates from model for a batch of labels.
+
+        Bucket ids of the labels are looked up together, and buckets shared by
+        several labels are read once, which is faster than querying each label
+        for storage with costly lookups.
+
+        Args:
+            labels (list): Labels of texts for which to return near duplicates.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: List of candidate duplicates for each provided text label.
+
+        """
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        labels = list(labels)
+        bucket_ids = self._storage.bucket_ids_many(labels)
+        for label, buckets in zip(labels, bucket_ids):
+            if not buckets:
+                raise KeyError(
+                    'Label {} does not exist in model'.format(label)
+                )
+        return self._candidate_duplicates_many(
+            bucket_ids, labels, sensitivity, min_jaccard
+        )
+
+    def query_signatures(self, minhash, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicates from model for new texts, without adding them.
+
+        Args:
+            minhash (MinHash, np.array): MinHash object containing signatures of new
+                texts, or a signature matrix.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: List of candidate duplicates for each signature.
+
+        """
+        if self.permutations is None:
+            raise ValueError(
+                'LSH model does not contain any signatures.'
+            )
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        if hasattr(minhash, 'signatures'):
+            if minhash.signatures is None:
+                raise ValueError(
+                    'minhash object does not contain any signatures.'
+                )
+            if not self.is_compatible(minhash):
+                raise ValueError(
+                    'MinHash parameters and seed must match those used to build LSH model.'
+                )
+            signatures = minhash.signatures
+        else:
+            signatures = minhash
+        if np.shape(signatures)[1] != self.permutations:
+            raise ValueError(
+                'Number of permutations in minhash must be {} to match LSH model.'.format(
+                    self.permutations
+                )
+            )
+        signatures = np.asarray(signatures)
+        return self._candidate_duplicates_many(
+            self._band_keys(signatures).tolist(),
+            [None] * len(signatures),
+            sensitivity,
+            min_jaccard,
+            signatures
+        )
+
     def remove(self, label):
         """ Remove label and associated text signature from model.
 
@@ -167,16 +914,70 @@ class LSH:
             label (str, int, float): Label for text to be removed from model.
 
         """
-        buckets = self._i_bucket.get(label)
-        if not buckets:
+        if label not in self._storage:
             raise KeyError(
                 'Label {} does not exist in model.'.format(label)
             )
-        for bucket in buckets:
-            self._buckets[bucket].remove(label)
-            if not self._buckets[bucket]:
-                del self._buckets[bucket]
-        del self._i_bucket[label]
+        self._storage.remove(label)
+        if self._signatures is not None:
+            self._signatures.remove(label)
+
+    def query_topk(self, query, k=10, max_candidates=None):
+        """ Returns the most similar texts in the model ranked by their signatures.
+
+        Candidates sharing at least one bucket with the query are re-ranked by the
+        fraction of their signature equal to the query signature, an unbiased
+        estimate of Jaccard similarity. Only the max_candidates candidates sharing
+        most buckets are re-ranked, so query time does not grow with the number of
+        candidates. Requires a model created with store_signatures=True.
+
+        Args:
+            query (str, int, float, np.array): Label of a text in the model, or the
+                MinHash signature of a new text.
+            k (int): Number of similar texts to return.
+            max_candidates (int): Maximum number of candidates to re-rank, defaults
+                to the larger of 100 and 10 * k.
+
+        Returns:
+            List: Up to k tuples of label and estimated Jaccard similarity, most
+                similar first.
+
+        """
+        if self._signatures is None:
+            raise ValueError(
+                'LSH model must be created with store_signatures=True to rank texts.'
+            )
+        if isinstance(query, np.ndarray):
+            if np.shape(query) != (self.permutations,):
+                raise ValueError(
+                    'Signature must contain {} permutations to match LSH model.'.format(
+                        self.permutations
+                    )
+                )
+            label = None
+            signature = query
+            buckets = self._band_keys(query[np.newaxis])[0].tolist()
+        else:
+            label = query
+            buckets = self._storage.bucket_ids(label)
+            if not buckets:
+                raise KeyError(
+                    'Label {} does not exist in model'.format(label)
+                )
+            signature = self._signatures.get([label])[0]
+        candidates = self._storage.bucket_counts(buckets)
+        candidates.pop(label, None)
+        labels = list(candidates)
+        max_candidates = max_candidates or max(_TOPK_CANDIDATES, 10 * k)
+        if len(labels) > max_candidates:
+            counts = np.fromiter(candidates.values(), dtype=np.int64, count=len(labels))
+            best = np.argpartition(-counts, max_candidates - 1)[:max_candidates]
+            labels = [labels[i] for i in np.sort(best).tolist()]
+        if not labels:
+            return []
+        jaccard = self._signature_jaccard(self._signatures.get(labels), signature)
+        ranks = np.argsort(-jaccard, kind='stable')[:k]
+        return [(labels[i], float(jaccard[i])) for i in ranks.tolist()]
 
     def contains(self):
         """ Returns a list of all labels contained in the model.
@@ -185,7 +986,49 @@ class LSH:
              List: All labels for texts contained in the model.
 
         """
-        return list(self._i_bucket)
+        return self._storage.labels()
+
+    def bucket_size_histogram(self):
+        """ Returns the distribution of bucket sizes in powers of two.
+
+        If the model has stats, the number of buckets in each bin is also recorded
+        as a lsh.bucket_size.<size> gauge.
+
+        Returns:
+            Dict: Number of non empty buckets holding at least size and fewer than
+                2 * size labels, keyed by size.
+
+        """
+        sizes = self._storage.bucket_sizes()
+        counts = np.bincount(np.log2(sizes).astype(np.int64)) if len(sizes) else []
+        histogram = {
+            1 << power: int(count) for power, count in enumerate(counts) if count
+        }
+        if self.stats is not None:
+            for size, count in histogram.items():
+                self.stats.gauge('lsh.bucket_size.{}'.format(size), count)
+        return histogram
+
+    def memory_usage(self):
+        """ Estimates the memory used by the model, excluding the labels.
+
+        If the model has stats, estimates are also recorded as lsh.memory.<part>
+        gauges.
+
+        Returns:
+            Dict: Estimated size in bytes of the buckets and stored signatures.
+
+        """
+        usage = {
+            'buckets': self._storage.memory_usage(),
+            'signatures': 0
+        }
+        if self._signatures is not None:
+            usage['signatures'] = self._signatures.memory_usage()
+        if self.stats is not None:
+            for part, size in usage.items():
+                self.stats.gauge('lsh.memory.{}'.format(part), size)
+        return usage
 
     def adjacency_list(self, min_jaccard=None, sensitivity=1):
         """ Returns adjacency list.
@@ -210,14 +1053,187 @@ class LSH:
                 'Sensitivity must be <= no of bands.'
             )
         adjacency_list = {}
-        for label in self._i_bucket.keys():
-            buckets = self._i_bucket.get(label)
+        for label in self._storage.labels():
+            buckets = self._storage.bucket_ids(label)
             candidates = self._candidate_duplicates(
                 buckets, label, sensitivity, min_jaccard
             )
             adjacency_list[label] = candidates
         return adjacency_list
 
+    def _edge_blocks(self, min_jaccard, sensitivity):
+        """ Counts the buckets shared by each pair of texts, bucket by bucket.
+
+        Pairs are generated from the contents of each bucket rather than by querying
+        each text, and counted with a vectorized sort over pair keys. Pairs are
+        generated in descending ranges of their larger label id, each holding about
+        _PAIR_BLOCK_SIZE pairs, to bound memory use.
+
+        Args:
+            min_jaccard (float): Minimum Jaccard Similarity for pairs to be returned.
+            sensitivity (int): Number of unique buckets two ids must co-occur in for
+                pairs to be returned.
+
+        Yields:
+            Tuple: np.int64 arrays of larger label ids, smaller label ids, indexing
+                the labels returned by contains, and np.float64 array of estimated
+                Jaccard similarity, ordered by descending larger and ascending
+                smaller label id.
+
+        """
+        labels, offsets, label_ids = self._storage.postings()
+        signatures = None
+        if self._signatures is not None:
+            signatures = self._signatures.get(labels)
+        no_of_labels = len(labels)
+        # Label ids ascend within buckets, so the rank of a posting in its bucket is
+        # the number of smaller label ids it pairs with, found just before it.
+        ranks = np.arange(len(label_ids)) - np.repeat(offsets[:-1], np.diff(offsets))
+        by_label = np.argsort(label_ids, kind='stable')
+        label_starts = np.searchsorted(
+            label_ids[by_label], np.arange(no_of_labels + 1)
+        )
+        pair_counts = np.zeros(no_of_labels + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(label_ids, weights=ranks, minlength=no_of_labels).astype(
+                np.int64
+            ),
+            out=pair_counts[1:]
+        )
+        high = no_of_labels
+        while high > 0:
+            low = np.searchsorted(
+                pair_counts, pair_counts[high] - _PAIR_BLOCK_SIZE, side='left'
+            )
+            low = min(int(low), high - 1)
+            postings = by_label[label_starts[low]:label_starts[high]]
+            postings = postings[ranks[postings] > 0]
+            counts = ranks[postings]
+            larger = np.repeat(label_ids[postings], counts)
+            firsts = np.repeat(postings - counts, counts)
+            steps = np.arange(len(larger)) - np.repeat(np.cumsum(counts) - counts, counts)
+            smaller = label_ids[firsts + steps]
+            # Keys sort pairs by descending larger then ascending smaller id.
+            keys, shared = np.unique(
+                (high - 1 - larger) * no_of_labels + smaller, return_counts=True
+            )
+            keys = keys[shared >= sensitivity]
+            shared = shared[shared >= sensitivity]
+            larger, smaller = high - 1 - keys // no_of_labels, keys % no_of_labels
+            if signatures is None:
+                weights = shared / self.no_of_bands
+            else:
+                weights = np.empty(len(keys))
+                for i in range(0, len(keys), _VERIFY_CHUNK_SIZE):
+                    chunk = slice(i, i + _VERIFY_CHUNK_SIZE)
+                    weights[chunk] = self._signature_jaccard(
+                        signatures[larger[chunk]], signatures[smaller[chunk]]
+                    )
+            if min_jaccard:
+                keep = weights >= min_jaccard
+                larger, smaller, weights = larger[keep], smaller[keep], weights[keep]
+            yield larger, smaller, weights
+            high = low
+
+    def edge_arrays(self, min_jaccard=0, sensitivity=1):
+        """ Returns relationship pairs between related texts as arrays.
+
+        Args:
+            min_jaccard (float): Minimum Jaccard Similarity for relationship to be returned.
+            sensitivity (int): Number of unique buckets two ids must co-occur for relationship
+                to be returned.
+
+        Returns:
+            Tuple: np.int64 arrays of source and destination indices into the labels
+                returned by contains, and np.float64 array of estimated Jaccard
+                similarity of each pair, ordered as edge_list.
+
+        """
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        blocks = list(self._edge_blocks(min_jaccard, sensitivity))
+        if not blocks:
+            return (
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.float64)
+            )
+        src, dst, weight = (np.concatenate(arrays) for arrays in zip(*blocks))
+        return src, dst, weight
+
+    def iter_edges(self, min_jaccard=0, jaccard_weighted=False, sensitivity=1):
+        """ Yields relationship pairs between related texts.
+
+        Generates edges block by block, so edges of large models can be processed
+        without holding the full edge list in memory.
+
+        Args:
+            min_jaccard (float): Minimum Jaccard Similarity for relationship to be returned.
+            jaccard_weighted (bool): If True yield 3 tuples including the relationship
+                pairs and their associated Jaccard similarity.
+            sensitivity (int): Number of unique buckets two ids must co-occur for relationship
+                to be returned.
+
+        Returns:
+            Generator: 2 tuple relationship pairs between texts, optionally a weighted
+                3 tuple.
+
+        """
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        return self._iter_edges(min_jaccard, jaccard_weighted, sensitivity)
+
+    def _iter_edges(self, min_jaccard, jaccard_weighted, sensitivity):
+        """ Yields relationship pairs for iter_edges. """
+        labels = self._storage.labels()
+        for src, dst, weights in self._edge_blocks(min_jaccard, sensitivity):
+            if jaccard_weighted:
+                for i, j, weight in zip(src.tolist(), dst.tolist(), weights.tolist()):
+                    yield labels[i], labels[j], weight
+            else:
+                for i, j in zip(src.tolist(), dst.tolist()):
+                    yield labels[i], labels[j]
+
+    def clusters(self, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicate clusters, the connected components of similar texts.
+
+        Without thresholds texts sharing any bucket are merged straight from the
+        bucket postings, otherwise pairs are merged as generated by edge_arrays.
+        Texts are merged with an array-backed union-find, taking close to linear
+        time and memory.
+
+        Args:
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be merged.
+            sensitivity (int): Number of unique buckets two ids must co-occur in for
+                texts to be merged.
+
+        Returns:
+            np.array: np.int64 cluster id for each label returned by contains, the
+                position of the first label of its cluster.
+
+        """
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+        parents = np.arange(len(self._storage), dtype=np.int64)
+        if min_jaccard or sensitivity > 1:
+            for larger, smaller, _ in self._edge_blocks(min_jaccard, sensitivity):
+                _union(parents, larger, smaller)
+        else:
+            _, offsets, label_ids = self._storage.postings()
+            firsts = np.repeat(label_ids[offsets[:-1]], np.diff(offsets))
+            _union(parents, firsts, label_ids)
+        while True:
+            grandparents = parents[parents]
+            if np.array_equal(grandparents, parents):
+                return parents
+            parents = grandparents
+
     def edge_list(
             self,
             min_jaccard=0,
@@ -226,13 +1242,12 @@ class LSH:
     ):
         """ Returns list of relationship pairs between related texts.
 
-        Iterates over texts to create relationship pairs from hash bucket contents, where
-        relationships are above a certain threshold.
+        Creates relationship pairs from hash bucket contents, where relationships are
+        above a certain threshold. Pairs are ordered by the descending position of
+        their first text and the ascending position of their second text in the model.
 
         Edge list can be used to create an undirected graph, optionally with edges weighted
-        by Jaccard similarity.
-
-        May be slow and scale poorly for larger corpora.
+        by Jaccard similarity. Use iter_edges or edge_arrays for larger corpora.
 
         Args:
             min_jaccard (float): Minimum Jaccard Similarity for relationship to be returned.
@@ -245,39 +1260,85 @@ class LSH:
             List: 2 tuple relationship pairs between texts, optionally a weighted 3 tuple.
 
         """
-        if sensitivity > self.no_of_bands:
-            raise ValueError(
-                'Sensitivity must be <= no of bands.'
+        return list(self.iter_edges(min_jaccard, jaccard_weighted, sensitivity))
+
+    def save(self, path):
+        """ Saves the model to a directory.
+
+        Model parameters are saved to meta.json and buckets as a table of labels
+        and NumPy arrays of bucket ids and postings, which can be memory-mapped
+        when loaded, or for sqlite storage as a buckets.sqlite database. Labels
+        must be strings, numbers, booleans or None.
+
+        Args:
+            path (str): Directory to save model to, created if it does not exist.
+
+        Raises:
+            ValueError: If a label cannot be stored as JSON, such as a tuple.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        meta = {
+            'storage': self._storage.name,
+            'permutations': self.permutations,
+            'no_of_bands': self.no_of_bands,
+            'threshold': self.threshold,
+            'fingerprint': self.fingerprint,
+            'minhash_params': self.minhash_params,
+            'store_signatures': self._signatures is not None,
+            'max_bucket_size': self.max_bucket_size,
+            'bucket_policy': self.bucket_policy,
+            'capped_buckets': list(self.capped_buckets.items())
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, default=_json_default)
+        self._storage.save(path)
+        if self._signatures is not None:
+            self._signatures.save(path, self._storage.labels())
+
+    @classmethod
+    def load(cls, path, mmap=True, storage=None):
+        """ Loads a model saved by LSH.save.
+
+        Args:
+            path (str): Directory to load model from.
+            mmap (bool): If True memory-map the bucket arrays of array storage
+                read-only instead of reading them into memory.
+            storage (str): Bucket storage of the loaded model, must be dict, array
+                or sqlite, defaults to the storage of the saved model. Saved sqlite
+                databases are opened in place when loaded as sqlite storage, and
+                other models are loaded as sqlite storage in a temporary database.
+
+        Returns:
+            LSH: Loaded model.
+
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        storage = storage or meta['storage']
+        if 'sqlite' in [meta['storage'], storage] and storage != meta['storage']:
+            # Convert between formats without reading files other storage left behind.
+            buckets = _create_storage(storage)
+            saved = _storage_class(meta['storage']).load(path, mmap=mmap)
+            if len(saved):
+                buckets.add(*saved.label_bucket_ids())
+            if isinstance(saved, SQLiteStorage):
+                saved.close()
+        else:
+            buckets = _storage_class(storage).load(path, mmap=mmap)
+        lsh = cls(
+            no_of_bands=meta['no_of_bands'],
+            storage=buckets,
+            max_bucket_size=meta['max_bucket_size'],
+            bucket_policy=meta['bucket_policy']
+        )
+        lsh.capped_buckets = dict(meta['capped_buckets'])
+        lsh.threshold = meta['threshold']
+        lsh.permutations = meta['permutations']
+        lsh.fingerprint = meta['fingerprint']
+        lsh.minhash_params = meta['minhash_params']
+        if meta['store_signatures']:
+            lsh._signatures = SignatureStorage.load(
+                path, lsh._storage.labels(), mmap=mmap
             )
-        edges = []
-        labels = list(self._i_bucket)
-        for i in range(len(labels)):
-            candidates = defaultdict(int)
-            label = labels.pop()
-            for bucket in self._i_bucket.get(label):
-                matches = copy(self._buckets.get(bucket))
-                matches.remove(label)
-                for match in matches:
-                    candidates[match] += 1
-            if sensitivity > 1:
-                for key in list(candidates):
-                    if candidates[key] < sensitivity:
-                        del candidates[key]
-            for candidate in list(candidates):
-                if candidate in labels:
-                    if min_jaccard or jaccard_weighted:
-                        jaccard_ratio = candidates[candidate] / self.no_of_bands
-                        if jaccard_ratio >= min_jaccard:
-                            if jaccard_weighted:
-                                edges.append(
-                                    (label, candidate, jaccard_ratio)
-                                )
-                            else:
-                                edges.append(
-                                    (label, candidate)
-                                )
-                    else:
-                        edges.append(
-                            (label, candidate)
-                        )
-        return edges
+        return lsh
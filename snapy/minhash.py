@@ -1,13 +1,154 @@
-# Class for generating a minhash matrix from a text corpus.
+# Classes for generating a minhash matrix from a text corpus.
 # Authors: Justin Boylan-Toomey
 
 import numpy as np
 import mmh3
 import heapq
+import hashlib
+import os
+import multiprocessing
+import time
+from itertools import islice
+from .stats import _timer
 
+# Mersenne prime 2^61 - 1 used as the modulus for universal hash permutations.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_LOW_32_BITS = np.uint64(0xFFFFFFFF)
+_LOW_29_BITS = np.uint64((1 << 29) - 1)
+# Signature dtype for 128 bit hashes, stored as high and low unsigned 64 bit words.
+SIGNATURE_128_DTYPE = np.dtype([('high', np.uint64), ('low', np.uint64)])
+# Number of shingles permuted at once by the universal_hash method, chosen so the
+# intermediate shingles x permutations matrix stays in cache.
+_CHUNK_SIZE = 128
+# Number of texts signed by each worker task when n_jobs > 1.
+_PARALLEL_CHUNK_SIZE = 512
+# Worker process state for parallel signature generation.
+_worker_state = {}
 
-class MinHash:
-    """ MinHash.
+
+def _mod_mersenne(values):
+    """ Reduces unsigned 64 bit integers modulo the Mersenne prime 2^61 - 1.
+
+    Args:
+        values (np.array): Array of np.uint64 values.
+
+    Returns:
+        np.array: Array of np.uint64 values in the range [0, 2^61 - 1).
+
+    """
+    values = (values & _MERSENNE_PRIME) + (values >> np.uint64(61))
+    values[values >= _MERSENNE_PRIME] -= _MERSENNE_PRIME
+    return values
+
+
+def _mersenne_hash(x, a, b):
+    """ Computes (a * x + b) mod 2^61 - 1 without overflowing 64 bit integers.
+
+    Multiplies the 32 bit halves of x by a separately, folding the partial
+    products using 2^61 = 1 (mod 2^61 - 1). All arguments are broadcast
+    against each other.
+
+    Args:
+        x (np.array): np.uint64 values smaller than 2^61 - 1.
+        a (np.array): np.uint64 multipliers smaller than 2^32.
+        b (np.array): np.uint64 increments smaller than 2^61 - 1.
+
+    Returns:
+        np.array: Array of np.uint64 hash values in the range [0, 2^61 - 1).
+
+    """
+    high = a * (x >> np.uint64(32))
+    values = high >> np.uint64(29)
+    high &= _LOW_29_BITS
+    high <<= np.uint64(32)
+    values += high
+    values += b
+    low = a * (x & _LOW_32_BITS)
+    values += low >> np.uint64(61)
+    low &= _MERSENNE_PRIME
+    values += low
+    return _mod_mersenne(values)
+
+
+def _mix64(values):
+    """ Scrambles unsigned 64 bit integers using the splitmix64 finalizer.
+
+    A bijective mixing function where every input bit affects every output bit.
+
+    Args:
+        values (np.array): Array of np.uint64 values.
+
+    Returns:
+        np.array: Array of scrambled np.uint64 values.
+
+    """
+    values = values ^ (values >> np.uint64(30))
+    values *= np.uint64(0xBF58476D1CE4E5B9)
+    values ^= values >> np.uint64(27)
+    values *= np.uint64(0x94D049BB133111EB)
+    values ^= values >> np.uint64(31)
+    return values
+
+
+def _npy_header(dtype, shape, length=None):
+    """ Builds a version 1.0 .npy file header.
+
+    Args:
+        dtype (np.dtype): Array dtype.
+        shape (tuple): Array shape.
+        length (int): Total header length in bytes, padded with spaces. Defaults
+            to the shortest length aligned to 64 bytes.
+
+    Returns:
+        bytes: Header to write at the start of a .npy file.
+
+    """
+    header = repr({
+        'descr': np.lib.format.dtype_to_descr(dtype),
+        'fortran_order': False,
+        'shape': shape
+    }).encode('latin1')
+    if length is None:
+        length = -(-(len(header) + 11) // 64) * 64
+    header = header.ljust(length - 11) + b'\n'
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header
+
+
+def _init_worker(hasher, buffer):
+    """ Stores the MinHash parameters and shared signature matrix in a worker.
+
+    Args:
+        hasher (MinHasher): MinHasher object holding parameters and hash seeds.
+        buffer (multiprocessing.RawArray): Shared memory backing the signatures.
+
+    """
+    _worker_state['hasher'] = hasher
+    _worker_state['signatures'] = np.frombuffer(
+        buffer, dtype=hasher._signature_dtype()
+    ).reshape(-1, hasher.permutations)
+
+
+def _sign_chunk(start, texts):
+    """ Writes signatures for a chunk of texts into the shared signature matrix.
+
+    Args:
+        start (int): Row of the shared signature matrix for the first text.
+        texts (list): Texts to generate signatures for.
+
+    """
+    hasher = _worker_state['hasher']
+    signatures = hasher._min_hash(hasher._k_shingles(texts))
+    _worker_state['signatures'][start:start + len(texts)] = signatures
+
+
+class MinHasher:
+    """ MinHash signature generator.
+
+    Holds MinHash parameters and hash seeds so signatures can be generated for any
+    number of texts, for example one document per request in an online service,
+    with parameters guaranteed identical to an existing LSH model. Seeds are drawn
+    from a private random state so the global NumPy random state is untouched.
+    MinHasher objects can be pickled.
 
     Attributes:
         n_gram (int): Number of characters used in each shingle.
@@ -16,34 +157,50 @@ class MinHash:
         hash_bits (int): Hash value size used to generate signatures.
         method (str): Method used to generate signatures.
         seed (int): Seed used to generate signatures.
-        signatures (np.array): Matrix of minhash signatures, m represents each texts
-            minhash signature with n representing each permutations minimum hash value.
+        n_jobs (int): Number of processes used to generate signatures.
+        b_bits (int): Number of lowest bits kept from each hash value, or None.
+        rolling_hash (bool): Whether shingles are hashed with a rolling hash.
+        stats (Stats): Stats object collecting timings of each stage, None if not
+            collected.
 
     """
 
     def __init__(
             self,
-            text,
             n_gram=9,
             n_gram_type='char',
             permutations=100,
             hash_bits=64,
             method='multi_hash',
-            seed=None
+            seed=None,
+            n_jobs=1,
+            b_bits=None,
+            rolling_hash=False,
+            stats=None
     ):
-        """ Generates a minhash signature matrix for texts in a corpus.
+        """ Generates hash seeds for the provided MinHash parameters.
 
         Args:
-            text (list, np.array): Iterable containing text content of each document.
             n_gram (int): Number of characters to be used in each shingle.
             n_gram_type (str): Type of n gram to use for shingles, must be char or term.
             permutations (int): Number of hash values in each document signature.
             hash_bits (int): Hash value size, must be 32, 64 or 128 bit.
-            method (str): Method to be used for minhash function, must be multi_hash
-                or k_smallest_values.
+            method (str): Method to be used for minhash function, must be multi_hash,
+                k_smallest_values, universal_hash or one_permutation.
             seed (int): Seeds from which to generate random hash function.
+            n_jobs (int): Number of processes used to generate signatures, -1 uses
+                all available cores.
+            b_bits (int): If set only the lowest b bits of each hash value are kept,
+                compressing signatures at the cost of a small loss of accuracy.
+            rolling_hash (bool): If True shingles are hashed directly from each
+                encoded text with a rolling hash instead of creating a string for
+                each shingle, only supported by universal_hash and one_permutation.
+            stats (Stats): If provided, time spent shingling and hashing texts is
+                recorded to this Stats object.
 
         """
+        start = time.perf_counter()
+        self.stats = stats
         self.n_gram = n_gram
         if n_gram_type not in ['char', 'term']:
             raise ValueError(
@@ -56,29 +213,67 @@ class MinHash:
                 'Only 32, 64 and 128 bit hashes are supported.'
             )
         self.hash_bits = hash_bits
+        if b_bits is not None and not 0 < b_bits < min(hash_bits, 65):
+            raise ValueError(
+                'b_bits must be between 1 and {}.'.format(min(hash_bits - 1, 64))
+            )
+        self.b_bits = b_bits
         if method not in [
             'multi_hash',
-            'k_smallest_values'
+            'k_smallest_values',
+            'universal_hash',
+            'one_permutation'
         ]:
             raise ValueError(
-                'Only "multi_hash" and "k_smallest_value" hash methods are supported.'
+                'Only "multi_hash", "k_smallest_value", "universal_hash" and '
+                '"one_permutation" hash methods are supported.'
+            )
+        if method in ['universal_hash', 'one_permutation'] and hash_bits == 128:
+            raise ValueError(
+                'Only 32 and 64 bit hashes are supported by the {} method.'.format(method)
             )
         self.method = method
+        if rolling_hash and method not in ['universal_hash', 'one_permutation']:
+            raise ValueError(
+                'rolling_hash is only supported by the universal_hash and '
+                'one_permutation methods.'
+            )
+        self.rolling_hash = rolling_hash
+        if n_jobs == -1:
+            n_jobs = os.cpu_count()
+        if n_jobs < 1:
+            raise ValueError(
+                'n_jobs must be a positive integer or -1.'
+            )
+        self.n_jobs = n_jobs
         self.seed = None
         if seed:
             self.seed = seed
-            np.random.seed(seed)
+        # Private random state, seeded draws match those of np.random.seed(seed).
+        random_state = np.random.RandomState(self.seed)
         if method == 'multi_hash':
-            self._hash_seeds = np.random.randint(
+            self._hash_seeds = random_state.randint(
                 low=1, high=100_000_000, size=permutations
             )
         else:
-            self._hash_seeds = np.random.randint(
+            self._hash_seeds = random_state.randint(
                 low=1, high=100_000_000
             )
-        # Run methods.
-        self._shingles = self._k_shingles(text)
-        self.signatures = self._min_hash()
+        if method == 'universal_hash':
+            # Coefficients of the a * x + b mod p permutation for each hash.
+            self._permutation_a = random_state.randint(
+                low=1, high=1 << 32, size=permutations, dtype=np.uint64
+            )
+            self._permutation_b = random_state.randint(
+                low=0, high=_MERSENNE_PRIME, size=permutations, dtype=np.uint64
+            )
+        elif method == 'one_permutation':
+            # Seed of the hash choosing bins to copy into empty bins.
+            self._densify_seed = random_state.randint(
+                low=0, high=np.iinfo(np.uint64).max, dtype=np.uint64
+            )
+        if stats is not None:
+            stats.add_time('minhash.init', time.perf_counter() - start)
 
     def _k_shingles(self, texts):
         """ Generates shingles for each input text.
@@ -90,13 +285,17 @@ class MinHash:
             texts (list, np.array): list, array or Pandas series of input texts.
 
         Yields:
-            List: Shingle list generated for each input text.
+            List: Shingle list generated for each input text, or an array of
+                shingle hashes if rolling_hash is used.
 
         """
         trim_overflow = (self.n_gram - 1) * -1
         if type(texts) == str:
             texts = [texts]
         for text in texts:
+            if self.rolling_hash:
+                yield self._rolling_hash(text)
+                continue
             if self.n_gram_type == 'char':
                 shingles = [
                                text[char:char + self.n_gram]
@@ -114,6 +313,49 @@ class MinHash:
                 )
             yield shingles
 
+    def _rolling_hash(self, text):
+        """ Hashes every shingle of a text without creating shingle strings.
+
+        Encodes the text once into an array of character code points, or of
+        hashed terms for term n grams, then computes a polynomial hash modulo
+        2^61 - 1 over every window of n_gram values at once, adding one position
+        of each window at a time.
+
+        Args:
+            text (str): Input text.
+
+        Returns:
+            np.array: np.uint64 hash value of each shingle.
+
+        """
+        if self.n_gram_type == 'char':
+            values = np.frombuffer(
+                text.encode('utf-32-le'), dtype=np.uint32
+            ).astype(np.uint64)
+        else:
+            terms = text.split()
+            values = _mod_mersenne(np.fromiter(
+                (
+                    mmh3.hash64(term, int(self._hash_seeds), signed=False)[0]
+                    for term in terms
+                ),
+                dtype=np.uint64,
+                count=len(terms)
+            ))
+        windows = len(values) - self.n_gram + 1
+        if windows < 1:
+            raise ValueError(
+                'Shingle "n_gram" size must not exceed minimum text length.'
+            )
+        base = np.uint64(self._hash_seeds)
+        hashed_shingles = values[:windows].copy()
+        for offset in range(1, self.n_gram):
+            hashed_shingles = _mersenne_hash(
+                hashed_shingles, base, values[offset:offset + windows]
+            )
+        # Spreads polynomial hashes over all 64 bits.
+        return _mix64(hashed_shingles)
+
     def _multi_hash(self, document):
         """ Generates a texts minhash signature using multi-hash method.
 
@@ -131,25 +373,25 @@ class MinHash:
         """
         signature = []
         for seed in np.nditer(self._hash_seeds):
-            self._min_value = None
+            min_value = None
             for shingle in document:
                 if self.hash_bits == 64:
                     hash_value = mmh3.hash64(
-                        shingle, int(seed)
+                        shingle, int(seed), signed=False
                     )[0]
                 elif self.hash_bits == 32:
                     hash_value = mmh3.hash(
-                        shingle, int(seed)
+                        shingle, int(seed), signed=False
                     )
                 else:
                     hash_value = mmh3.hash128(
                         shingle, int(seed)
                     )
-                if not self._min_value:
-                    self._min_value = hash_value
-                elif self._min_value > hash_value:
-                    self._min_value = hash_value
-            signature.append(self._min_value)
+                if min_value is None:
+                    min_value = hash_value
+                elif min_value > hash_value:
+                    min_value = hash_value
+            signature.append(min_value)
         return signature
 
     def _k_smallest_hash(self, document):
@@ -177,11 +419,11 @@ class MinHash:
         for shingle in document:
             if self.hash_bits == 64:
                 hashed_shingle = mmh3.hash64(
-                    shingle, self._hash_seeds
+                    shingle, self._hash_seeds, signed=False
                 )[0]
             elif self.hash_bits == 32:
                 hashed_shingle = mmh3.hash(
-                    shingle, self._hash_seeds
+                    shingle, self._hash_seeds, signed=False
                 )
             else:
                 hashed_shingle = mmh3.hash128(
@@ -190,20 +432,470 @@ class MinHash:
             heapq.heappush(signature, hashed_shingle)
         return heapq.nsmallest(self.permutations, signature)
 
-    def _min_hash(self):
+    def _hash_shingles(self, document):
+        """ Hashes each shingle once to an unsigned 64 bit integer.
+
+        Args:
+            document (list, np.array): List of text shingles, or shingle hashes
+                if rolling_hash is used.
+
+        Returns:
+            np.array: np.uint64 hash value of each shingle.
+
+        """
+        if self.rolling_hash:
+            return document
+        return np.fromiter(
+            (
+                mmh3.hash64(shingle, int(self._hash_seeds), signed=False)[0]
+                for shingle in document
+            ),
+            dtype=np.uint64,
+            count=len(document)
+        )
+
+    def _universal_hash(self, document):
+        """ Generates a texts minhash signature using universal hash permutations.
+
+        Hashes each shingle once to a 64 bit integer, then simulates each
+        permutation with a universal hash function (a * x + b) mod p applied to all
+        shingle hashes at once, selecting the minimum value for each permutation.
+
+        Produces signatures of the same stability as the multi hash method at a
+        fraction of the cost.
+
+        Args:
+            document (list): List of text shingles.
+
+        Returns:
+            np.array: Text signature generated using universal hash permutations.
+
+        """
+        hashed_shingles = _mod_mersenne(self._hash_shingles(document))
+        signature = np.full(self.permutations, _MERSENNE_PRIME, dtype=np.uint64)
+        # Permutes shingles in chunks to bound the size of the intermediate matrix.
+        for start in range(0, len(hashed_shingles), _CHUNK_SIZE):
+            chunk = hashed_shingles[start:start + _CHUNK_SIZE, np.newaxis]
+            permuted = _mersenne_hash(
+                chunk, self._permutation_a, self._permutation_b
+            )
+            np.minimum(signature, permuted.min(axis=0), out=signature)
+        if self.hash_bits == 32:
+            signature &= _LOW_32_BITS
+        return signature
+
+    def _one_permutation_hash(self, document):
+        """ Generates a texts minhash signature using one permutation hashing.
+
+        Hashes each shingle once and uses the high bits of each hash to assign it
+        to one of permutations bins, keeping the minimum hash in each bin. Bins left
+        empty, common for short texts, are filled using optimal densification: each
+        empty bin copies the minimum of a bin chosen by a hash of the empty bins
+        index and attempt number, retrying until a non empty bin is found.
+
+        As fast as the k smallest hash method, works for texts with fewer shingles
+        than permutations and produces signatures interchangeable with the multi
+        hash method.
+
+        Args:
+            document (list): List of text shingles.
+
+        Returns:
+            np.array: Text signature generated using one permutation hashing.
+
+        """
+        hashed_shingles = self._hash_shingles(document)
+        permutations = np.uint64(self.permutations)
+        bins = ((hashed_shingles >> np.uint64(32)) * permutations) >> np.uint64(32)
+        signature = np.full(self.permutations, np.iinfo(np.uint64).max, dtype=np.uint64)
+        np.minimum.at(signature, bins, hashed_shingles)
+        filled = np.zeros(self.permutations, dtype=bool)
+        filled[bins] = True
+        densified = signature.copy()
+        empty = np.flatnonzero(~filled).astype(np.uint64)
+        attempt = 0
+        while empty.size:
+            attempt += 1
+            # Bins chosen only depend on the seed so are consistent across texts.
+            chosen = _mix64(
+                ((empty << np.uint64(32)) + np.uint64(attempt)) ^ self._densify_seed
+            ) % permutations
+            found = filled[chosen]
+            densified[empty[found]] = signature[chosen[found]]
+            empty = empty[~found]
+        if self.hash_bits == 32:
+            densified &= _LOW_32_BITS
+        return densified
+
+    def _signature_dtype(self):
+        """ Returns the dtype of signatures generated with the selected hash size.
+
+        32 and 64 bit hashes are stored as np.uint32 and np.uint64, 128 bit hashes
+        as a structured dtype of high and low np.uint64 words. When b_bits is set
+        the smallest unsigned integer dtype holding b bits is used.
+
+        Returns:
+            np.dtype: Signature matrix dtype.
+
+        """
+        if self.b_bits:
+            for dtype in [np.uint8, np.uint16, np.uint32, np.uint64]:
+                if self.b_bits <= np.iinfo(dtype).bits:
+                    return np.dtype(dtype)
+        if self.hash_bits == 32:
+            return np.dtype(np.uint32)
+        if self.hash_bits == 64:
+            return np.dtype(np.uint64)
+        return SIGNATURE_128_DTYPE
+
+    def _signature_matrix(self, signatures):
+        """ Converts signatures to a matrix of the signature dtype.
+
+        Args:
+            signatures (list): List of text signatures.
+
+        Returns:
+             np.array: Matrix of minhash signatures.
+
+        """
+        dtype = self._signature_dtype()
+        if self.hash_bits == 128:
+            values = np.array(signatures, dtype=object).reshape(-1, self.permutations)
+            low = (values & 0xFFFFFFFFFFFFFFFF).astype(np.uint64)
+            if self.b_bits:
+                return (low & np.uint64((1 << self.b_bits) - 1)).astype(dtype)
+            matrix = np.empty(values.shape, dtype=dtype)
+            matrix['high'] = (values >> 64).astype(np.uint64)
+            matrix['low'] = low
+            return matrix
+        matrix = np.array(signatures, dtype=np.uint64).reshape(-1, self.permutations)
+        if self.b_bits:
+            matrix &= np.uint64((1 << self.b_bits) - 1)
+        return matrix.astype(dtype)
+
+    def _iter_parallel_min_hash(self, texts, batch_size, copy=True):
+        """ Calculates document signatures using a pool of worker processes.
+
+        Texts are consumed in batches, each batch is split into chunks signed by
+        separate workers which write their rows directly into a preallocated shared
+        memory signature matrix. Produces identical signatures to _min_hash.
+
+        Args:
+            texts (list, np.array, generator): Iterable containing text content of
+                each document.
+            batch_size (int): Number of texts signed in each batch.
+            copy (bool): If False yield views of the shared signature matrix, which
+                are overwritten by the next batch.
+
+        Yields:
+            np.array: Minhash signature matrix for each batch of texts.
+
+        """
+        dtype = self._signature_dtype()
+        buffer = multiprocessing.RawArray(
+            'B', batch_size * self.permutations * dtype.itemsize
+        )
+        shared = np.frombuffer(buffer, dtype=dtype).reshape(
+            batch_size, self.permutations
+        )
+        chunk_size = -(-batch_size // self.n_jobs)
+        texts = iter(texts)
+        with multiprocessing.Pool(
+                self.n_jobs, initializer=_init_worker, initargs=(self, buffer)
+        ) as pool:
+            while True:
+                batch = list(islice(texts, batch_size))
+                if not batch:
+                    break
+                pool.starmap(_sign_chunk, [
+                    (start, batch[start:start + chunk_size])
+                    for start in range(0, len(batch), chunk_size)
+                ])
+                if copy:
+                    yield shared[:len(batch)].copy()
+                else:
+                    yield shared[:len(batch)]
+
+    def _parallel_min_hash(self, texts):
+        """ Calculates document signatures for all texts using worker processes.
+
+        Args:
+            texts (list, np.array, generator): Iterable containing text content of
+                each document.
+
+        Returns:
+             np.array: Matrix of minhash signatures, m represents each texts minhash
+                signature with n representing each permutations minimum hash value.
+
+        """
+        if isinstance(texts, str):
+            texts = [texts]
+        if hasattr(texts, '__len__'):
+            # Sized inputs fit in one batch so the shared matrix is returned.
+            blocks = list(self._iter_parallel_min_hash(
+                texts, max(len(texts), 1), copy=False
+            ))
+        else:
+            blocks = list(self._iter_parallel_min_hash(
+                texts, self.n_jobs * _PARALLEL_CHUNK_SIZE
+            ))
+        if not blocks:
+            return np.empty((0, self.permutations), dtype=self._signature_dtype())
+        if len(blocks) == 1:
+            return blocks[0]
+        return np.concatenate(blocks)
+
+    def _min_hash(self, shingles):
         """ Calculates document signature by calling the selected hashing method.
 
+        Shingles are passed in rather than stored on the object, so one object can
+        sign texts from many threads at once.
+
+        Args:
+            shingles (iterable): Shingles of each document, as generated by
+                _k_shingles.
+
         Returns:
              np.array: Matrix of minhash signatures, m represents each texts minhash
                 signature with n representing each permutations minimum hash value.
 
         """
         signatures = []
-        for document in self._shingles:
-            if self.method is 'multi_hash':
-                signature = self._multi_hash(document)
-                signatures.append(signature)
-            elif self.method is 'k_smallest_values':
-                signature = self._k_smallest_hash(document)
-                signatures.append(signature)
-        return np.array(signatures)
+        if self.stats is not None:
+            shingles = self.stats.iter_timed('minhash.shingle', shingles)
+        with _timer(self.stats, 'minhash.hash'):
+            for document in shingles:
+                if self.method == 'multi_hash':
+                    signature = self._multi_hash(document)
+                    signatures.append(signature)
+                elif self.method == 'k_smallest_values':
+                    signature = self._k_smallest_hash(document)
+                    signatures.append(signature)
+                elif self.method == 'universal_hash':
+                    signature = self._universal_hash(document)
+                    signatures.append(signature)
+                elif self.method == 'one_permutation':
+                    signature = self._one_permutation_hash(document)
+                    signatures.append(signature)
+            return self._signature_matrix(signatures)
+
+    def iter_signatures(self, texts, batch_size=1000):
+        """ Generates minhash signatures for a stream of texts in fixed size blocks.
+
+        Uses the parameters and hash seeds of this MinHash object, so signatures
+        are compatible with its own and can be added to the same LSH model. Only
+        one block of signatures is held in memory at a time.
+
+        Args:
+            texts (list, np.array, generator): Iterable containing text content of
+                each document.
+            batch_size (int): Number of texts in each block of signatures.
+
+        Yields:
+            np.array: Minhash signature matrix for each block of up to batch_size
+                texts.
+
+        """
+        if batch_size < 1:
+            raise ValueError(
+                'batch_size must be a positive integer.'
+            )
+        if isinstance(texts, str):
+            texts = [texts]
+        if self.n_jobs > 1:
+            yield from self._iter_parallel_min_hash(texts, batch_size)
+            return
+        texts = iter(texts)
+        while True:
+            batch = list(islice(texts, batch_size))
+            if not batch:
+                break
+            yield self._min_hash(self._k_shingles(batch))
+
+    def write_signatures(self, texts, path, batch_size=1000):
+        """ Writes minhash signatures for a stream of texts to a .npy file.
+
+        Signature blocks are appended to the file as they are generated, so the
+        full signature matrix never needs to fit in memory.
+
+        Args:
+            texts (list, np.array, generator): Iterable containing text content of
+                each document.
+            path (str): Path of the .npy file to write.
+            batch_size (int): Number of texts in each block of signatures.
+
+        Returns:
+            np.memmap: Read only memory map of the written signature matrix.
+
+        """
+        dtype = self._signature_dtype()
+        # Reserve space for a header large enough for any number of rows.
+        header_length = len(_npy_header(dtype, (2 ** 63, self.permutations)))
+        rows = 0
+        with open(path, 'wb') as npy_file:
+            npy_file.write(b'\x00' * header_length)
+            for block in self.iter_signatures(texts, batch_size):
+                npy_file.write(np.ascontiguousarray(block, dtype=dtype).tobytes())
+                rows += len(block)
+            npy_file.seek(0)
+            npy_file.write(
+                _npy_header(dtype, (rows, self.permutations), header_length)
+            )
+        return np.load(path, mmap_mode='r')
+
+    def transform(self, texts):
+        """ Generates minhash signatures for texts.
+
+        Args:
+            texts (list, np.array, generator): Iterable containing text content of
+                each document.
+
+        Returns:
+             np.array: Matrix of minhash signatures, m represents each texts minhash
+                signature with n representing each permutations minimum hash value.
+
+        """
+        if self.n_jobs > 1:
+            with _timer(self.stats, 'minhash.parallel'):
+                return self._parallel_min_hash(texts)
+        return self._min_hash(self._k_shingles(texts))
+
+    def transform_one(self, text):
+        """ Generates the minhash signature of a single text.
+
+        Args:
+            text (str): Text content of document.
+
+        Returns:
+            np.array: Minhash signature of the text.
+
+        """
+        return self._min_hash(self._k_shingles([text]))[0]
+
+    def get_params(self):
+        """ Returns the parameters used to generate signatures.
+
+        Returns:
+            Dict: MinHash parameters.
+
+        """
+        return {
+            'n_gram': self.n_gram,
+            'n_gram_type': self.n_gram_type,
+            'permutations': self.permutations,
+            'hash_bits': self.hash_bits,
+            'method': self.method,
+            'seed': self.seed,
+            'b_bits': self.b_bits,
+            'rolling_hash': self.rolling_hash
+        }
+
+    @property
+    def fingerprint(self):
+        """ Returns a digest of the parameters and hash seeds.
+
+        Signatures generated by MinHash objects with equal fingerprints are
+        compatible and can be added to the same LSH model.
+
+        Returns:
+            str: Hexadecimal digest.
+
+        """
+        digest = hashlib.sha1()
+        params = self.get_params()
+        del params['seed']
+        digest.update(repr(sorted(params.items())).encode())
+        for name in ['_hash_seeds', '_permutation_a', '_permutation_b', '_densify_seed']:
+            if hasattr(self, name):
+                digest.update(np.asarray(getattr(self, name), dtype=np.uint64).tobytes())
+        return digest.hexdigest()
+
+    def __getstate__(self):
+        """ Returns state for pickling, excluding stats.
+
+        Returns:
+            Dict: Object attributes.
+
+        """
+        state = self.__dict__.copy()
+        state['stats'] = None
+        return state
+
+
+class MinHash(MinHasher):
+    """ MinHash.
+
+    Attributes:
+        n_gram (int): Number of characters used in each shingle.
+        n_gram_type (str): Type of n gram used for shingles.
+        permutations (int): Number of random permutations used to generate signatures.
+        hash_bits (int): Hash value size used to generate signatures.
+        method (str): Method used to generate signatures.
+        seed (int): Seed used to generate signatures.
+        n_jobs (int): Number of processes used to generate signatures.
+        b_bits (int): Number of lowest bits kept from each hash value, or None.
+        rolling_hash (bool): Whether shingles are hashed with a rolling hash.
+        stats (Stats): Stats object collecting timings of each stage, None if not
+            collected.
+        signatures (np.array): Matrix of minhash signatures, m represents each texts
+            minhash signature with n representing each permutations minimum hash value.
+            Signatures are np.uint32 for 32 bit hashes, np.uint64 for 64 bit hashes
+            and SIGNATURE_128_DTYPE, a high and low np.uint64 pair, for 128 bit
+            hashes. With b_bits the smallest unsigned dtype holding b bits is used.
+
+    """
+
+    def __init__(
+            self,
+            text=None,
+            n_gram=9,
+            n_gram_type='char',
+            permutations=100,
+            hash_bits=64,
+            method='multi_hash',
+            seed=None,
+            n_jobs=1,
+            b_bits=None,
+            rolling_hash=False,
+            stats=None
+    ):
+        """ Generates a minhash signature matrix for texts in a corpus.
+
+        Args:
+            text (list, np.array): Iterable containing text content of each document,
+                if None only hash parameters are generated for use with
+                iter_signatures.
+            n_gram (int): Number of characters to be used in each shingle.
+            n_gram_type (str): Type of n gram to use for shingles, must be char or term.
+            permutations (int): Number of hash values in each document signature.
+            hash_bits (int): Hash value size, must be 32, 64 or 128 bit.
+            method (str): Method to be used for minhash function, must be multi_hash,
+                k_smallest_values, universal_hash or one_permutation.
+            seed (int): Seeds from which to generate random hash function.
+            n_jobs (int): Number of processes used to generate signatures, -1 uses
+                all available cores.
+            b_bits (int): If set only the lowest b bits of each hash value are kept,
+                compressing signatures at the cost of a small loss of accuracy.
+            rolling_hash (bool): If True shingles are hashed directly from each
+                encoded text with a rolling hash instead of creating a string for
+                each shingle, only supported by universal_hash and one_permutation.
+            stats (Stats): If provided, time spent shingling and hashing texts is
+                recorded to this Stats object.
+
+        """
+        super().__init__(
+            n_gram=n_gram,
+            n_gram_type=n_gram_type,
+            permutations=permutations,
+            hash_bits=hash_bits,
+            method=method,
+            seed=seed,
+            n_jobs=n_jobs,
+            b_bits=b_bits,
+            rolling_hash=rolling_hash,
+            stats=stats
+        )
+        # Run methods.
+        self.signatures = None
+        if text is not None:
+            self.signatures = self.transform(text)
@@ -0,0 +1,563 @@
+# Classes for partitioning an LSH model's bands across worker processes.
+# Authors: Justin Boylan-Toomey
+
+from itertools import islice
+import multiprocessing
+import numpy as np
+from .lsh import _hash_bands
+from .storage import DictStorage, ArrayStorage
+
+
+class _Shard:
+    """ Holds the buckets of a range of bands.
+
+    Every shard contains every label, but only the bucket ids of its own bands, so
+    the number of buckets shared by two texts is the sum of their shared buckets
+    in each shard. Labels are held as integer ids assigned by ShardedLSH, so
+    shared bucket counts can be returned as arrays.
+
+    """
+
+    def __init__(self, storage='dict'):
+        """ Initialize empty shard.
+
+        Args:
+            storage (str): Bucket storage, must be dict or array.
+
+        """
+        if storage == 'dict':
+            self._storage = DictStorage()
+        elif storage == 'array':
+            self._storage = ArrayStorage()
+        else:
+            raise ValueError(
+                'Only "dict" and "array" storage is supported.'
+            )
+
+    def add(self, label_ids, bucket_ids):
+        """ Adds label ids and the bucket ids of the shard's bands. """
+        self._storage.add(label_ids, bucket_ids)
+
+    def remove(self, label_id):
+        """ Removes a label id from the shard's buckets. """
+        self._storage.remove(label_id)
+
+    def rollback(self, label_ids):
+        """ Removes label ids added by a failed update, skipping ids not added. """
+        for label_id in label_ids:
+            if label_id in self._storage:
+                self._storage.remove(label_id)
+
+    def label_counts(self, label_ids):
+        """ Counts the buckets shared with each of a list of labels in the shard.
+
+        Args:
+            label_ids (list): Ids of labels in the shard.
+
+        Returns:
+            Tuple: np.int64 arrays of the query index, candidate label id and number
+                of shared buckets of each candidate, see bucket_counts.
+
+        """
+        return self.bucket_counts(self._storage.bucket_ids_many(label_ids))
+
+    def bucket_counts(self, bucket_ids):
+        """ Counts the buckets shared with each of a list of signatures in the shard.
+
+        Args:
+            bucket_ids (list): Lists of bucket ids of the shard's bands, one for
+                each signature.
+
+        Returns:
+            Tuple: np.int64 arrays of the query index, candidate label id and number
+                of shared buckets of each candidate, ordered by query and then by
+                first occurrence of the candidate.
+
+        """
+        lengths = []
+        candidates = [np.zeros(0, dtype=np.int64)]
+        counts = [np.zeros(0, dtype=np.int64)]
+        for row_counts in self._storage.bucket_counts_many(bucket_ids):
+            lengths.append(len(row_counts))
+            candidates.append(np.fromiter(row_counts, dtype=np.int64, count=len(row_counts)))
+            counts.append(
+                np.fromiter(row_counts.values(), dtype=np.int64, count=len(row_counts))
+            )
+        return (
+            np.repeat(np.arange(len(bucket_ids)), lengths),
+            np.concatenate(candidates),
+            np.concatenate(counts)
+        )
+
+
+def _serve(shard, connection):
+    """ Runs shard methods requested through a pipe until sent None.
+
+    Args:
+        shard (_Shard): Shard held by the worker process.
+        connection (multiprocessing.Connection): Worker end of the pipe.
+
+    """
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args = request
+        try:
+            connection.send((True, getattr(shard, method)(*args)))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class LocalTransport:
+    """ Calls shards held in the current process.
+
+    Transports take a list of shards and expose map, calling a shard method with
+    arguments for each shard and returning the results in shard order, and close.
+    Useful for testing and as a template for custom transports.
+
+    """
+
+    def __init__(self, shards):
+        """ Initialize the transport.
+
+        Args:
+            shards (list): Shards to call.
+
+        """
+        self._shards = shards
+
+    def map(self, method, args):
+        """ Calls a method of every shard.
+
+        Args:
+            method (str): Name of the shard method to call.
+            args (list): Tuple of arguments for each shard.
+
+        Returns:
+            List: Result of each shard.
+
+        """
+        return [
+            getattr(shard, method)(*shard_args)
+            for shard, shard_args in zip(self._shards, args)
+        ]
+
+    def close(self):
+        """ Releases the shards. """
+        self._shards = []
+
+
+class ProcessTransport(LocalTransport):
+    """ Calls shards held in worker processes, one process per shard.
+
+    Requests are sent to every worker before any result is received, so shards
+    process each request in parallel.
+
+    """
+
+    def __init__(self, shards):
+        """ Start a worker process for each shard.
+
+        Args:
+            shards (list): Shards to move to worker processes.
+
+        """
+        self._connections = []
+        self._processes = []
+        for shard in shards:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_serve, args=(shard, worker_connection), daemon=True
+            )
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def map(self, method, args):
+        """ Calls a method of every shard.
+
+        Args:
+            method (str): Name of the shard method to call.
+            args (list): Tuple of arguments for each shard.
+
+        Returns:
+            List: Result of each shard.
+
+        """
+        for connection, shard_args in zip(self._connections, args):
+            connection.send((method, shard_args))
+        results = [connection.recv() for connection in self._connections]
+        for success, result in results:
+            if not success:
+                raise result
+        return [result for _, result in results]
+
+    def close(self):
+        """ Stops the worker processes. """
+        for connection in self._connections:
+            connection.send(None)
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+
+class ShardedLSH:
+    """ Locality Sensitive Hashing with bands partitioned across workers.
+
+    Bands are split into contiguous ranges, one per worker, and each worker holds
+    the buckets of its bands. Inserts and queries fan out to all workers and the
+    per-band hit counts are summed, so results match those of an LSH model with
+    the same number of bands.
+
+    Attributes:
+        no_of_bands (int): Number of bands used in model.
+        permutations (int): Number of permutations used in MinHash.
+        fingerprint (str): Fingerprint of the MinHash parameters and seeds used to
+            generate signatures in the model, None if unknown.
+        n_jobs (int): Number of workers.
+
+    """
+
+    def __init__(
+            self,
+            minhash=None,
+            labels=None,
+            no_of_bands=None,
+            n_jobs=2,
+            transport='process',
+            storage='dict'
+    ):
+        """ Initialize the sharded LSH object and start its workers.
+
+        Args:
+            minhash (MinHash, iterable): Object returned by MinHash class, or an
+                iterable of signature blocks as yielded by MinHash.iter_signatures.
+            labels (list, np.array): Iterable, array or pandas series containing labels.
+            no_of_bands (int): Number of bands to break minhash signature into.
+            n_jobs (int): Number of workers, each holding a range of bands.
+            transport (str, callable): Transport used to call workers, must be
+                process to run each worker in its own process, local to run them in
+                the current process, or a callable taking a list of shards and
+                returning a transport.
+            storage (str): Bucket storage used by workers, must be dict or array.
+
+        """
+        if n_jobs < 1:
+            raise ValueError(
+                'n_jobs must be a positive integer.'
+            )
+        if transport == 'process':
+            transport = ProcessTransport
+        elif transport == 'local':
+            transport = LocalTransport
+        elif not callable(transport):
+            raise ValueError(
+                'Only "process" and "local" transports or a callable are supported.'
+            )
+        self.no_of_bands = no_of_bands
+        self.n_jobs = n_jobs
+        self.permutations = None
+        self.fingerprint = None
+        self._labels = {}
+        self._id_labels = {}
+        self._next_id = 0
+        self._band_ranges = None
+        self._transport = transport([_Shard(storage) for _ in range(n_jobs)])
+        if minhash is not None and labels is not None:
+            self.update(minhash, labels)
+        elif minhash is not None:
+            raise ValueError(
+                'labels cannot be None if LSH initialised with minhash object.'
+            )
+        elif labels is not None:
+            raise ValueError(
+                'minhash object cannot be None if LSH initialised with labels.'
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """ Stops the workers. """
+        self._transport.close()
+
+    def _map(self, method, args):
+        """ Calls a shard method with the same arguments on every worker.
+
+        Args:
+            method (str): Name of the shard method to call.
+            args (tuple): Arguments for the method.
+
+        Returns:
+            List: Result of each worker.
+
+        """
+        return self._transport.map(method, [args] * self.n_jobs)
+
+    def _merge_counts(self, shard_counts, label_ids, sensitivity, min_jaccard):
+        """ Sums shared bucket counts of each worker and applies thresholds.
+
+        Counts of the whole batch of queries are merged at once. Workers hold
+        consecutive ranges of bands, so ordering candidates by their first position
+        in the counts of the workers in turn keeps them in order of first
+        occurrence, as returned by LSH.
+
+        Args:
+            shard_counts (list): Arrays of query index, candidate label id and count,
+                for each worker.
+            label_ids (list): Label id of each query, -1 for new texts.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+
+        Returns:
+            List: Candidate duplicates for each query.
+
+        """
+        queries, candidates, counts = (np.concatenate(arrays) for arrays in zip(*shard_counts))
+        if len(shard_counts) > 1:
+            no_of_ids = max(self._next_id, 1)
+            keys, first, inverse = np.unique(
+                queries * no_of_ids + candidates, return_index=True, return_inverse=True
+            )
+            counts = np.bincount(inverse.ravel(), weights=counts, minlength=len(keys))
+            queries, candidates = keys // no_of_ids, keys % no_of_ids
+            order = np.lexsort((first, queries))
+            queries, candidates, counts = queries[order], candidates[order], counts[order]
+        # Skip the text itself, which occurs in all of its own buckets.
+        keep = candidates != np.asarray(label_ids, dtype=np.int64)[queries]
+        if sensitivity > 1:
+            keep &= counts >= sensitivity
+        if min_jaccard:
+            keep &= counts / self.no_of_bands >= min_jaccard
+        queries, candidates = queries[keep], candidates[keep]
+        bounds = np.searchsorted(queries, np.arange(len(label_ids) + 1)).tolist()
+        candidates = list(map(self._id_labels.__getitem__, candidates.tolist()))
+        return [candidates[start:stop] for start, stop in zip(bounds, bounds[1:])]
+
+    def _check_sensitivity(self, sensitivity):
+        """ Checks a query sensitivity does not exceed the number of bands.
+
+        Args:
+            sensitivity (int): Number of identical buckets two ids must occur in to
+                be considered a near duplicate pair.
+
+        """
+        if sensitivity > self.no_of_bands:
+            raise ValueError(
+                'Sensitivity must be <= no of bands.'
+            )
+
+    def update(self, minhash, new_labels):
+        """ Updates sharded LSH object with new MinHash matrix and labels.
+
+        Args:
+            minhash (MinHash, np.array, iterable): MinHash object containing new
+                minhash signatures to add to LSH object, a signature matrix, or an
+                iterable of signature blocks.
+            new_labels (list, iterable): Labels to add to LSH object.
+
+        """
+        fingerprint = None
+        if hasattr(minhash, 'signatures'):
+            if minhash.signatures is None:
+                raise ValueError(
+                    'minhash object does not contain any signatures.'
+                )
+            blocks = [minhash.signatures]
+            fingerprint = minhash.fingerprint
+        elif isinstance(minhash, np.ndarray) and minhash.ndim == 2:
+            blocks = [minhash]
+        else:
+            blocks = minhash
+        new_labels = iter(new_labels)
+        for signatures in blocks:
+            labels = list(islice(new_labels, len(signatures)))
+            if len(labels) != len(signatures):
+                raise ValueError(
+                    'Number of labels must match number of minhash signatures.'
+                )
+            self._check_update(np.shape(signatures)[1], labels, fingerprint)
+            bucket_ids = _hash_bands(signatures, self.permutations, self.no_of_bands)
+            label_ids = list(range(self._next_id, self._next_id + len(labels)))
+            try:
+                self._transport.map('add', [
+                    (label_ids, bucket_ids[:, start:stop])
+                    for start, stop in self._band_ranges
+                ])
+            except Exception:
+                # Undo the workers which succeeded, so all workers hold the same labels.
+                self._map('rollback', (label_ids,))
+                raise
+            self._next_id += len(labels)
+            self._labels.update(zip(labels, label_ids))
+            self._id_labels.update(zip(label_ids, labels))
+
+    def _check_update(self, permutations, new_labels, fingerprint=None):
+        """ Checks new signatures and labels can be added to the model.
+
+        Args:
+            permutations (int): Number of permutations in the new signatures.
+            new_labels (list): List of new labels for MinHash signatures.
+            fingerprint (str): Fingerprint of the MinHash object which generated the
+                signatures, None if unknown.
+
+        """
+        if self._labels:
+            if any(label in self._labels for label in new_labels):
+                raise ValueError(
+                    'At least one provided label already exists in model.'
+                )
+            if self.permutations != permutations:
+                raise ValueError(
+                    'Number of permutations in minhash must be {} to match LSH model.'.format(
+                        self.permutations
+                    )
+                )
+            if fingerprint and self.fingerprint and fingerprint != self.fingerprint:
+                raise ValueError(
+                    'MinHash parameters and seed must match those used to build LSH model.'
+                )
+            return
+        if self._band_ranges is None:
+            if not self.no_of_bands:
+                self.no_of_bands = permutations // 2
+            if self.no_of_bands > permutations:
+                raise ValueError(
+                    'Number of bands must be <= number of permutations.'
+                )
+            if self.n_jobs > self.no_of_bands:
+                raise ValueError(
+                    'n_jobs must be <= number of bands.'
+                )
+            self._band_ranges = [
+                (bands[0], bands[-1] + 1)
+                for bands in np.array_split(np.arange(self.no_of_bands), self.n_jobs)
+            ]
+        elif self.permutations != permutations:
+            raise ValueError(
+                'Number of permutations in minhash must be {} to match LSH model.'.format(
+                    self.permutations
+                )
+            )
+        self.permutations = permutations
+        self.fingerprint = fingerprint
+
+    def query(self, label, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicates from model.
+
+        Args:
+            label (str, int, float): Label of text for which to return near duplicates.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: Candidate duplicates for provided text label.
+
+        """
+        return self.query_many([label], min_jaccard, sensitivity)[0]
+
+    def query_many(self, labels, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicates from model for a batch of labels.
+
+        Args:
+            labels (list): Labels of texts for which to return near duplicates.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: List of candidate duplicates for each provided text label.
+
+        """
+        self._check_sensitivity(sensitivity)
+        labels = list(labels)
+        for label in labels:
+            if label not in self._labels:
+                raise KeyError(
+                    'Label {} does not exist in model'.format(label)
+                )
+        label_ids = [self._labels[label] for label in labels]
+        shard_counts = self._map('label_counts', (label_ids,))
+        return self._merge_counts(shard_counts, label_ids, sensitivity, min_jaccard)
+
+    def query_signatures(self, minhash, min_jaccard=None, sensitivity=1):
+        """ Returns near duplicates from model for new texts, without adding them.
+
+        Args:
+            minhash (MinHash, np.array): MinHash object containing signatures of new
+                texts, or a signature matrix.
+            min_jaccard (float): Minimum Jaccard Similarity for texts to be returned as
+                near duplicates.
+            sensitivity (int): Number of unique buckets two ids must co-occur in to be
+                considered a near duplicate pair.
+
+        Returns:
+            List: List of candidate duplicates for each signature.
+
+        """
+        if self.permutations is None:
+            raise ValueError(
+                'LSH model does not contain any signatures.'
+            )
+        self._check_sensitivity(sensitivity)
+        if hasattr(minhash, 'signatures'):
+            if minhash.signatures is None:
+                raise ValueError(
+                    'minhash object does not contain any signatures.'
+                )
+            if self.fingerprint and minhash.fingerprint != self.fingerprint:
+                raise ValueError(
+                    'MinHash parameters and seed must match those used to build LSH model.'
+                )
+            signatures = minhash.signatures
+        else:
+            signatures = minhash
+        if np.shape(signatures)[1] != self.permutations:
+            raise ValueError(
+                'Number of permutations in minhash must be {} to match LSH model.'.format(
+                    self.permutations
+                )
+            )
+        bucket_ids = _hash_bands(signatures, self.permutations, self.no_of_bands)
+        shard_counts = self._transport.map('bucket_counts', [
+            (bucket_ids[:, start:stop].tolist(),) for start, stop in self._band_ranges
+        ])
+        return self._merge_counts(
+            shard_counts, [-1] * len(bucket_ids), sensitivity, min_jaccard
+        )
+
+    def remove(self, label):
+        """ Remove label and associated text signature from model.
+
+        Args:
+            label (str, int, float): Label for text to be removed from model.
+
+        """
+        if label not in self._labels:
+            raise KeyError(
+                'Label {} does not exist in model.'.format(label)
+            )
+        self._map('remove', (self._labels[label],))
+        del self._id_labels[self._labels.pop(label)]
+
+    def contains(self):
+        """ Returns a list of labels contained in the model.
+
+        Returns:
+            List: Labels contained in the model.
+
+        """
+        return list(self._labels)
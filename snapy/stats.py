@@ -0,0 +1,192 @@
+# Class for collecting timings and counters of MinHash and LSH internals.
+# Authors: Justin Boylan-Toomey
+
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import threading
+import time
+
+# Reusable context manager returned by _timer when stats are disabled.
+_NULL_TIMER = nullcontext()
+
+
+def _timer(stats, stage):
+    """ Returns a timer for a stage, or a no-op context manager if stats is None.
+
+    Args:
+        stats (Stats): Stats object collecting timings, or None if disabled.
+        stage (str): Name of the timed stage.
+
+    Returns:
+        Context manager timing the enclosed block.
+
+    """
+    if stats is None:
+        return _NULL_TIMER
+    return stats.timer(stage)
+
+
+class Stats:
+    """ Stats.
+
+    Collects time spent in each stage of signing texts and building and querying
+    LSH models, along with counters such as the number of candidates examined and
+    returned by queries. Pass a Stats object to MinHash, MinHasher or LSH to enable
+    collection, when not provided no stats are collected.
+
+    Timings are exclusive, time spent in a stage nested inside another is only
+    counted towards the inner stage, so the timings of all stages sum to the total
+    time spent. Stages are nested per thread, so one Stats object can be shared by
+    threads, however the callback may be called from any of them.
+
+    Attributes:
+        timings (dict): Total seconds spent in each stage.
+        calls (dict): Number of times each stage was timed.
+        counters (dict): Total of each counter.
+        gauges (dict): Latest value of each gauge, such as memory usage estimates.
+        callback (callable): Function called with the name, value and kind of each
+            recorded metric, None if not used.
+
+    """
+
+    def __init__(self, callback=None):
+        """ Initialises empty stats.
+
+        Args:
+            callback (callable): Function called as callback(name, value, kind) each
+                time a metric is recorded, where kind is 'timing', 'counter' or
+                'gauge'. Used to export stats to a metrics system.
+
+        """
+        self.callback = callback
+        self.timings = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.gauges = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _nested(self):
+        """ Returns the nested stage times of this thread's running timers.
+
+        Returns:
+            List: Seconds spent in nested stages, innermost timer last.
+
+        """
+        if not hasattr(self._local, 'nested'):
+            self._local.nested = []
+        return self._local.nested
+
+    def add_time(self, stage, seconds):
+        """ Records time spent in a stage.
+
+        Args:
+            stage (str): Name of the stage.
+            seconds (float): Exclusive time spent in the stage.
+
+        """
+        with self._lock:
+            self.timings[stage] += seconds
+            self.calls[stage] += 1
+        if self.callback is not None:
+            self.callback(stage, seconds, 'timing')
+
+    @contextmanager
+    def timer(self, stage):
+        """ Times the enclosed block, excluding time spent in nested stages.
+
+        Args:
+            stage (str): Name of the stage.
+
+        """
+        stack = self._nested
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add_time(stage, elapsed - nested)
+
+    def iter_timed(self, stage, iterable):
+        """ Times producing each item of an iterable, excluded from enclosing stages.
+
+        Args:
+            stage (str): Name of the stage.
+            iterable (iterable): Iterable to time.
+
+        Yields:
+            Items of the iterable.
+
+        """
+        iterator = iter(iterable)
+        stack = self._nested
+        total = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed = time.perf_counter() - start
+                    total += elapsed
+                    if stack:
+                        stack[-1] += elapsed
+                yield item
+        finally:
+            self.add_time(stage, total)
+
+    def increment(self, name, value=1):
+        """ Adds to a counter.
+
+        Args:
+            name (str): Name of the counter.
+            value (int): Amount added to the counter.
+
+        """
+        with self._lock:
+            self.counters[name] += value
+        if self.callback is not None:
+            self.callback(name, value, 'counter')
+
+    def gauge(self, name, value):
+        """ Sets a gauge to its latest value.
+
+        Args:
+            name (str): Name of the gauge.
+            value (int, float): Value of the gauge.
+
+        """
+        with self._lock:
+            self.gauges[name] = value
+        if self.callback is not None:
+            self.callback(name, value, 'gauge')
+
+    def reset(self):
+        """ Clears all recorded stats. """
+        with self._lock:
+            self.timings.clear()
+            self.calls.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def summary(self):
+        """ Returns all recorded stats.
+
+        Returns:
+            Dict: Dictionary of timings, calls, counters and gauges.
+
+        """
+        with self._lock:
+            return {
+                'timings': dict(self.timings),
+                'calls': dict(self.calls),
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges)
+            }
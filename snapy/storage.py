@@ -0,0 +1,1599 @@
+# Classes for storing LSH buckets.
+# Authors: Justin Boylan-Toomey
+
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+from itertools import islice, repeat
+import gc
+import json
+import os
+import sqlite3
+import sys
+import threading
+import numpy as np
+
+# Size of a Python integer holding a 64 bit bucket id.
+_INT_SIZE = sys.getsizeof(1 << 63)
+# Number of containers sampled to estimate their mean size.
+_SIZE_SAMPLE = 1000
+# Number of buckets read by each SQLite query, below its limit on query parameters.
+_SQLITE_CHUNK_SIZE = 500
+
+
+def _json_default(value):
+    """ Converts NumPy scalars to Python scalars for JSON serialisation.
+
+    Args:
+        value (np.generic): NumPy scalar.
+
+    Returns:
+        Python scalar.
+
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(
+        'Object of type {} is not JSON serializable.'.format(type(value).__name__)
+    )
+
+
+def _save_array(path, name, array):
+    """ Saves an array to a .npy file in a directory through a temporary file.
+
+    The file is replaced once written, so arrays memory-mapped from the previous
+    file, which may be the array being saved, stay valid.
+
+    Args:
+        path (str): Directory to save the array to.
+        name (str): File name without the .npy extension.
+        array (np.array): Array to save.
+
+    """
+    filename = os.path.join(path, name + '.npy')
+    with open(filename + '.tmp', 'wb') as f:
+        np.save(f, array)
+    os.replace(filename + '.tmp', filename)
+
+
+def _count_labels(buckets, bucket_ids):
+    """ Counts the buckets each label shares with a list of buckets.
+
+    Args:
+        buckets (dict): Labels of each bucket id.
+        bucket_ids (list): List of bucket ids.
+
+    Returns:
+        Dict: Number of shared buckets for each label, in order of first occurrence.
+
+    """
+    candidates = defaultdict(int)
+    for bucket_id in bucket_ids:
+        for match in buckets[bucket_id]:
+            candidates[match] += 1
+    return candidates
+
+
+def _encode_label(label):
+    """ Encodes a label as JSON, so labels of any JSON type can be stored as text.
+
+    Args:
+        label (str, int, float): Label to encode.
+
+    Returns:
+        str: JSON encoded label.
+
+    """
+    return json.dumps(label, default=_json_default)
+
+
+def _encode_labels(labels):
+    """ Encodes labels as JSON, checking each is decoded to an equal label.
+
+    Args:
+        labels (list): Labels to encode.
+
+    Returns:
+        List: JSON encoded labels.
+
+    Raises:
+        ValueError: If a label is not decoded to an equal label, such as a tuple,
+            which is decoded to a list.
+
+    """
+    encoded = [_encode_label(label) for label in labels]
+    for label, text in zip(labels, encoded):
+        if json.loads(text) != label:
+            raise ValueError(
+                'Label {!r} cannot be stored as JSON, labels must be strings, '
+                'numbers, booleans or None.'.format(label)
+            )
+    return encoded
+
+
+def _mean_size(containers):
+    """ Estimates the mean size in bytes of containers from a sample of them.
+
+    Args:
+        containers (iterable): Iterable of containers.
+
+    Returns:
+        float: Mean size of the first containers, excluding their contents.
+
+    """
+    sample = [sys.getsizeof(container) for container in islice(containers, _SIZE_SAMPLE)]
+    return sum(sample) / len(sample) if sample else 0
+
+
+@contextmanager
+def _gc_paused():
+    """ Pauses cyclic garbage collection while creating many bucket lists.
+
+    Bulk inserts create millions of small lists, each creation counting towards
+    garbage collection thresholds, while none of them can be part of a cycle.
+
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class BaseStorage:
+    """ Interface of LSH bucket storage.
+
+    Storage maps each label to its bucket id in every band, and each bucket id to
+    the labels hashed to it. Subclasses implement every method raising
+    NotImplementedError and can then be passed to LSH in place of a storage name.
+    Bucket ids are unsigned 64 bit integers, labels are kept in insertion order and
+    labels within a bucket are returned in insertion order.
+
+    Attributes:
+        name (str): Name of the storage, saved with models using it.
+
+    """
+
+    name = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, label):
+        raise NotImplementedError
+
+    def add(self, labels, bucket_ids, indexed=None):
+        """ Adds labels and their bucket ids to the buckets.
+
+        Args:
+            labels (list): Labels to add.
+            bucket_ids (np.array): np.uint64 matrix of bucket ids, one row per label
+                and one column per band.
+            indexed (np.array): Boolean matrix, False for bucket ids the label is not
+                added to. Labels are added to all their buckets if None.
+
+        """
+        raise NotImplementedError
+
+    def discard(self, bucket_id, labels):
+        """ Removes labels from a single bucket, keeping them in the model.
+
+        Args:
+            bucket_id (int): Bucket id.
+            labels (list): Labels to remove from the bucket.
+
+        """
+        raise NotImplementedError
+
+    def remove(self, label):
+        """ Removes a label from its buckets.
+
+        Args:
+            label (str, int, float): Label to remove.
+
+        """
+        raise NotImplementedError
+
+    def labels(self):
+        """ Returns all labels in insertion order.
+
+        Returns:
+            List: Labels contained in the buckets.
+
+        """
+        raise NotImplementedError
+
+    def bucket_ids(self, label):
+        """ Returns the bucket ids of a label.
+
+        Args:
+            label (str, int, float): Label to look up.
+
+        Returns:
+            List: Bucket id for each band, None if the label does not exist.
+
+        """
+        raise NotImplementedError
+
+    def bucket_ids_many(self, labels):
+        """ Returns the bucket ids of a batch of labels.
+
+        Args:
+            labels (list): Labels to look up.
+
+        Returns:
+            List: Bucket ids of each label, None for labels which do not exist.
+
+        """
+        return [self.bucket_ids(label) for label in labels]
+
+    def bucket(self, bucket_id):
+        """ Returns the labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            Iterable: Labels in the bucket, in insertion order.
+
+        """
+        raise NotImplementedError
+
+    def bucket_size(self, bucket_id):
+        """ Returns the number of labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            int: Number of labels in the bucket.
+
+        """
+        return len(self.bucket(bucket_id))
+
+    def bucket_counts(self, bucket_ids):
+        """ Counts the buckets each label shares with a list of buckets.
+
+        Args:
+            bucket_ids (list): List of bucket ids.
+
+        Returns:
+            Dict: Number of shared buckets for each label, in order of first
+                occurrence.
+
+        """
+        candidates = defaultdict(int)
+        for bucket_id in bucket_ids:
+            for match in self.bucket(bucket_id):
+                candidates[match] += 1
+        return candidates
+
+    def bucket_counts_many(self, bucket_ids):
+        """ Counts the buckets each label shares with each of a batch of bucket lists.
+
+        Buckets occurring in several lists are read once.
+
+        Args:
+            bucket_ids (list): Lists of bucket ids.
+
+        Returns:
+            List: Dict of the number of shared buckets for each label, in order of
+                first occurrence, for each list.
+
+        """
+        buckets = {}
+        for row in bucket_ids:
+            for bucket_id in row:
+                if bucket_id not in buckets:
+                    buckets[bucket_id] = self.bucket(bucket_id)
+        return [_count_labels(buckets, row) for row in bucket_ids]
+
+    def label_bucket_ids(self):
+        """ Returns all labels and their bucket ids.
+
+        Returns:
+            Tuple: List of labels, np.uint64 matrix of bucket ids, one row per label
+                and one column per band, and boolean matrix, False for bucket ids the
+                label was discarded from.
+
+        """
+        raise NotImplementedError
+
+    def postings(self):
+        """ Returns the contents of all buckets in compressed sparse row form.
+
+        Returns:
+            Tuple: List of labels, np.int64 array of offsets into the postings for
+                each bucket and np.int64 array of postings, holding the position of
+                each label of a bucket in the list of labels in ascending order.
+
+        """
+        raise NotImplementedError
+
+    def bucket_sizes(self):
+        """ Returns the number of labels in each non empty bucket.
+
+        Returns:
+            np.array: np.int64 array of bucket sizes.
+
+        """
+        return np.diff(self.postings()[1])
+
+    def memory_usage(self):
+        """ Estimates the memory used by the buckets, excluding the labels.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        raise NotImplementedError
+
+    def save(self, path):
+        """ Saves the buckets to a directory.
+
+        Args:
+            path (str): Directory to save buckets to.
+
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Loads buckets saved to a directory.
+
+        Args:
+            path (str): Directory to load buckets from.
+            mmap (bool): If True memory-map saved arrays instead of reading them
+                into memory, where supported.
+
+        Returns:
+            BaseStorage: Loaded buckets.
+
+        """
+        raise NotImplementedError
+
+
+class DictStorage(BaseStorage):
+    """ Stores LSH buckets in memory as dictionaries.
+
+    Each bucket id maps to an insertion ordered dictionary of the labels hashed to
+    it, with None values, so labels are removed from a bucket in constant time
+    however large the bucket grows. Each label maps to the list of its bucket ids,
+    one per band.
+
+    """
+
+    name = 'dict'
+
+    def __init__(self):
+        """ Initialize empty bucket dictionaries. """
+        self._buckets = defaultdict(dict)
+        self._i_bucket = defaultdict(list)
+
+    def __len__(self):
+        return len(self._i_bucket)
+
+    def __contains__(self, label):
+        return label in self._i_bucket
+
+    def add(self, labels, bucket_ids, indexed=None):
+        """ Adds labels and their bucket ids to the buckets.
+
+        Args:
+            labels (list): Labels to add.
+            bucket_ids (np.array): np.uint64 matrix of bucket ids, one row per label
+                and one column per band.
+            indexed (np.array): Boolean matrix, False for bucket ids the label is not
+                added to. Labels are added to all their buckets if None.
+
+        """
+        buckets = self._buckets
+        with _gc_paused():
+            if indexed is None:
+                for label, label_bucket_ids in zip(labels, bucket_ids.tolist()):
+                    self._i_bucket[label] = label_bucket_ids
+                    for bucket_id in label_bucket_ids:
+                        buckets[bucket_id][label] = None
+                return
+            for label, label_bucket_ids, label_indexed in zip(
+                    labels, bucket_ids.tolist(), indexed.tolist()
+            ):
+                self._i_bucket[label] = label_bucket_ids
+                for bucket_id, is_indexed in zip(label_bucket_ids, label_indexed):
+                    if is_indexed:
+                        buckets[bucket_id][label] = None
+
+    def discard(self, bucket_id, labels):
+        """ Removes labels from a single bucket, keeping them in the model.
+
+        Args:
+            bucket_id (int): Bucket id.
+            labels (list): Labels to remove from the bucket.
+
+        """
+        bucket = self._buckets[bucket_id]
+        for label in labels:
+            del bucket[label]
+        if not bucket:
+            del self._buckets[bucket_id]
+
+    def remove(self, label):
+        """ Removes a label from its buckets.
+
+        Args:
+            label (str, int, float): Label to remove.
+
+        """
+        for bucket_id in self._i_bucket[label]:
+            bucket = self._buckets.get(bucket_id)
+            # Labels may have been discarded from capped buckets.
+            if bucket is None or label not in bucket:
+                continue
+            del bucket[label]
+            if not bucket:
+                del self._buckets[bucket_id]
+        del self._i_bucket[label]
+
+    def labels(self):
+        """ Returns all labels in insertion order.
+
+        Returns:
+            List: Labels contained in the buckets.
+
+        """
+        return list(self._i_bucket)
+
+    def bucket_ids(self, label):
+        """ Returns the bucket ids of a label.
+
+        Args:
+            label (str, int, float): Label to look up.
+
+        Returns:
+            List: Bucket id for each band, None if the label does not exist.
+
+        """
+        return self._i_bucket.get(label)
+
+    def bucket(self, bucket_id):
+        """ Returns the labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            Dict: Labels in the bucket as keys, in insertion order.
+
+        """
+        return self._buckets.get(bucket_id, {})
+
+    def bucket_size(self, bucket_id):
+        """ Returns the number of labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            int: Number of labels in the bucket.
+
+        """
+        return len(self._buckets.get(bucket_id, ()))
+
+    def label_bucket_ids(self):
+        """ Returns all labels and their bucket ids.
+
+        Returns:
+            Tuple: List of labels, np.uint64 matrix of bucket ids, one row per label
+                and one column per band, and boolean matrix, False for bucket ids the
+                label was discarded from.
+
+        """
+        buckets = self._buckets
+        indexed = np.array([
+            [bucket_id in buckets and label in buckets[bucket_id] for bucket_id in row]
+            for label, row in self._i_bucket.items()
+        ], dtype=bool)
+        bucket_ids = np.array(list(self._i_bucket.values()), dtype=np.uint64)
+        return self.labels(), bucket_ids, indexed
+
+    def postings(self):
+        """ Returns the contents of all buckets in compressed sparse row form.
+
+        Returns:
+            Tuple: List of labels, np.int64 array of offsets into the postings for
+                each bucket and np.int64 array of postings, holding the position of
+                each label of a bucket in the list of labels in ascending order.
+
+        """
+        labels = self.labels()
+        ids = dict(zip(labels, range(len(labels))))
+        buckets = self._buckets.values()
+        offsets = np.zeros(len(buckets) + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, buckets), dtype=np.int64, count=len(buckets)),
+            out=offsets[1:]
+        )
+        label_ids = np.fromiter(
+            (ids[label] for bucket in buckets for label in bucket),
+            dtype=np.int64,
+            count=offsets[-1]
+        )
+        return labels, offsets, label_ids
+
+    def bucket_sizes(self):
+        """ Returns the number of labels in each non empty bucket.
+
+        Returns:
+            np.array: np.int64 array of bucket sizes.
+
+        """
+        sizes = np.fromiter(
+            map(len, self._buckets.values()), dtype=np.int64, count=len(self._buckets)
+        )
+        return sizes[sizes > 0]
+
+    def memory_usage(self):
+        """ Estimates the memory used by the buckets, excluding the labels.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        entries = sum(map(len, self._i_bucket.values()))
+        return int(
+            sys.getsizeof(self._buckets)
+            + _mean_size(self._buckets.values()) * len(self._buckets)
+            + sys.getsizeof(self._i_bucket)
+            + _mean_size(self._i_bucket.values()) * len(self._i_bucket)
+            + _INT_SIZE * (len(self._buckets) + entries)
+        )
+
+    def save(self, path):
+        """ Saves the buckets to a directory in the ArrayStorage format.
+
+        Args:
+            path (str): Directory to save buckets to.
+
+        """
+        storage = ArrayStorage()
+        if self._i_bucket:
+            storage.add(*self.label_bucket_ids())
+        storage.save(path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Loads buckets saved by DictStorage.save or ArrayStorage.save.
+
+        Args:
+            path (str): Directory to load buckets from.
+            mmap (bool): Unused, buckets are always read into memory.
+
+        Returns:
+            DictStorage: Loaded buckets.
+
+        """
+        storage = cls()
+        array_storage = ArrayStorage.load(path, mmap=True)
+        if len(array_storage):
+            storage.add(*array_storage.label_bucket_ids())
+        return storage
+
+
+class ArrayStorage(BaseStorage):
+    """ Stores LSH buckets in NumPy arrays.
+
+    Labels are interned to dense integer ids and the bucket ids of every label are
+    kept in a labels x bands np.uint64 matrix. Bucket postings are stored in
+    compressed sparse row form: a sorted array of bucket ids, offsets into a
+    postings array of np.int32 label ids. Fresh inserts go to a small mutable
+    delta which is merged into the postings once large enough, and removed labels
+    are marked dead until the next merge, which renumbers the remaining labels to
+    reclaim their rows. Uses an order of magnitude less memory than DictStorage
+    for large models.
+
+    """
+
+    name = 'array'
+
+    def __init__(self, merge_threshold=65536):
+        """ Initialize empty bucket arrays.
+
+        Args:
+            merge_threshold (int): Minimum number of postings held in the delta
+                before it is merged into the sorted postings. The delta is also
+                allowed to grow to an eighth of the sorted postings.
+
+        """
+        self.merge_threshold = merge_threshold
+        self._ids = {}
+        self._labels = []
+        self._bucket_ids = None
+        self._indexed = None
+        self._alive = np.zeros(0, dtype=bool)
+        self._size = 0
+        self._bucket_keys = np.zeros(0, dtype=np.uint64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._delta = defaultdict(list)
+        self._delta_size = 0
+        self._dead = 0
+        self._discarded = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, label):
+        return label in self._ids
+
+    def _reserve(self, size, no_of_bands):
+        """ Grows the label arrays to hold at least size labels.
+
+        Args:
+            size (int): Number of labels to hold.
+            no_of_bands (int): Number of bands in each row of bucket ids.
+
+        """
+        if self._bucket_ids is None:
+            self._bucket_ids = np.zeros((0, no_of_bands), dtype=np.uint64)
+            self._indexed = np.zeros((0, no_of_bands), dtype=bool)
+        capacity = len(self._bucket_ids)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        bucket_ids = np.zeros((capacity, no_of_bands), dtype=np.uint64)
+        bucket_ids[:self._size] = self._bucket_ids[:self._size]
+        indexed = np.zeros((capacity, no_of_bands), dtype=bool)
+        indexed[:self._size] = self._indexed[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._bucket_ids, self._indexed, self._alive = bucket_ids, indexed, alive
+
+    def add(self, labels, bucket_ids, indexed=None):
+        """ Adds labels and their bucket ids to the buckets.
+
+        Args:
+            labels (list): Labels to add.
+            bucket_ids (np.array): np.uint64 matrix of bucket ids, one row per label
+                and one column per band.
+            indexed (np.array): Boolean matrix, False for bucket ids the label is not
+                added to. Labels are added to all their buckets if None.
+
+        """
+        start = self._size
+        stop = start + len(labels)
+        self._reserve(stop, bucket_ids.shape[1])
+        self._bucket_ids[start:stop] = bucket_ids
+        self._indexed[start:stop] = True if indexed is None else indexed
+        self._alive[start:stop] = True
+        self._labels.extend(labels)
+        self._ids.update(zip(labels, range(start, stop)))
+        self._size = stop
+        self._delta_size += bucket_ids.size
+        if self._delta_size >= max(self.merge_threshold, len(self._postings) // 8):
+            self.compact()
+            return
+        with _gc_paused():
+            for label_id, label_bucket_ids, label_indexed in zip(
+                    range(start, stop),
+                    bucket_ids.tolist(),
+                    self._indexed[start:stop].tolist()
+            ):
+                for bucket_id, is_indexed in zip(label_bucket_ids, label_indexed):
+                    if is_indexed:
+                        self._delta[bucket_id].append(label_id)
+
+    def discard(self, bucket_id, labels):
+        """ Removes labels from a single bucket, keeping them in the model.
+
+        Discarded labels are filtered from the bucket until the next merge.
+
+        Args:
+            bucket_id (int): Bucket id.
+            labels (list): Labels to remove from the bucket.
+
+        """
+        label_ids = [self._ids[label] for label in labels]
+        for label_id in label_ids:
+            self._indexed[label_id, self._bucket_ids[label_id] == bucket_id] = False
+        from_delta = 0
+        delta = self._delta.get(bucket_id)
+        if delta:
+            discarded = set(label_ids)
+            kept = [label_id for label_id in delta if label_id not in discarded]
+            from_delta = len(delta) - len(kept)
+            delta[:] = kept
+            self._delta_size -= from_delta
+        self._discarded += len(label_ids) - from_delta
+
+    def compact(self):
+        """ Merges the delta into the sorted postings and drops removed labels.
+
+        Remaining labels are renumbered in insertion order, so the rows of removed
+        labels are reclaimed.
+
+        """
+        if self._bucket_ids is None:
+            return
+        label_ids = np.flatnonzero(self._alive[:self._size])
+        no_of_bands = self._bucket_ids.shape[1]
+        if len(label_ids) < self._size:
+            self._bucket_ids = self._bucket_ids[label_ids]
+            self._indexed = self._indexed[label_ids]
+            self._alive = np.ones(len(label_ids), dtype=bool)
+            self._labels = [self._labels[label_id] for label_id in label_ids.tolist()]
+            self._ids = dict(zip(self._labels, range(len(label_ids))))
+            self._size = len(label_ids)
+            label_ids = np.arange(self._size)
+        indexed = self._indexed[:self._size].ravel()
+        bucket_ids = self._bucket_ids[:self._size].ravel()[indexed]
+        # A stable sort keeps the label ids of each bucket in insertion order.
+        order = np.argsort(bucket_ids, kind='stable')
+        bucket_ids = bucket_ids[order]
+        self._postings = np.repeat(label_ids, no_of_bands)[indexed][order].astype(
+            np.int32
+        )
+        new_bucket = np.ones(len(bucket_ids), dtype=bool)
+        new_bucket[1:] = bucket_ids[1:] != bucket_ids[:-1]
+        starts = np.flatnonzero(new_bucket)
+        self._bucket_keys = bucket_ids[starts]
+        self._offsets = np.append(starts, len(bucket_ids)).astype(np.int64)
+        self._delta = defaultdict(list)
+        self._delta_size = 0
+        self._dead = 0
+        self._discarded = 0
+
+    def remove(self, label):
+        """ Marks a label as removed from its buckets.
+
+        Args:
+            label (str, int, float): Label to remove.
+
+        """
+        label_id = self._ids.pop(label)
+        self._alive[label_id] = False
+        self._labels[label_id] = None
+        self._dead += self._bucket_ids.shape[1]
+        if self._dead > len(self._postings) // 2:
+            self.compact()
+
+    def labels(self):
+        """ Returns all labels in insertion order.
+
+        Returns:
+            List: Labels contained in the buckets.
+
+        """
+        return list(self._ids)
+
+    def bucket_ids(self, label):
+        """ Returns the bucket ids of a label.
+
+        Args:
+            label (str, int, float): Label to look up.
+
+        Returns:
+            List: Bucket id for each band, None if the label does not exist.
+
+        """
+        label_id = self._ids.get(label)
+        if label_id is None:
+            return None
+        return self._bucket_ids[label_id].tolist()
+
+    def bucket_ids_many(self, labels):
+        """ Returns the bucket ids of a batch of labels.
+
+        Args:
+            labels (list): Labels to look up.
+
+        Returns:
+            List: Bucket ids of each label, None for labels which do not exist.
+
+        """
+        label_ids = [self._ids.get(label) for label in labels]
+        found = [label_id for label_id in label_ids if label_id is not None]
+        rows = iter(self._bucket_ids[found].tolist() if found else [])
+        return [None if label_id is None else next(rows) for label_id in label_ids]
+
+    def bucket_label_ids(self, bucket_id):
+        """ Returns the ids of labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            np.array: np.int32 label ids in the bucket, in insertion order.
+
+        """
+        index = np.searchsorted(self._bucket_keys, np.uint64(bucket_id))
+        if index < len(self._bucket_keys) and self._bucket_keys[index] == bucket_id:
+            label_ids = self._postings[self._offsets[index]:self._offsets[index + 1]]
+        else:
+            label_ids = self._postings[:0]
+        delta = self._delta.get(bucket_id)
+        if delta:
+            label_ids = np.concatenate([label_ids, np.array(delta, dtype=np.int32)])
+        if self._dead:
+            label_ids = label_ids[self._alive[label_ids]]
+        if self._discarded:
+            label_ids = label_ids[np.any(
+                (self._bucket_ids[label_ids] == bucket_id) & self._indexed[label_ids],
+                axis=1
+            )]
+        return label_ids
+
+    def bucket(self, bucket_id):
+        """ Returns the labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            List: Labels in the bucket, in insertion order.
+
+        """
+        labels = self._labels
+        return [labels[label_id] for label_id in self.bucket_label_ids(bucket_id).tolist()]
+
+    def bucket_size(self, bucket_id):
+        """ Returns the number of labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            int: Number of labels in the bucket.
+
+        """
+        return len(self.bucket_label_ids(bucket_id))
+
+    def label_bucket_ids(self):
+        """ Returns all labels and their bucket ids.
+
+        Returns:
+            Tuple: List of labels, np.uint64 matrix of bucket ids, one row per label
+                and one column per band, and boolean matrix, False for bucket ids the
+                label was discarded from.
+
+        """
+        if self._bucket_ids is None:
+            return [], np.zeros((0, 0), dtype=np.uint64), np.zeros((0, 0), dtype=bool)
+        alive = self._alive[:self._size]
+        return (
+            self.labels(),
+            self._bucket_ids[:self._size][alive],
+            self._indexed[:self._size][alive]
+        )
+
+    def postings(self):
+        """ Returns the contents of all buckets in compressed sparse row form.
+
+        Returns:
+            Tuple: List of labels, np.int64 array of offsets into the postings for
+                each bucket and np.int64 array of postings, holding the position of
+                each label of a bucket in the list of labels in ascending order.
+
+        """
+        if self._delta_size or self._dead or self._discarded:
+            self.compact()
+        # Label ids only increase, so ranking live ids gives their label positions.
+        positions = np.cumsum(self._alive[:self._size]) - 1
+        return self.labels(), self._offsets, positions[self._postings]
+
+    def memory_usage(self):
+        """ Estimates the memory used by the buckets, excluding the labels.
+
+        Memory mapped arrays are counted at their full size.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        arrays = [
+            self._bucket_ids, self._indexed, self._alive, self._bucket_keys,
+            self._offsets, self._postings
+        ]
+        return int(
+            sum(array.nbytes for array in arrays if array is not None)
+            + sys.getsizeof(self._ids)
+            + sys.getsizeof(self._labels)
+            + sys.getsizeof(self._delta)
+            + _mean_size(self._delta.values()) * len(self._delta)
+            + _INT_SIZE * (len(self._delta) + self._delta_size)
+        )
+
+    def save(self, path):
+        """ Saves the buckets to a directory.
+
+        Labels are saved to labels.json and the bucket ids of each label, sorted
+        bucket ids, whether each was discarded, offsets and postings to .npy files.
+
+        Args:
+            path (str): Directory to save buckets to.
+
+        Raises:
+            ValueError: If a label cannot be stored as JSON, such as a tuple.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        labels, offsets, label_ids = self.postings()
+        _, bucket_ids, indexed = self.label_bucket_ids()
+        encoded = _encode_labels(labels)
+        with open(os.path.join(path, 'labels.json'), 'w') as f:
+            f.write('[{}]'.format(', '.join(encoded)))
+        _save_array(path, 'bucket_ids', bucket_ids)
+        _save_array(path, 'indexed', indexed)
+        _save_array(path, 'bucket_keys', self._bucket_keys)
+        _save_array(path, 'offsets', offsets)
+        _save_array(path, 'postings', label_ids.astype(np.int32))
+
+    @classmethod
+    def load(cls, path, mmap=True, merge_threshold=65536):
+        """ Loads buckets saved by ArrayStorage.save or DictStorage.save.
+
+        Args:
+            path (str): Directory to load buckets from.
+            mmap (bool): If True memory-map the arrays read-only instead of reading
+                them into memory. Arrays are copied on the first update.
+            merge_threshold (int): Minimum number of postings held in the delta
+                before it is merged into the sorted postings.
+
+        Returns:
+            ArrayStorage: Loaded buckets.
+
+        """
+        mmap_mode = 'r' if mmap else None
+        storage = cls(merge_threshold)
+        with open(os.path.join(path, 'labels.json')) as f:
+            labels = json.load(f)
+        if not labels:
+            return storage
+        storage._labels = labels
+        storage._ids = dict(zip(labels, range(len(labels))))
+        storage._size = len(labels)
+        storage._alive = np.ones(len(labels), dtype=bool)
+        for name in ['bucket_ids', 'bucket_keys', 'offsets', 'postings']:
+            setattr(
+                storage,
+                '_' + name,
+                np.load(os.path.join(path, name + '.npy'), mmap_mode=mmap_mode)
+            )
+        # Copied on write, as labels are discarded from capped buckets in place.
+        storage._indexed = np.load(
+            os.path.join(path, 'indexed.npy'), mmap_mode='c' if mmap else None
+        )
+        return storage
+
+
+class SQLiteStorage(BaseStorage):
+    """ Stores LSH buckets in an SQLite database on disk.
+
+    Labels are stored in a table alongside their bucket ids, and bucket postings in
+    a table clustered by bucket id, so looking up a bucket reads a few adjacent
+    pages however large the index grows. Inserts are sorted by bucket id and
+    written in one transaction per batch. Recently used buckets are cached in
+    memory, in front of SQLite's own page cache. Indexes larger than memory can be
+    held on local disk and reopened after a restart with LSH.load. Labels must be
+    strings, numbers, booleans or None, as they are stored as JSON.
+
+    Attributes:
+        path (str): Path of the database file, empty for a temporary database.
+        cache_size (int): Maximum number of buckets cached in memory.
+
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path='', cache_size=65536, page_cache_size=1 << 26):
+        """ Opens or creates a database.
+
+        Args:
+            path (str): Path of the database file, created if it does not exist. If
+                empty a temporary database is created on disk, deleted when closed.
+            cache_size (int): Maximum number of buckets cached in memory.
+            page_cache_size (int): Maximum size in bytes of SQLite's page cache.
+
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'PRAGMA cache_size = {}'.format(-(page_cache_size // 1024))
+        )
+        if path:
+            self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS labels ('
+                'id INTEGER PRIMARY KEY, '
+                'label TEXT NOT NULL UNIQUE, '
+                'bucket_ids BLOB NOT NULL, '
+                'indexed BLOB NOT NULL)'
+            )
+            # Clustering postings by bucket keeps each bucket on adjacent pages.
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS postings ('
+                'bucket INTEGER NOT NULL, '
+                'label_id INTEGER NOT NULL, '
+                'PRIMARY KEY (bucket, label_id)) WITHOUT ROWID'
+            )
+        self._size, last_id = self._connection.execute(
+            'SELECT COUNT(*), MAX(id) FROM labels'
+        ).fetchone()
+        self._next_id = 0 if last_id is None else last_id + 1
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, label):
+        return self._label_row(label) is not None
+
+    def _label_row(self, label):
+        """ Returns the id, bucket ids and indexed flags of a label.
+
+        Args:
+            label (str, int, float): Label to look up.
+
+        Returns:
+            Tuple: Label id, np.uint64 array of bucket ids and boolean array, False
+                for bucket ids the label was discarded from, None if the label does
+                not exist.
+
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT id, bucket_ids, indexed FROM labels WHERE label = ?',
+                (_encode_label(label),)
+            ).fetchone()
+        if row is None:
+            return None
+        return (
+            row[0],
+            np.frombuffer(row[1], dtype=np.uint64),
+            np.frombuffer(row[2], dtype=bool)
+        )
+
+    def _invalidate(self, bucket_ids):
+        """ Drops buckets from the cache.
+
+        Args:
+            bucket_ids (iterable): Bucket ids to drop.
+
+        """
+        for bucket_id in bucket_ids:
+            self._cache.pop(bucket_id, None)
+
+    def _buckets(self, bucket_ids):
+        """ Returns the labels of buckets, reading uncached buckets at once.
+
+        Args:
+            bucket_ids (list): List of bucket ids.
+
+        Returns:
+            Dict: Tuple of labels in insertion order for each bucket id.
+
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for bucket_id in bucket_ids:
+                labels = self._cache.get(bucket_id)
+                if labels is None:
+                    missing.append(bucket_id)
+                else:
+                    self._cache.move_to_end(bucket_id)
+                    found[bucket_id] = labels
+            missing = list(dict.fromkeys(missing))
+            for start in range(0, len(missing), _SQLITE_CHUNK_SIZE):
+                chunk = missing[start:start + _SQLITE_CHUNK_SIZE]
+                keys = np.array(chunk, dtype=np.uint64).view(np.int64).tolist()
+                rows = self._connection.execute(
+                    'SELECT p.bucket, l.label FROM postings p '
+                    'JOIN labels l ON l.id = p.label_id '
+                    'WHERE p.bucket IN ({}) ORDER BY p.bucket, p.label_id'.format(
+                        ', '.join('?' * len(keys))
+                    ),
+                    keys
+                ).fetchall()
+                bucket_labels = defaultdict(list)
+                for key, label in rows:
+                    bucket_labels[key].append(label)
+                for bucket_id, key in zip(chunk, keys):
+                    labels = tuple(map(json.loads, bucket_labels.get(key, ())))
+                    found[bucket_id] = labels
+                    self._cache[bucket_id] = labels
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def add(self, labels, bucket_ids, indexed=None):
+        """ Adds labels and their bucket ids to the database in one transaction.
+
+        Args:
+            labels (list): Labels to add.
+            bucket_ids (np.array): np.uint64 matrix of bucket ids, one row per label
+                and one column per band.
+            indexed (np.array): Boolean matrix, False for bucket ids the label is not
+                added to. Labels are added to all their buckets if None.
+
+
+        Raises:
+            ValueError: If a label cannot be stored as JSON, such as a tuple.
+
+        """
+        encoded = _encode_labels(labels)
+        bucket_ids = np.ascontiguousarray(bucket_ids, dtype=np.uint64)
+        if indexed is None:
+            indexed = np.ones(bucket_ids.shape, dtype=bool)
+        indexed = np.ascontiguousarray(indexed, dtype=bool)
+        with self._lock:
+            ids = np.arange(self._next_id, self._next_id + len(labels), dtype=np.int64)
+            rows, columns = np.nonzero(indexed)
+            keys = bucket_ids[rows, columns].view(np.int64)
+            # Inserting in key order appends to few pages of the postings index.
+            order = np.argsort(keys, kind='stable')
+            with self._connection:
+                self._connection.executemany(
+                    'INSERT INTO labels VALUES (?, ?, ?, ?)',
+                    zip(
+                        ids.tolist(),
+                        encoded,
+                        (row.tobytes() for row in bucket_ids),
+                        (row.tobytes() for row in indexed)
+                    )
+                )
+                self._connection.executemany(
+                    'INSERT OR IGNORE INTO postings VALUES (?, ?)',
+                    zip(keys[order].tolist(), ids[rows[order]].tolist())
+                )
+            self._next_id += len(labels)
+            self._size += len(labels)
+            if len(keys) > len(self._cache):
+                self._cache.clear()
+            else:
+                self._invalidate(bucket_ids[rows, columns].tolist())
+
+    def discard(self, bucket_id, labels):
+        """ Removes labels from a single bucket, keeping them in the model.
+
+        Args:
+            bucket_id (int): Bucket id.
+            labels (list): Labels to remove from the bucket.
+
+        """
+        key = int(np.array(bucket_id, dtype=np.uint64).view(np.int64))
+        with self._lock, self._connection:
+            for label in labels:
+                label_id, bucket_ids, indexed = self._label_row(label)
+                indexed = indexed & (bucket_ids != np.uint64(bucket_id))
+                self._connection.execute(
+                    'DELETE FROM postings WHERE bucket = ? AND label_id = ?',
+                    (key, label_id)
+                )
+                self._connection.execute(
+                    'UPDATE labels SET indexed = ? WHERE id = ?',
+                    (indexed.tobytes(), label_id)
+                )
+            self._invalidate([bucket_id])
+
+    def remove(self, label):
+        """ Removes a label from its buckets.
+
+        Args:
+            label (str, int, float): Label to remove.
+
+        """
+        with self._lock:
+            row = self._label_row(label)
+            if row is None:
+                raise KeyError(label)
+            label_id, bucket_ids, _ = row
+            with self._connection:
+                self._connection.executemany(
+                    'DELETE FROM postings WHERE bucket = ? AND label_id = ?',
+                    zip(bucket_ids.view(np.int64).tolist(), repeat(label_id))
+                )
+                self._connection.execute('DELETE FROM labels WHERE id = ?', (label_id,))
+            self._size -= 1
+            self._invalidate(bucket_ids.tolist())
+
+    def labels(self):
+        """ Returns all labels in insertion order.
+
+        Returns:
+            List: Labels contained in the buckets.
+
+        """
+        with self._lock:
+            rows = self._connection.execute('SELECT label FROM labels ORDER BY id')
+            return [json.loads(label) for label, in rows]
+
+    def bucket_ids(self, label):
+        """ Returns the bucket ids of a label.
+
+        Args:
+            label (str, int, float): Label to look up.
+
+        Returns:
+            List: Bucket id for each band, None if the label does not exist.
+
+        """
+        row = self._label_row(label)
+        if row is None:
+            return None
+        return row[1].tolist()
+
+    def bucket_ids_many(self, labels):
+        """ Returns the bucket ids of a batch of labels, in one query per chunk.
+
+        Args:
+            labels (list): Labels to look up.
+
+        Returns:
+            List: Bucket ids of each label, None for labels which do not exist.
+
+        """
+        encoded = [_encode_label(label) for label in labels]
+        found = {}
+        with self._lock:
+            for start in range(0, len(encoded), _SQLITE_CHUNK_SIZE):
+                chunk = encoded[start:start + _SQLITE_CHUNK_SIZE]
+                found.update(self._connection.execute(
+                    'SELECT label, bucket_ids FROM labels WHERE label IN ({})'.format(
+                        ', '.join('?' * len(chunk))
+                    ),
+                    chunk
+                ))
+        return [
+            None if label not in found
+            else np.frombuffer(found[label], dtype=np.uint64).tolist()
+            for label in encoded
+        ]
+
+    def bucket(self, bucket_id):
+        """ Returns the labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            Dict: Labels in the bucket as keys, in insertion order.
+
+        """
+        return dict.fromkeys(self._buckets([bucket_id])[bucket_id])
+
+    def bucket_size(self, bucket_id):
+        """ Returns the number of labels hashed to a bucket.
+
+        Args:
+            bucket_id (int): Bucket id.
+
+        Returns:
+            int: Number of labels in the bucket.
+
+        """
+        return len(self._buckets([bucket_id])[bucket_id])
+
+    def bucket_counts(self, bucket_ids):
+        """ Counts the buckets each label shares with a list of buckets.
+
+        Args:
+            bucket_ids (list): List of bucket ids.
+
+        Returns:
+            Dict: Number of shared buckets for each label, in order of first
+                occurrence.
+
+        """
+        return _count_labels(self._buckets(bucket_ids), bucket_ids)
+
+    def bucket_counts_many(self, bucket_ids):
+        """ Counts the buckets each label shares with each of a batch of bucket lists.
+
+        Uncached buckets of the whole batch are read together.
+
+        Args:
+            bucket_ids (list): Lists of bucket ids.
+
+        Returns:
+            List: Dict of the number of shared buckets for each label, in order of
+                first occurrence, for each list.
+
+        """
+        buckets = self._buckets([bucket_id for row in bucket_ids for bucket_id in row])
+        return [_count_labels(buckets, row) for row in bucket_ids]
+
+    def label_bucket_ids(self):
+        """ Returns all labels and their bucket ids.
+
+        Returns:
+            Tuple: List of labels, np.uint64 matrix of bucket ids, one row per label
+                and one column per band, and boolean matrix, False for bucket ids the
+                label was discarded from.
+
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT label, bucket_ids, indexed FROM labels ORDER BY id'
+            ).fetchall()
+        if not rows:
+            return [], np.zeros((0, 0), dtype=np.uint64), np.zeros((0, 0), dtype=bool)
+        labels, bucket_ids, indexed = zip(*rows)
+        return (
+            [json.loads(label) for label in labels],
+            np.frombuffer(b''.join(bucket_ids), dtype=np.uint64).reshape(len(rows), -1),
+            np.frombuffer(b''.join(indexed), dtype=bool).reshape(len(rows), -1)
+        )
+
+    def postings(self):
+        """ Returns the contents of all buckets in compressed sparse row form.
+
+        Returns:
+            Tuple: List of labels, np.int64 array of offsets into the postings for
+                each bucket and np.int64 array of postings, holding the position of
+                each label of a bucket in the list of labels in ascending order.
+
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, label FROM labels ORDER BY id'
+            ).fetchall()
+            postings = np.array(self._connection.execute(
+                'SELECT bucket, label_id FROM postings ORDER BY bucket, label_id'
+            ).fetchall(), dtype=np.int64).reshape(-1, 2)
+        ids = np.array([label_id for label_id, _ in rows], dtype=np.int64)
+        labels = [json.loads(label) for _, label in rows]
+        keys, label_ids = postings[:, 0], postings[:, 1]
+        starts = np.flatnonzero(np.diff(keys)) + 1
+        offsets = np.concatenate([[0], starts, [len(keys)]]).astype(np.int64)
+        if not len(keys):
+            offsets = np.zeros(1, dtype=np.int64)
+        return labels, offsets, np.searchsorted(ids, label_ids)
+
+    def bucket_sizes(self):
+        """ Returns the number of labels in each non empty bucket.
+
+        Returns:
+            np.array: np.int64 array of bucket sizes.
+
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT COUNT(*) FROM postings GROUP BY bucket'
+            ).fetchall()
+        return np.array(rows, dtype=np.int64).reshape(-1)
+
+    def memory_usage(self):
+        """ Estimates the memory used by the bucket cache, excluding the labels.
+
+        SQLite's page cache is not included, it is bounded by page_cache_size.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        return int(
+            sys.getsizeof(self._cache)
+            + _mean_size(self._cache.values()) * len(self._cache)
+            + _INT_SIZE * len(self._cache)
+        )
+
+    def close(self):
+        """ Closes the database, deleting it if temporary. """
+        with self._lock:
+            self._connection.close()
+
+    def save(self, path):
+        """ Saves the buckets to buckets.sqlite in a directory.
+
+        If the database is already that file, pending writes are committed,
+        otherwise the database is copied with SQLite's backup API.
+
+        Args:
+            path (str): Directory to save buckets to.
+
+        """
+        os.makedirs(path, exist_ok=True)
+        database = os.path.join(path, 'buckets.sqlite')
+        with self._lock:
+            self._connection.commit()
+            if self.path and os.path.abspath(self.path) == os.path.abspath(database):
+                return
+            destination = sqlite3.connect(database)
+            try:
+                self._connection.backup(destination)
+            finally:
+                destination.close()
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """ Opens buckets saved by SQLiteStorage.save in place.
+
+        Buckets saved by DictStorage.save or ArrayStorage.save are converted to a
+        temporary database, leaving the directory unchanged.
+
+        Args:
+            path (str): Directory to load buckets from.
+            mmap (bool): If True memory-map the arrays of buckets saved by other
+                storage while converting them.
+
+        Returns:
+            SQLiteStorage: Loaded buckets.
+
+        """
+        database = os.path.join(path, 'buckets.sqlite')
+        if os.path.exists(database):
+            return cls(database)
+        storage = cls()
+        array_storage = ArrayStorage.load(path, mmap=mmap)
+        if len(array_storage):
+            storage.add(*array_storage.label_bucket_ids())
+        return storage
+
+
+# Bucket storage classes by name, as passed to LSH and saved to meta.json.
+_STORAGES = {storage.name: storage for storage in [DictStorage, ArrayStorage, SQLiteStorage]}
+
+
+def _storage_class(name):
+    """ Returns the bucket storage class of a name.
+
+    Args:
+        name (str): Name of the storage class.
+
+    Returns:
+        type: Bucket storage class.
+
+    """
+    if name not in _STORAGES:
+        raise ValueError(
+            'Only "dict", "array" and "sqlite" storage is supported.'
+        )
+    return _STORAGES[name]
+
+
+def _create_storage(storage):
+    """ Returns empty bucket storage.
+
+    Args:
+        storage (str, BaseStorage): Name of the storage class, or a storage object
+            which is returned as is.
+
+    Returns:
+        BaseStorage: Bucket storage.
+
+    """
+    if isinstance(storage, BaseStorage):
+        return storage
+    return _storage_class(storage)()
+
+
+class SignatureStorage:
+    """ Stores the MinHash signatures of labels for re-ranking candidates.
+
+    Signatures are held in a single matrix grown by doubling, with a dictionary
+    mapping each label to its row. Rows of removed labels are reclaimed once they
+    make up half the matrix, and dropped when saved.
+
+    """
+
+    def __init__(self):
+        """ Initialize empty signature matrix. """
+        self._rows = {}
+        self._signatures = None
+        self._size = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, label):
+        return label in self._rows
+
+    def add(self, labels, signatures):
+        """ Adds labels and their signatures.
+
+        Args:
+            labels (list): Labels to add.
+            signatures (np.array): MinHash signature matrix, one row per label.
+
+        """
+        start = self._size
+        stop = start + len(labels)
+        if self._signatures is None:
+            self._signatures = np.zeros((0,) + signatures.shape[1:], signatures.dtype)
+        if stop > len(self._signatures):
+            capacity = max(stop, 2 * len(self._signatures), 1024)
+            matrix = np.zeros((capacity,) + signatures.shape[1:], signatures.dtype)
+            matrix[:start] = self._signatures[:start]
+            self._signatures = matrix
+        self._signatures[start:stop] = signatures
+        self._rows.update(zip(labels, range(start, stop)))
+        self._size = stop
+
+    def remove(self, label):
+        """ Removes the signature of a label.
+
+        Args:
+            label (str, int, float): Label to remove.
+
+        """
+        del self._rows[label]
+        if len(self._rows) <= self._size // 2:
+            self.compact()
+
+    def compact(self):
+        """ Moves the signatures of remaining labels to the first rows, in order. """
+        labels = list(self._rows)
+        if self._signatures is not None:
+            self._signatures = self.get(labels)
+        self._rows = dict(zip(labels, range(len(labels))))
+        self._size = len(labels)
+
+    def get(self, labels):
+        """ Returns the signatures of labels.
+
+        Args:
+            labels (list): Labels to look up.
+
+        Returns:
+            np.array: MinHash signature matrix, one row per label.
+
+        """
+        rows = np.fromiter(
+            (self._rows[label] for label in labels), dtype=np.int64, count=len(labels)
+        )
+        return self._signatures[rows]
+
+    def memory_usage(self):
+        """ Estimates the memory used by the signatures, excluding the labels.
+
+        Returns:
+            int: Estimated size in bytes.
+
+        """
+        size = sys.getsizeof(self._rows)
+        if self._signatures is not None:
+            size += self._signatures.nbytes
+        return size
+
+    def save(self, path, labels):
+        """ Saves signatures to signatures.npy in a directory.
+
+        Args:
+            path (str): Directory to save signatures to.
+            labels (list): Labels in the order to save their signatures.
+
+        """
+        if self._signatures is None:
+            signatures = np.zeros(0, dtype=np.uint64)
+        else:
+            signatures = self.get(labels)
+        _save_array(path, 'signatures', signatures)
+
+    @classmethod
+    def load(cls, path, labels, mmap=True):
+        """ Loads signatures saved by SignatureStorage.save.
+
+        Args:
+            path (str): Directory to load signatures from.
+            labels (list): Labels in the order their signatures were saved.
+            mmap (bool): If True memory-map the signatures read-only instead of
+                reading them into memory. Signatures are copied on the first update.
+
+        Returns:
+            SignatureStorage: Loaded signatures.
+
+        """
+        storage = cls()
+        signatures = np.load(
+            os.path.join(path, 'signatures.npy'), mmap_mode='r' if mmap else None
+        )
+        if labels:
+            storage._signatures = signatures
+            storage._rows = dict(zip(labels, range(len(labels))))
+            storage._size = len(labels)
+        return storage
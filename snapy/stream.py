@@ -0,0 +1,61 @@
+# Functions for deduplicating streams of texts.
+# Authors: Justin Boylan-Toomey
+
+from itertools import islice
+from .minhash import MinHasher
+from .lsh import LSH
+
+
+def dedupe(
+        documents,
+        minhasher=None,
+        lsh=None,
+        batch_size=1000,
+        min_jaccard=None,
+        sensitivity=1
+):
+    """ Deduplicates a stream of texts in a single pass.
+
+    Texts are signed in batches, then each text is checked against all texts kept
+    so far, including those earlier in its batch, and added to the LSH model only if
+    it is not a near duplicate.
+
+    Args:
+        documents (iterable): Iterable of (label, text) tuples.
+        minhasher (MinHasher): MinHasher used to sign texts, must match the
+            parameters of texts in lsh. Defaults to a MinHasher using the fast
+            universal_hash method.
+        lsh (LSH): LSH model of texts seen so far, updated in place. Defaults to a
+            new empty model.
+        batch_size (int): Number of texts signed at once.
+        min_jaccard (float): Minimum Jaccard Similarity for texts to be
+            considered near duplicates.
+        sensitivity (int): Number of unique buckets two ids must co-occur in to be
+            considered a near duplicate pair.
+
+    Yields:
+        Tuple: Label, True if the text was kept and added to lsh, and the label of
+            the text it duplicates or None if kept.
+
+    """
+    if minhasher is None:
+        minhasher = MinHasher(method='universal_hash')
+    if lsh is None:
+        lsh = LSH()
+    if not lsh.is_compatible(minhasher):
+        raise ValueError(
+            'MinHash parameters and seed must match those used to build LSH model.'
+        )
+    documents = iter(documents)
+    while True:
+        batch = list(islice(documents, batch_size))
+        if not batch:
+            break
+        labels, texts = zip(*batch)
+        signatures = minhasher.transform(list(texts))
+        matches = lsh.update_unique(signatures, labels, min_jaccard, sensitivity)
+        if lsh.fingerprint is None:
+            lsh.fingerprint = minhasher.fingerprint
+            lsh.minhash_params = minhasher.get_params()
+        for label, match in zip(labels, matches):
+            yield label, match is None, match
@@ -0,0 +1,61 @@
+import pytest
+import numpy as np
+from snapy import MinHasher
+from benchmarks.corpus import generate_corpus, exact_jaccard, duplicate_pairs
+from benchmarks.run import main
+
+
+def shingles(text):
+    return set(next(MinHasher(n_gram=2, n_gram_type='term')._k_shingles([text])))
+
+
+def test_generate_corpus():
+    texts, sources = generate_corpus(200, duplicate_rate=0.3, jaccard=0.8, words=100)
+    assert len(texts) == 200
+    assert all(len(text.split()) == 100 for text in texts)
+    assert generate_corpus(200, duplicate_rate=0.3)[0] == generate_corpus(
+        200, duplicate_rate=0.3
+    )[0]
+    duplicates = np.flatnonzero(sources != np.arange(200))
+    assert 40 < len(duplicates) < 80
+    assert np.all(sources[duplicates] < duplicates)
+    # Duplicates copy originals, never other duplicates.
+    assert np.all(sources[sources] == sources)
+    similarities = exact_jaccard(
+        shingles, texts, [(i, sources[i]) for i in duplicates]
+    )
+    assert np.all((similarities > 0.75) & (similarities <= 0.8))
+    originals = np.flatnonzero(sources == np.arange(200))
+    unrelated = exact_jaccard(shingles, texts, [originals[:2], originals[2:4]])
+    assert np.all(unrelated == 0)
+    with pytest.raises(ValueError):
+        generate_corpus(10, duplicate_rate=1)
+
+
+def test_duplicate_pairs():
+    texts, sources = generate_corpus(300, duplicate_rate=0.2, jaccard=(0.6, 1.0))
+    pairs = duplicate_pairs(shingles, texts, sources, 0.8)
+    assert pairs
+    assert all(larger > smaller for larger, smaller in pairs)
+    assert np.all(exact_jaccard(shingles, texts, pairs) >= 0.8)
+    assert len(duplicate_pairs(shingles, texts, sources, 0.0)) > len(pairs)
+
+
+def test_run_benchmarks(tmp_path):
+    results = main([
+        '--sizes', '200',
+        '--methods', 'universal_hash',
+        '--hash-bits', '64',
+        '--minhash-documents', '20',
+        '--storages', 'array',
+        '--queries', '10',
+        '--output', str(tmp_path / 'results.json')
+    ])
+    assert [result['benchmark'] for result in results] == [
+        'minhash', 'minhash', 'build', 'query', 'query_many', 'adjacency_list',
+        'edge_list', 'edge_list min_jaccard', 'remove'
+    ]
+    assert all(result['docs_per_sec'] > 0 for result in results)
+    assert all(result['peak_mb'] > 0 for result in results)
+    assert 0 <= results[6]['recall'] <= 1
+    assert (tmp_path / 'results.json').exists()
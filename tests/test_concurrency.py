@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import pytest
+from snapy import MinHash, MinHasher, LSH, ConcurrentLSH, AsyncQueryBatcher
+from snapy.concurrency import _RWLock
+
+seed = 3
+content = [
+    'Jupiter is primarily composed of hydrogen with a quarter of its mass being helium',
+    'Jupiter moving out of the inner Solar System would have allowed the formation of inner planets.',
+    'A helium atom has about four times as much mass as a hydrogen atom, so the composition changes '
+    'when described as the proportion of mass contributed by different atoms.',
+    'Jupiter is primarily composed of hydrogen and a quarter of its mass being helium',
+    'A helium atom has about four times as much mass as a hydrogen atom and the composition changes '
+    'when described as a proportion of mass contributed by different atoms.',
+    'Theoretical models indicate that if Jupiter had much more mass than it does at present, it would shrink.',
+    'This process causes Jupiter to shrink by about 2 cm each year.',
+    'Jupiter is mostly composed of hydrogen with a quarter of its mass being helium',
+    'The Great Red Spot is large enough to accommodate Earth within its boundaries.'
+]
+labels = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+minhash = MinHash(content, seed=seed)
+
+
+def test_rw_lock():
+    lock = _RWLock()
+    events = []
+
+    def read():
+        with lock.read_locked():
+            events.append('read')
+            time.sleep(0.05)
+            events.append('read done')
+
+    def write():
+        with lock.write_locked():
+            events.append('write')
+            with lock.read_locked():
+                with lock.write_locked():
+                    pass
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    time.sleep(0.01)
+    writer = threading.Thread(target=write)
+    writer.start()
+    for thread in readers + [writer]:
+        thread.join()
+    # Readers run together, the writer waits for both to finish.
+    assert events == ['read', 'read', 'read done', 'read done', 'write']
+    with lock.read_locked():
+        with lock.read_locked():
+            with pytest.raises(RuntimeError):
+                with lock.write_locked():
+                    pass
+
+
+def test_concurrent_lsh():
+    lsh = LSH(minhash, labels)
+    concurrent_lsh = ConcurrentLSH(minhash, labels)
+    assert concurrent_lsh.query(1) == lsh.query(1)
+    assert concurrent_lsh.query_signatures(minhash) == lsh.query_signatures(minhash)
+    assert concurrent_lsh.edge_list() == lsh.edge_list()
+    assert list(concurrent_lsh.iter_edges()) == lsh.edge_list()
+    assert concurrent_lsh.query.__doc__ == LSH.query.__doc__
+    merged = ConcurrentLSH.merge_many([LSH(minhash, labels)], storage='array')
+    assert isinstance(merged, ConcurrentLSH)
+    assert merged.adjacency_list() == lsh.adjacency_list()
+    concurrent_lsh.remove(4)
+    assert concurrent_lsh.query(1) == [8]
+
+
+def test_concurrent_lsh_threads():
+    concurrent_lsh = ConcurrentLSH(MinHash(content[:1], seed=seed), [0], storage='array')
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            try:
+                concurrent_lsh.query_signatures(minhash.signatures)
+                concurrent_lsh.query(0)
+            except Exception as error:
+                errors.append(error)
+
+    def write():
+        try:
+            for i in range(100):
+                concurrent_lsh.update([minhash.signatures[i % 9:i % 9 + 1]], [i + 1])
+                if i % 2:
+                    concurrent_lsh.remove(i)
+        finally:
+            stop.set()
+
+    threads = [threading.Thread(target=read) for _ in range(4)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(concurrent_lsh.contains()) == 51
+
+
+def test_async_query_batcher():
+    lsh = ConcurrentLSH(minhash, labels)
+    hasher = MinHasher(seed=seed)
+    expected = lsh.query_signatures(minhash.signatures)
+    batch_sizes = []
+    query_signatures = lsh.query_signatures
+
+    def counted_query_signatures(signatures, **kwargs):
+        batch_sizes.append(len(signatures))
+        return query_signatures(signatures, **kwargs)
+
+    lsh.query_signatures = counted_query_signatures
+
+    async def run():
+        async with AsyncQueryBatcher(lsh, hasher, max_batch_size=4) as batcher:
+            results = await asyncio.gather(*[batcher.query(text) for text in content])
+        with pytest.raises(ValueError):
+            await batcher.query(content[0])
+        return results
+
+    assert asyncio.run(run()) == expected
+    assert sum(batch_sizes) == 9
+    assert max(batch_sizes) == 4
+    with pytest.raises(ValueError):
+        AsyncQueryBatcher(lsh, MinHasher())
+    with pytest.raises(ValueError):
+        AsyncQueryBatcher(lsh, hasher, max_batch_size=0)
+
+
+def test_async_query_batcher_errors():
+    lsh = LSH(minhash, labels)
+
+    async def run():
+        batcher = AsyncQueryBatcher(lsh, MinHasher(seed=seed))
+        with pytest.raises(ValueError):
+            await batcher.query('short')
+        # Errors signing a text are only raised by its own query.
+        results = await asyncio.gather(
+            batcher.query(content[0]),
+            batcher.query('short'),
+            batcher.query(content[2]),
+            return_exceptions=True
+        )
+        assert results[0] == [1, 4, 8]
+        assert isinstance(results[1], ValueError)
+        assert results[2] == [3, 5]
+        await batcher.close()
+
+    asyncio.run(run())
@@ -1,6 +1,7 @@
 import pytest
-from snapy import MinHash, LSH
+from snapy import MinHash, LSH, SQLiteStorage, optimal_bands
 from collections import defaultdict
+import numpy as np
 
 seed = 3
 labels = [1, 2, 3, 4, 5, 6, 7, 8, 9]
@@ -24,14 +25,14 @@ minhash = MinHash(content, seed=3)
 def test_initialize_from_empty_lsh():
     lsh = LSH()
     assert lsh.no_of_bands is None
-    assert lsh._buckets == defaultdict(list)
+    assert lsh._buckets == defaultdict(dict)
     assert lsh._i_bucket == defaultdict(list)
     assert lsh.permutations is None
     lsh.update(minhash, labels)
     assert list(lsh._i_bucket) == labels
     buckets = lsh._buckets
-    assert buckets[4466445138223010106] == [1, 8]
-    assert buckets[-3939654010681976230] == [1, 4, 8]
+    assert list(buckets[14888549357082534082]) == [1, 8]
+    assert list(buckets[10050042199408923778]) == [1, 4, 8]
     assert lsh.permutations == 100
     assert lsh.no_of_bands == 50
 
@@ -43,6 +44,45 @@ def test_initialize_lsh_with_params():
     assert list(lsh._i_bucket) == labels
 
 
+def test_optimal_bands():
+    assert optimal_bands(0.5, 100)[:2] == (20, 5)
+    assert optimal_bands(0.8, 100)[:2] == (8, 12)
+    bands, rows, candidate_rate = optimal_bands(0.8, 128)
+    assert (bands, rows) == (10, 12)
+    assert 0.2 < candidate_rate < 0.21
+    # Penalising false positives selects fewer, longer bands.
+    assert optimal_bands(0.5, 100, 0.9, 0.1)[:2] == (14, 7)
+    assert optimal_bands(0.5, 100)[2] > optimal_bands(0.8, 100)[2]
+    with pytest.raises(ValueError):
+        optimal_bands(1.5, 100)
+
+
+def test_lsh_threshold():
+    lsh = LSH(minhash, labels, threshold=0.5)
+    assert lsh.no_of_bands == 20
+    assert lsh.threshold == 0.5
+    assert lsh.query(3) == [5]
+    with pytest.raises(ValueError):
+        LSH(no_of_bands=20, threshold=0.5)
+
+
+def test_band_keys():
+    lsh = LSH(minhash, labels)
+    bucket_ids = lsh._band_keys(minhash.signatures)
+    assert bucket_ids.shape == (9, 50)
+    assert bucket_ids.dtype == np.uint64
+    assert bucket_ids[0].tolist() == lsh._i_bucket[1]
+    # Identical bands in different band positions hash to different buckets.
+    signatures = np.zeros((1, 100), dtype=np.uint64)
+    assert len(set(lsh._band_keys(signatures)[0].tolist())) == 50
+    uneven_lsh = LSH(minhash, labels, no_of_bands=49)
+    assert uneven_lsh.no_of_bands == 49
+    assert len(uneven_lsh._i_bucket[1]) == 49
+    assert uneven_lsh.query(3) == [5]
+    lsh_128 = LSH(MinHash(content, hash_bits=128, seed=seed), labels, no_of_bands=20)
+    assert lsh_128.query(3) == [5]
+
+
 def test_lsh_query():
     lsh = LSH(minhash, labels)
     with pytest.raises(KeyError):
@@ -52,13 +92,40 @@ def test_lsh_query():
     with pytest.raises(ValueError):
         lsh.query(2, sensitivity=100)
     result = lsh.query(1)
-    assert result == [8, 4]
-    result = lsh.query(1, sensitivity=29)
+    assert result == [4, 8]
+    result = lsh.query(1, sensitivity=24)
     assert result == [4]
-    result = lsh.query(1, min_jaccard=0.55)
+    result = lsh.query(1, min_jaccard=0.47)
     assert result == [4]
 
 
+def test_lsh_query_many():
+    lsh = LSH(minhash, labels)
+    assert lsh.query_many([1, 3, 9]) == [[4, 8], [5], []]
+    assert lsh.query_many([1, 5], min_jaccard=0.6) == [[], [3]]
+    with pytest.raises(KeyError):
+        lsh.query_many([1, 10])
+    with pytest.raises(ValueError):
+        lsh.query_many([1], sensitivity=51)
+    for storage in ['array', 'sqlite']:
+        batched = LSH(minhash, labels, storage=storage)
+        assert batched.query_many(labels) == [lsh.query(label) for label in labels]
+
+
+def test_lsh_query_signatures():
+    lsh = LSH(MinHash(content[:7], seed=seed), labels[:7])
+    new_minhash = MinHash(content[7:], seed=seed)
+    assert lsh.query_signatures(new_minhash) == [[1, 4], []]
+    assert lsh.query_signatures(new_minhash.signatures, sensitivity=20) == [[1], []]
+    assert lsh.contains() == labels[:7]
+    with pytest.raises(ValueError):
+        lsh.query_signatures(MinHash(content[7:]))
+    with pytest.raises(ValueError):
+        lsh.query_signatures(MinHash(content[7:], permutations=50, seed=seed))
+    with pytest.raises(ValueError):
+        LSH().query_signatures(new_minhash)
+
+
 def test_update_lsh():
     lsh = LSH(minhash, labels)
     with pytest.raises(ValueError):
@@ -71,12 +138,63 @@ def test_update_lsh():
     incorrect_minhash = MinHash(new_content, permutations=10)
     with pytest.raises(ValueError):
         lsh.update(incorrect_minhash, new_labels)
-    correct_minhash = MinHash(new_content)
+    unseeded_minhash = MinHash(new_content)
+    assert not lsh.is_compatible(unseeded_minhash)
+    with pytest.raises(ValueError):
+        lsh.update(unseeded_minhash, new_labels)
+    correct_minhash = MinHash(new_content, seed=seed)
+    assert lsh.is_compatible(correct_minhash)
+    assert lsh.fingerprint == correct_minhash.fingerprint
     lsh.update(correct_minhash, new_labels)
     assert lsh.permutations == 100
     assert list(lsh._i_bucket) == labels + [11, 12]
 
 
+def test_update_unique_lsh():
+    lsh = LSH()
+    assert lsh.update_unique(minhash, labels) == [
+        None, None, None, 1, 3, None, None, 1, None
+    ]
+    assert lsh.contains() == [1, 2, 3, 6, 7, 9]
+    assert lsh.fingerprint == minhash.fingerprint
+    assert lsh.update_unique(minhash.signatures[:1], [10], sensitivity=50) == [1]
+    with pytest.raises(ValueError):
+        lsh.update_unique(minhash.signatures[:1], [1])
+    with pytest.raises(ValueError):
+        lsh.update_unique(minhash.signatures[:2], [11])
+
+
+def test_update_lsh_from_stream():
+    lsh = LSH(minhash, labels)
+    stream_lsh = LSH()
+    hasher = MinHash(seed=seed)
+    stream_lsh.update(hasher.iter_signatures(content, batch_size=4), iter(labels))
+    assert stream_lsh.permutations == 100
+    assert stream_lsh._i_bucket == lsh._i_bucket
+    assert stream_lsh._buckets == lsh._buckets
+    with pytest.raises(ValueError):
+        stream_lsh.update(hasher.iter_signatures(content[:2]), [11])
+    with pytest.raises(ValueError):
+        stream_lsh.update(MinHash(seed=seed), [])
+
+
+def test_update_lsh_from_signature_matrix():
+    lsh = LSH(minhash, labels)
+    matrix_lsh = LSH()
+    matrix_lsh.update(minhash.signatures, labels)
+    assert matrix_lsh.permutations == 100
+    assert matrix_lsh._buckets == lsh._buckets
+    with pytest.raises(ValueError):
+        matrix_lsh.update(minhash.signatures[:2], [10])
+
+
+def test_lsh_with_one_permutation_minhash():
+    lsh = LSH(MinHash(content, method='one_permutation', seed=seed), labels)
+    assert lsh.permutations == 100
+    assert 4 in lsh.query(1)
+    assert 5 in lsh.query(3)
+
+
 def test_lsh_contains():
     lsh = LSH(minhash, labels)
     assert lsh.contains() == labels
@@ -86,6 +204,10 @@ def test_lsh_remove():
     lsh = LSH(minhash, labels)
     lsh.remove(5)
     assert list(lsh._i_bucket) == [1, 2, 3, 4, 6, 7, 8, 9]
+    assert lsh.query(3) == []
+    lsh.remove(4)
+    assert lsh.query(1) == [8]
+    assert all(4 not in bucket for bucket in lsh._buckets.values())
     with pytest.raises(KeyError):
         lsh.remove(11)
 
@@ -96,7 +218,7 @@ def test_lsh_adjacency_list():
         lsh.adjacency_list(sensitivity=1000)
     sensitivity_list = lsh.adjacency_list(sensitivity=2)
     assert sensitivity_list == {
-        1: [8, 4], 2: [], 3: [5], 4: [1, 8], 5: [3], 6: [], 7: [], 8: [1, 4], 9: []
+        1: [4, 8], 2: [], 3: [5], 4: [1, 8], 5: [3], 6: [], 7: [], 8: [1, 4], 9: []
     }
     jaccard_list = lsh.adjacency_list(min_jaccard=0.6)
     assert jaccard_list == {
@@ -104,7 +226,7 @@ def test_lsh_adjacency_list():
     }
     default_list = lsh.adjacency_list()
     assert default_list == {
-        1: [8, 4], 2: [], 3: [5], 4: [1, 8], 5: [3], 6: [], 7: [], 8: [1, 4], 9: []
+        1: [4, 8], 2: [], 3: [5], 4: [1, 8], 5: [3], 6: [], 7: [], 8: [1, 4], 9: []
     }
 
 
@@ -116,7 +238,88 @@ def test_lsh_edge_list():
     assert lsh.edge_list(sensitivity=20) == [(8, 1), (5, 3), (4, 1)]
     assert lsh.edge_list(min_jaccard=0.7) == []
     assert lsh.edge_list(min_jaccard=0.6) == [(5, 3)]
-    assert lsh.edge_list(jaccard_weighted=True, min_jaccard=0.55) == [(5, 3, 0.6), (4, 1, 0.58)]
+    assert lsh.edge_list(jaccard_weighted=True, min_jaccard=0.45) == [
+        (8, 1, 0.46), (5, 3, 0.64), (4, 1, 0.48)
+    ]
+
+
+def test_lsh_iter_edges():
+    lsh = LSH(minhash, labels)
+    edges = lsh.iter_edges(jaccard_weighted=True, min_jaccard=0.45)
+    assert not isinstance(edges, list)
+    assert list(edges) == [(8, 1, 0.46), (5, 3, 0.64), (4, 1, 0.48)]
+    with pytest.raises(ValueError):
+        lsh.iter_edges(sensitivity=101)
+    src, dst, weight = lsh.edge_arrays(sensitivity=20)
+    assert src.tolist() == [7, 4, 3]
+    assert dst.tolist() == [0, 2, 0]
+    assert weight.tolist() == [0.46, 0.64, 0.48]
+    src, dst, weight = lsh.edge_arrays(min_jaccard=0.9)
+    assert len(src) == len(dst) == len(weight) == 0
+
+
+def test_lsh_edge_blocks(monkeypatch):
+    lsh = LSH(minhash, labels)
+    edges = lsh.edge_list(jaccard_weighted=True)
+    monkeypatch.setattr('snapy.lsh._PAIR_BLOCK_SIZE', 2)
+    assert lsh.edge_list(jaccard_weighted=True) == edges
+    assert len(list(lsh._edge_blocks(0, 1))) > 1
+
+
+def test_lsh_clusters():
+    lsh = LSH(minhash, labels)
+    assert lsh.clusters().tolist() == [0, 1, 2, 0, 2, 5, 6, 0, 8]
+    assert lsh.clusters(sensitivity=20).tolist() == [0, 1, 2, 0, 2, 5, 6, 0, 8]
+    assert lsh.clusters(min_jaccard=0.6).tolist() == [0, 1, 2, 3, 2, 5, 6, 7, 8]
+    lsh.remove(1)
+    assert lsh.clusters().tolist() == [0, 1, 2, 1, 4, 5, 2, 7]
+    with pytest.raises(ValueError):
+        lsh.clusters(sensitivity=51)
+
+
+def test_lsh_array_storage():
+    lsh = LSH(minhash, labels)
+    array_lsh = LSH(minhash, labels, storage='array')
+    assert array_lsh.contains() == labels
+    for label in labels:
+        assert array_lsh.query(label) == lsh.query(label)
+    assert array_lsh.adjacency_list() == lsh.adjacency_list()
+    assert array_lsh.edge_list(jaccard_weighted=True) == lsh.edge_list(
+        jaccard_weighted=True
+    )
+    array_lsh.remove(4)
+    assert 4 not in array_lsh.contains()
+    assert array_lsh.query(1) == [8]
+    with pytest.raises(KeyError):
+        array_lsh.remove(4)
+
+
+def test_lsh_sqlite_storage(tmp_path):
+    lsh = LSH(minhash, labels)
+    sqlite_lsh = LSH(minhash, labels, storage='sqlite')
+    assert sqlite_lsh.contains() == labels
+    for label in labels:
+        assert sqlite_lsh.query(label) == lsh.query(label)
+    assert sqlite_lsh.query_signatures(minhash.signatures) == lsh.query_signatures(
+        minhash.signatures
+    )
+    assert sqlite_lsh.adjacency_list() == lsh.adjacency_list()
+    assert sqlite_lsh.edge_list(jaccard_weighted=True) == lsh.edge_list(
+        jaccard_weighted=True
+    )
+    assert sqlite_lsh.clusters().tolist() == lsh.clusters().tolist()
+    sqlite_lsh.remove(4)
+    assert 4 not in sqlite_lsh.contains()
+    assert sqlite_lsh.query(1) == [8]
+    with pytest.raises(KeyError):
+        sqlite_lsh.remove(4)
+    # Models can be built directly in a database file and reopened.
+    storage = SQLiteStorage(str(tmp_path / 'buckets.sqlite'))
+    file_lsh = LSH(minhash, labels, storage=storage)
+    file_lsh.save(str(tmp_path))
+    assert LSH.load(str(tmp_path)).edge_list() == lsh.edge_list()
+    merged = LSH.merge_many([lsh, LSH()], storage='sqlite')
+    assert merged.adjacency_list() == lsh.adjacency_list()
 
 
 def test_lsh_errors():
@@ -125,4 +328,200 @@ def test_lsh_errors():
     with pytest.raises(ValueError):
         LSH(labels=labels)
     with pytest.raises(ValueError):
-        LSH(minhash, labels, no_of_bands=49)
+        LSH(minhash, labels, no_of_bands=101)
+    with pytest.raises(ValueError):
+        LSH(minhash, labels, storage='list')
+
+
+def test_lsh_save_load(tmp_path):
+    lsh = LSH(MinHash(content[:8], seed=seed), labels[:8])
+    lsh.remove(2)
+    lsh.save(str(tmp_path / 'lsh'))
+    for storage in ['dict', 'array', 'sqlite']:
+        loaded = LSH.load(str(tmp_path / 'lsh'), storage=storage)
+        assert loaded.contains() == lsh.contains()
+        assert loaded.no_of_bands == 50
+        assert loaded.permutations == 100
+        assert loaded.fingerprint == minhash.fingerprint
+        assert loaded.minhash_params == minhash.get_params()
+        assert loaded.edge_list(jaccard_weighted=True) == lsh.edge_list(
+            jaccard_weighted=True
+        )
+        assert loaded.query_signatures(minhash.signatures[8:]) == [[]]
+        with pytest.raises(ValueError):
+            loaded.update(MinHash(content[8:]), labels[8:])
+        loaded.update(MinHash(content[8:], seed=seed), labels[8:])
+        assert loaded.contains() == [1, 3, 4, 5, 6, 7, 8, 9]
+    array_lsh = LSH(minhash, labels, storage='array')
+    array_lsh.save(str(tmp_path / 'array_lsh'))
+    loaded = LSH.load(str(tmp_path / 'array_lsh'))
+    assert isinstance(loaded._storage._postings, np.memmap)
+    assert loaded.query(1) == [4, 8]
+    loaded.remove(8)
+    assert loaded.query(1) == [4]
+    stored_lsh = LSH(minhash, labels, storage='array', store_signatures=True)
+    stored_lsh.save(str(tmp_path / 'stored_lsh'))
+    LSH.load(str(tmp_path / 'stored_lsh')).save(str(tmp_path / 'stored_lsh'))
+    loaded = LSH.load(str(tmp_path / 'stored_lsh'))
+    assert loaded.contains() == labels
+    assert loaded.edge_list(jaccard_weighted=True) == stored_lsh.edge_list(
+        jaccard_weighted=True
+    )
+    sqlite_lsh = LSH(minhash, labels, storage='sqlite')
+    sqlite_lsh.save(str(tmp_path / 'sqlite_lsh'))
+    for storage in [None, 'dict']:
+        loaded = LSH.load(str(tmp_path / 'sqlite_lsh'), storage=storage)
+        assert loaded._storage.name == (storage or 'sqlite')
+        assert loaded.query(1) == [4, 8]
+    # Models saved over others in the same directory ignore their files.
+    LSH(minhash.signatures[:5], labels[:5], storage='array').save(str(tmp_path / 'resaved'))
+    assert LSH.load(str(tmp_path / 'resaved'), storage='sqlite').contains() == labels[:5]
+    assert not (tmp_path / 'resaved' / 'buckets.sqlite').exists()
+    array_lsh.save(str(tmp_path / 'resaved'))
+    assert LSH.load(str(tmp_path / 'resaved'), storage='sqlite').contains() == labels
+    sqlite_lsh.save(str(tmp_path / 'resaved'))
+    LSH(minhash.signatures[:5], labels[:5], storage='array').save(str(tmp_path / 'resaved'))
+    assert LSH.load(str(tmp_path / 'resaved'), storage='sqlite').contains() == labels[:5]
+    with pytest.raises(ValueError):
+        LSH(minhash, [(label,) for label in labels]).save(str(tmp_path / 'tuples'))
+    with pytest.raises(ValueError):
+        LSH(minhash, [(label,) for label in labels], storage='sqlite')
+    empty = LSH()
+    empty.save(str(tmp_path / 'empty'))
+    assert LSH.load(str(tmp_path / 'empty')).contains() == []
+
+
+def test_lsh_merge():
+    lsh = LSH(minhash, labels)
+    first = LSH(MinHash(content[:4], seed=seed), labels[:4])
+    second = LSH(MinHash(content[4:], seed=seed), labels[4:], storage='array')
+    first.merge(second)
+    assert first.contains() == labels
+    assert first.edge_list(jaccard_weighted=True) == lsh.edge_list(jaccard_weighted=True)
+    merged = LSH.merge_many(
+        [LSH(MinHash(content[i:i + 3], seed=seed), labels[i:i + 3]) for i in range(0, 9, 3)],
+        storage='array'
+    )
+    assert merged.contains() == labels
+    assert merged.no_of_bands == 50
+    assert merged.fingerprint == minhash.fingerprint
+    assert merged.adjacency_list() == lsh.adjacency_list()
+    merged.merge(LSH())
+    assert merged.contains() == labels
+    with pytest.raises(ValueError):
+        merged.merge(LSH(MinHash(content[:1], seed=seed), [1]))
+    with pytest.raises(ValueError):
+        merged.merge(LSH(MinHash(content[:1], seed=seed), [10], no_of_bands=20))
+    with pytest.raises(ValueError):
+        merged.merge(LSH(MinHash(content[:1]), [10]))
+
+
+def test_lsh_query_topk(tmp_path):
+    lsh = LSH(minhash, labels, store_signatures=True)
+    assert lsh.query_topk(1, k=2) == [(4, 0.69), (8, 0.69)]
+    assert lsh.query_topk(1, k=1) == [(4, 0.69)]
+    assert lsh.query_topk(3) == [(5, 0.81)]
+    assert lsh.query_topk(1, max_candidates=1) == [(4, 0.69)]
+    assert lsh.query_topk(9) == []
+    assert lsh.query_topk(minhash.signatures[0], k=2) == [(1, 1.0), (4, 0.69)]
+    lsh.remove(4)
+    assert lsh.query_topk(1) == [(8, 0.69)]
+    lsh.save(str(tmp_path / 'lsh'))
+    loaded = LSH.load(str(tmp_path / 'lsh'))
+    assert loaded.query_topk(1) == [(8, 0.69)]
+    loaded.update(MinHash(content[3:4], seed=seed), [4])
+    assert loaded.query_topk(1, k=2) == [(4, 0.69), (8, 0.69)]
+    with pytest.raises(KeyError):
+        lsh.query_topk(4)
+    with pytest.raises(ValueError):
+        lsh.query_topk(minhash.signatures[0, :50])
+    with pytest.raises(ValueError):
+        LSH(minhash, labels).query_topk(1)
+    with pytest.raises(ValueError):
+        lsh.merge(LSH(MinHash(content[3:4], seed=seed), [4]))
+    merged = LSH.merge_many([
+        LSH(MinHash(content[i:i + 3], seed=seed), labels[i:i + 3], store_signatures=True)
+        for i in range(0, 9, 3)
+    ])
+    assert merged.query_topk(1, k=2) == [(4, 0.69), (8, 0.69)]
+    # Rows of removed signatures are reclaimed.
+    for label in labels[:6]:
+        merged.remove(label)
+    assert merged._signatures._size == 4
+    assert np.array_equal(merged._signatures.get([7, 8, 9]), minhash.signatures[6:])
+
+
+def test_lsh_signature_verification():
+    lsh = LSH(minhash, labels, store_signatures=True)
+    assert lsh.query(1, min_jaccard=0.6) == [4, 8]
+    assert lsh.query(3, min_jaccard=0.85) == []
+    assert lsh.adjacency_list(min_jaccard=0.6)[1] == [4, 8]
+    assert lsh.edge_list(jaccard_weighted=True) == [
+        (8, 1, 0.69), (8, 4, 0.46), (5, 3, 0.81), (4, 1, 0.69)
+    ]
+    assert lsh.edge_list(min_jaccard=0.7) == [(5, 3)]
+    assert lsh.edge_arrays(sensitivity=24)[2].tolist() == [0.81, 0.69]
+    assert lsh.query_signatures(minhash.signatures[:3], min_jaccard=0.7) == [
+        [1], [2], [3, 5]
+    ]
+    # Chance collisions of b-bit signatures are corrected for.
+    b_bit_lsh = LSH(MinHash(content, seed=seed, b_bits=8), labels, store_signatures=True)
+    weights = b_bit_lsh.edge_arrays()[2]
+    assert np.all(weights < lsh.edge_arrays()[2])
+    assert np.allclose(weights, lsh.edge_arrays()[2], atol=0.005)
+
+
+def test_lsh_max_bucket_size(tmp_path):
+    boilerplate = MinHash(['a b c d e f g h'] * 6, seed=seed)
+    for storage in ['dict', 'array', 'sqlite']:
+        lsh = LSH(boilerplate, [1, 2, 3, 4, 5, 6], max_bucket_size=3, storage=storage)
+        assert lsh.query(1) == [2, 3]
+        assert lsh.query(6) == [1, 2, 3]
+        assert len(lsh.capped_buckets) == 50
+        assert set(lsh.capped_buckets.values()) == {6}
+        assert lsh.edge_list() == [(3, 1), (3, 2), (2, 1)]
+        lsh.update(MinHash(['a b c d e f g h'], seed=seed), [7])
+        assert lsh.query(7) == [1, 2, 3]
+        assert set(lsh.capped_buckets.values()) == {7}
+        lsh.save(str(tmp_path / storage))
+        loaded = LSH.load(str(tmp_path / storage))
+        assert loaded.max_bucket_size == 3
+        assert loaded.capped_buckets == lsh.capped_buckets
+        assert loaded.query(7) == [1, 2, 3]
+        sample_lsh = LSH(
+            boilerplate, [1, 2, 3, 4, 5, 6], max_bucket_size=3,
+            bucket_policy='sample', storage=storage
+        )
+        assert all(
+            sample_lsh._storage.bucket_size(bucket_id) == 3
+            for bucket_id in sample_lsh.capped_buckets
+        )
+        skip_lsh = LSH(
+            boilerplate, [1, 2, 3, 4, 5, 6], max_bucket_size=3,
+            bucket_policy='skip', storage=storage
+        )
+        assert skip_lsh.query(1) == []
+        assert skip_lsh.edge_list() == []
+        assert skip_lsh.query_signatures(boilerplate.signatures[:1]) == [[]]
+    merged = LSH.merge_many([lsh, LSH()])
+    assert merged.max_bucket_size == 3
+    assert merged.query(1) == [2, 3]
+    for policy, sizes in [('stop', {3}), ('sample', {3}), ('skip', {0})]:
+        merged = LSH.merge_many([
+            LSH(boilerplate, labels, max_bucket_size=3, bucket_policy=policy)
+            for labels in [[1, 2, 3, 4, 5, 6], [7, 8, 9, 10, 11, 12]]
+        ])
+        assert set(merged.capped_buckets.values()) == {12}
+        assert {
+            merged._storage.bucket_size(bucket_id)
+            for bucket_id in merged.capped_buckets
+        } == sizes
+    assert merged.query(1) == []
+    # Buckets below the limit are unaffected.
+    capped_lsh = LSH(minhash, labels, max_bucket_size=3)
+    assert capped_lsh.capped_buckets == {}
+    assert capped_lsh.edge_list() == LSH(minhash, labels).edge_list()
+    with pytest.raises(ValueError):
+        LSH(max_bucket_size=0)
+    with pytest.raises(ValueError):
+        LSH(bucket_policy='drop')
@@ -1,5 +1,9 @@
 import pytest
-from snapy import MinHash
+import pickle
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from snapy import MinHash, MinHasher
+from snapy.minhash import SIGNATURE_128_DTYPE
 import numpy as np
 
 seed = 3
@@ -30,6 +34,12 @@ def test_minhash_defaults():
     assert minhash._hash_seeds.shape[0] == 100
 
 
+def signature_value(value):
+    if value.dtype.names:
+        return (int(value['high']) << 64) | int(value['low'])
+    return int(value)
+
+
 def multi_hash_tests(first_hash, second_hash, hash_size):
     minhash = MinHash(
         content, hash_bits=hash_size, seed=seed
@@ -39,22 +49,22 @@ def multi_hash_tests(first_hash, second_hash, hash_size):
     assert type(minhash.signatures) is np.ndarray
     assert minhash.signatures.shape == (9, 100)
     signature = minhash.signatures
-    assert signature[0][0] == first_hash
-    assert signature[-1][-1] == second_hash
+    assert signature_value(signature[0][0]) == first_hash
+    assert signature_value(signature[-1][-1]) == second_hash
 
 
 def test_multi_minhash_64():
     multi_hash_tests(
-        -9050934246571064385,
-        -9214867028879031438,
+        181743256525371623,
+        234705223605040442,
         64
     )
 
 
 def test_multi_minhash_32():
     multi_hash_tests(
-        -2146652248,
-        -2083408229,
+        14514348,
+        37334884,
         32
     )
 
@@ -80,8 +90,8 @@ def k_smallest_hash_tests(first_hash, second_hash, hash_size):
     assert type(minhash.signatures) is np.ndarray
     assert minhash.signatures.shape == (9, 53)
     signature = minhash.signatures
-    assert signature[0][0] == first_hash
-    assert signature[-1][-1] == second_hash
+    assert signature_value(signature[0][0]) == first_hash
+    assert signature_value(signature[-1][-1]) == second_hash
     with pytest.raises(ValueError):
         MinHash(
             content,
@@ -94,16 +104,16 @@ def k_smallest_hash_tests(first_hash, second_hash, hash_size):
 
 def test_k_minhash_64():
     k_smallest_hash_tests(
-        -9050934246571064385,
-        5299643506028682639,
+        181743256525371623,
+        12743381480157501438,
         64
     )
 
 
 def test_k_minhash_32():
     k_smallest_hash_tests(
-        -2146652248,
-        1112636791,
+        14514348,
+        3043356004,
         32
     )
 
@@ -117,14 +127,14 @@ def test_k_minhash_128():
 
 
 def test_terms_minhash():
-    minhash = MinHash(content, n_gram_type='term')
+    minhash = MinHash(content, n_gram_type='term', seed=seed)
     assert minhash.n_gram_type == 'term'
     assert type(minhash.signatures) is np.ndarray
     signature = minhash.signatures
     assert signature.shape == (9, 100)
-    assert signature[0][0] == -3695830800917301951
-    assert np.array(signature[0][0]).dtype == 'int64'
-    assert signature[-1][-1] == -7737361925742332862
+    assert signature[0][0] == 3270751646789170846
+    assert np.array(signature[0][0]).dtype == 'uint64'
+    assert signature[-1][-1] == 165630562043807813
 
 
 def test_string_input_minhash():
@@ -133,6 +143,231 @@ def test_string_input_minhash():
     assert minhash.signatures.shape == (1, 100)
 
 
+def universal_hash_tests(first_hash, second_hash, hash_size, dtype):
+    minhash = MinHash(
+        content, hash_bits=hash_size, method='universal_hash', seed=seed
+    )
+    assert minhash.method == 'universal_hash'
+    assert minhash._permutation_a.shape == (100,)
+    assert minhash._permutation_b.shape == (100,)
+    assert type(minhash.signatures) is np.ndarray
+    assert minhash.signatures.shape == (9, 100)
+    assert minhash.signatures.dtype == dtype
+    signature = minhash.signatures
+    assert signature[0][0] == first_hash
+    assert signature[-1][-1] == second_hash
+
+
+def test_universal_minhash_64():
+    universal_hash_tests(
+        1328728482732708,
+        1517731173097671,
+        64,
+        np.uint64
+    )
+
+
+def test_universal_minhash_32():
+    universal_hash_tests(
+        3040303780,
+        1399840967,
+        32,
+        np.uint32
+    )
+
+
+def test_universal_minhash_jaccard():
+    minhash = MinHash(
+        [content[0], content[3]], permutations=500, method='universal_hash', seed=seed
+    )
+    shingles = [
+        {text[char:char + 9] for char in range(len(text) - 8)}
+        for text in [content[0], content[3]]
+    ]
+    jaccard = len(shingles[0] & shingles[1]) / len(shingles[0] | shingles[1])
+    estimate = np.mean(minhash.signatures[0] == minhash.signatures[1])
+    assert abs(jaccard - estimate) < 0.1
+
+
+def one_permutation_tests(first_hash, second_hash, hash_size, dtype):
+    minhash = MinHash(
+        content, hash_bits=hash_size, method='one_permutation', seed=seed
+    )
+    assert minhash.method == 'one_permutation'
+    assert minhash.signatures.shape == (9, 100)
+    assert minhash.signatures.dtype == dtype
+    signature = minhash.signatures
+    assert signature[0][0] == first_hash
+    assert signature[-1][-1] == second_hash
+
+
+def test_one_permutation_minhash_64():
+    one_permutation_tests(
+        181743256525371623,
+        18437222613432595248,
+        64,
+        np.uint64
+    )
+
+
+def test_one_permutation_minhash_32():
+    one_permutation_tests(
+        1703180519,
+        1181938480,
+        32,
+        np.uint32
+    )
+
+
+def test_one_permutation_short_texts():
+    short_content = ['Jupiter is a planet', 'Jupiter is a planet!']
+    minhash = MinHash(
+        short_content, permutations=200, method='one_permutation', seed=seed
+    )
+    assert minhash.signatures.shape == (2, 200)
+    # Densification copies hashes from the same bins for identical shingles.
+    assert np.mean(minhash.signatures[0] == minhash.signatures[1]) > 0.7
+    single_shingle = MinHash('Jupiter', n_gram=7, method='one_permutation', seed=seed)
+    assert len(set(single_shingle.signatures[0])) == 1
+
+
+def test_rolling_hash_minhash():
+    minhash = MinHash(content, method='universal_hash', rolling_hash=True, seed=seed)
+    assert minhash.rolling_hash
+    assert minhash.signatures.shape == (9, 100)
+    assert minhash.signatures[0][0] == 23280133228810786
+    assert minhash.signatures[-1][-1] == 2730575074172125
+    terms_minhash = MinHash(
+        content,
+        n_gram=2,
+        n_gram_type='term',
+        method='universal_hash',
+        rolling_hash=True,
+        seed=seed
+    )
+    assert terms_minhash.signatures[0][0] == 1914711738708942
+    assert terms_minhash.signatures[-1][-1] == 294574686058727921
+    # Near duplicate texts share more minimum hashes than unrelated texts.
+    for method in ['universal_hash', 'one_permutation']:
+        signatures = MinHash(
+            content, method=method, rolling_hash=True, seed=seed
+        ).signatures
+        assert np.mean(signatures[0] == signatures[3]) > 0.3
+        assert np.mean(signatures[0] == signatures[1]) < 0.1
+    with pytest.raises(ValueError):
+        MinHash(content, n_gram=200, method='universal_hash', rolling_hash=True)
+
+
+def test_parallel_minhash():
+    for method in ['multi_hash', 'universal_hash']:
+        minhash = MinHash(content, method=method, seed=seed)
+        parallel_minhash = MinHash(content, method=method, seed=seed, n_jobs=2)
+        assert parallel_minhash.n_jobs == 2
+        assert parallel_minhash.signatures.dtype == minhash.signatures.dtype
+        assert np.array_equal(parallel_minhash.signatures, minhash.signatures)
+        generator_minhash = MinHash(
+            (text for text in content), method=method, seed=seed, n_jobs=2
+        )
+        assert np.array_equal(generator_minhash.signatures, minhash.signatures)
+
+
+def test_signature_dtypes():
+    for hash_size, dtype in [(32, np.uint32), (64, np.uint64), (128, SIGNATURE_128_DTYPE)]:
+        minhash = MinHash(content, hash_bits=hash_size, seed=seed)
+        assert minhash.signatures.dtype == dtype
+        assert minhash.signatures.nbytes == 9 * 100 * hash_size // 8
+        parallel_minhash = MinHash(content, hash_bits=hash_size, seed=seed, n_jobs=2)
+        assert np.array_equal(parallel_minhash.signatures, minhash.signatures)
+
+
+def test_b_bit_minhash():
+    minhash = MinHash(content, seed=seed)
+    for b_bits, dtype in [(1, np.uint8), (8, np.uint8), (16, np.uint16), (32, np.uint32)]:
+        b_bit_minhash = MinHash(content, seed=seed, b_bits=b_bits)
+        assert b_bit_minhash.b_bits == b_bits
+        assert b_bit_minhash.signatures.dtype == dtype
+        assert np.array_equal(
+            b_bit_minhash.signatures,
+            minhash.signatures & np.uint64((1 << b_bits) - 1)
+        )
+    minhash = MinHash(content, hash_bits=128, seed=seed, b_bits=64)
+    assert minhash.signatures.dtype == np.uint64
+    assert signature_value(minhash.signatures[0][0]) == (
+        6975552809044285838442055830789296621 & 0xFFFFFFFFFFFFFFFF
+    )
+
+
+def test_iter_signatures():
+    minhash = MinHash(content, method='universal_hash', seed=seed)
+    hasher = MinHash(method='universal_hash', seed=seed)
+    assert hasher.signatures is None
+    blocks = list(hasher.iter_signatures(
+        (text for text in content), batch_size=4
+    ))
+    assert [block.shape for block in blocks] == [(4, 100), (4, 100), (1, 100)]
+    assert np.array_equal(np.concatenate(blocks), minhash.signatures)
+    with pytest.raises(ValueError):
+        list(hasher.iter_signatures(content, batch_size=0))
+
+
+def test_write_signatures(tmp_path):
+    minhash = MinHash(content, method='universal_hash', seed=seed)
+    hasher = MinHash(method='universal_hash', seed=seed)
+    path = str(tmp_path / 'signatures.npy')
+    signatures = hasher.write_signatures(iter(content), path, batch_size=2)
+    assert type(signatures) is np.memmap
+    assert signatures.dtype == np.uint64
+    assert np.array_equal(signatures, minhash.signatures)
+    assert np.array_equal(np.load(path), minhash.signatures)
+
+
+def test_minhasher():
+    random_state = np.random.get_state()
+    hasher = MinHasher(method='universal_hash', seed=seed)
+    assert np.array_equal(np.random.get_state()[1], random_state[1])
+    assert not hasattr(hasher, 'signatures')
+    minhash = MinHash(content, method='universal_hash', seed=seed)
+    assert np.array_equal(hasher.transform(content), minhash.signatures)
+    signature = hasher.transform_one(content[4])
+    assert signature.shape == (100,)
+    assert np.array_equal(signature, minhash.signatures[4])
+    assert hasher.get_params() == {
+        'n_gram': 9,
+        'n_gram_type': 'char',
+        'permutations': 100,
+        'hash_bits': 64,
+        'method': 'universal_hash',
+        'seed': 3,
+        'b_bits': None,
+        'rolling_hash': False
+    }
+    assert hasher.fingerprint == minhash.fingerprint
+    assert hasher.fingerprint != MinHasher(method='universal_hash', seed=4).fingerprint
+    assert hasher.fingerprint != MinHasher(method='universal_hash').fingerprint
+    loaded_hasher = pickle.loads(pickle.dumps(hasher))
+    assert loaded_hasher.fingerprint == hasher.fingerprint
+    assert np.array_equal(loaded_hasher.transform(content), minhash.signatures)
+    loaded_minhash = pickle.loads(pickle.dumps(minhash))
+    assert np.array_equal(loaded_minhash.signatures, minhash.signatures)
+
+
+def test_minhasher_threads():
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for method in ['multi_hash', 'universal_hash']:
+            hasher = MinHasher(method=method, permutations=20, seed=seed)
+            expected = [hasher.transform_one(text) for text in content]
+            with ThreadPoolExecutor(8) as executor:
+                signatures = list(executor.map(
+                    lambda i: hasher.transform([content[i % len(content)]])[0], range(200)
+                ))
+            for i, signature in enumerate(signatures):
+                assert np.array_equal(signature, expected[i % len(content)])
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
 def test_minhash_errors():
     with pytest.raises(ValueError):
         MinHash(content, n_gram_type='words')
@@ -140,5 +375,17 @@ def test_minhash_errors():
         MinHash(content, hash_bits=65)
     with pytest.raises(ValueError):
         MinHash(content, method='universal')
+    with pytest.raises(ValueError):
+        MinHash(content, method='universal_hash', hash_bits=128)
+    with pytest.raises(ValueError):
+        MinHash(content, method='one_permutation', hash_bits=128)
+    with pytest.raises(ValueError):
+        MinHash(content, rolling_hash=True)
+    with pytest.raises(ValueError):
+        MinHash(content, n_jobs=0)
+    with pytest.raises(ValueError):
+        MinHash(content, b_bits=0)
+    with pytest.raises(ValueError):
+        MinHash(content, hash_bits=32, b_bits=32)
     with pytest.raises(ValueError):
         MinHash(content, n_gram=63)
@@ -0,0 +1,95 @@
+import pytest
+from snapy import MinHash, LSH, ShardedLSH
+from snapy.sharded import LocalTransport
+
+seed = 3
+labels = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+content = [
+    'Jupiter is primarily composed of hydrogen with a quarter of its mass being helium',
+    'Jupiter moving out of the inner Solar System would have allowed the formation of inner planets.',
+    'A helium atom has about four times as much mass as a hydrogen atom, so the composition changes '
+    'when described as the proportion of mass contributed by different atoms.',
+    'Jupiter is primarily composed of hydrogen and a quarter of its mass being helium',
+    'A helium atom has about four times as much mass as a hydrogen atom and the composition changes '
+    'when described as a proportion of mass contributed by different atoms.',
+    'Theoretical models indicate that if Jupiter had much more mass than it does at present, it would shrink.',
+    'This process causes Jupiter to shrink by about 2 cm each year.',
+    'Jupiter is mostly composed of hydrogen with a quarter of its mass being helium',
+    'The Great Red Spot is large enough to accommodate Earth within its boundaries.'
+]
+
+minhash = MinHash(content, seed=3)
+
+
+def test_sharded_lsh_matches_lsh():
+    lsh = LSH(minhash, labels, no_of_bands=49)
+    with ShardedLSH(minhash, labels, no_of_bands=49, n_jobs=3) as sharded_lsh:
+        assert sharded_lsh._band_ranges == [(0, 17), (17, 33), (33, 49)]
+        assert sharded_lsh.contains() == labels
+        for label in labels:
+            assert sharded_lsh.query(label) == lsh.query(label)
+            assert sharded_lsh.query(label, sensitivity=20) == lsh.query(
+                label, sensitivity=20
+            )
+            assert sharded_lsh.query(label, min_jaccard=0.5) == lsh.query(
+                label, min_jaccard=0.5
+            )
+        assert sharded_lsh.query_many(labels) == lsh.query_many(labels)
+        assert sharded_lsh.query_signatures(minhash) == lsh.query_signatures(minhash)
+        sharded_lsh.remove(4)
+        lsh.remove(4)
+        assert sharded_lsh.query_many(labels[:3]) == lsh.query_many(labels[:3])
+        with pytest.raises(KeyError):
+            sharded_lsh.remove(4)
+        with pytest.raises(KeyError):
+            sharded_lsh.query(4)
+
+
+def test_sharded_lsh_local_transport():
+    sharded_lsh = ShardedLSH(transport=LocalTransport, n_jobs=2, storage='array')
+    sharded_lsh.update(MinHash(content[:5], seed=seed), labels[:5])
+    sharded_lsh.update(MinHash(content[5:], seed=seed), labels[5:])
+    assert sharded_lsh.no_of_bands == 50
+    assert sharded_lsh.query(1) == [4, 8]
+    assert sharded_lsh.query(3, min_jaccard=0.6) == [5]
+    sharded_lsh.close()
+    matrix_lsh = ShardedLSH(transport=LocalTransport, n_jobs=2)
+    matrix_lsh.update(minhash.signatures, labels)
+    assert matrix_lsh.query(1) == [4, 8]
+    matrix_lsh.close()
+
+
+class FailingTransport(LocalTransport):
+
+    def map(self, method, args):
+        if method == 'add' and len(args[0][0]) == 1:
+            getattr(self._shards[0], method)(*args[0])
+            raise MemoryError
+        return super().map(method, args)
+
+
+def test_sharded_lsh_rollback():
+    with ShardedLSH(
+            MinHash(content[:8], seed=seed), labels[:8], n_jobs=2, transport=FailingTransport
+    ) as sharded_lsh:
+        with pytest.raises(MemoryError):
+            sharded_lsh.update(MinHash(content[8:], seed=seed), labels[8:])
+        assert sharded_lsh.contains() == labels[:8]
+        assert all(9 not in shard._storage for shard in sharded_lsh._transport._shards)
+        assert sharded_lsh.query(1) == [4, 8]
+
+
+def test_sharded_lsh_errors():
+    with pytest.raises(ValueError):
+        ShardedLSH(n_jobs=0)
+    with pytest.raises(ValueError):
+        ShardedLSH(transport='socket')
+    with ShardedLSH(minhash, labels, transport='local') as sharded_lsh:
+        with pytest.raises(ValueError):
+            sharded_lsh.update(MinHash(content[:1], seed=seed), [1])
+        with pytest.raises(ValueError):
+            sharded_lsh.update(MinHash(content[:1]), [10])
+        with pytest.raises(ValueError):
+            sharded_lsh.query(1, sensitivity=51)
+    with pytest.raises(ValueError):
+        ShardedLSH(minhash, labels, no_of_bands=2, n_jobs=3, transport='local')
@@ -0,0 +1,79 @@
+import pickle
+import time
+import pytest
+from snapy import MinHash, MinHasher, LSH, Stats
+
+seed = 3
+content = [
+    'Jupiter is primarily composed of hydrogen with a quarter of its mass being helium',
+    'Jupiter is primarily composed of hydrogen and a quarter of its mass being helium',
+    'The Great Red Spot is large enough to accommodate Earth within its boundaries.'
+]
+labels = [1, 2, 3]
+
+
+def test_stats_timer():
+    events = []
+    stats = Stats(callback=lambda *event: events.append(event))
+    start = time.perf_counter()
+    with stats.timer('outer'):
+        time.sleep(0.01)
+        with stats.timer('inner'):
+            time.sleep(0.02)
+        for _ in stats.iter_timed('items', range(3)):
+            pass
+    elapsed = time.perf_counter() - start
+    assert stats.timings['inner'] >= 0.02
+    assert stats.timings['outer'] >= 0.01
+    # Nested stages are excluded from the enclosing stage, so timings sum to at
+    # most the time spent.
+    assert sum(stats.timings.values()) <= elapsed
+    assert stats.calls == {'inner': 1, 'items': 1, 'outer': 1}
+    assert [event[0] for event in events] == ['inner', 'items', 'outer']
+    assert all(event[2] == 'timing' for event in events)
+    stats.increment('candidates', 5)
+    stats.increment('candidates')
+    stats.gauge('memory', 10)
+    assert events[-2:] == [('candidates', 1, 'counter'), ('memory', 10, 'gauge')]
+    summary = stats.summary()
+    assert summary['counters'] == {'candidates': 6}
+    assert summary['gauges'] == {'memory': 10}
+    stats.reset()
+    assert stats.summary() == {'timings': {}, 'calls': {}, 'counters': {}, 'gauges': {}}
+
+
+def test_minhash_stats():
+    stats = Stats()
+    minhash = MinHash(content, seed=seed, stats=stats)
+    assert set(stats.timings) == {'minhash.init', 'minhash.shingle', 'minhash.hash'}
+    assert (minhash.signatures == MinHash(content, seed=seed).signatures).all()
+    hasher = MinHasher(seed=seed, stats=stats)
+    hasher.transform_one(content[0])
+    assert stats.calls['minhash.hash'] == 2
+    assert pickle.loads(pickle.dumps(hasher)).stats is None
+
+
+@pytest.mark.parametrize('storage', ['dict', 'array'])
+def test_lsh_stats(storage):
+    stats = Stats()
+    minhash = MinHash(content, seed=seed)
+    lsh = LSH(minhash, labels, storage=storage, stats=stats, store_signatures=True)
+    assert set(stats.timings) == {
+        'lsh.band_hash', 'lsh.storage_add', 'lsh.cap_buckets', 'lsh.signatures_add'
+    }
+    assert lsh.query(1) == [2]
+    assert lsh.query(3) == []
+    assert lsh.query_signatures(minhash.signatures[:1], min_jaccard=0.5) == [[1, 2]]
+    assert stats.counters == {
+        'lsh.queries': 3, 'lsh.candidates_examined': 3, 'lsh.candidates_returned': 3
+    }
+    assert stats.calls['lsh.bucket_fanout'] == stats.calls['lsh.filter'] == 3
+    histogram = lsh.bucket_size_histogram()
+    assert histogram == {1: 102, 2: 24}
+    assert stats.gauges['lsh.bucket_size.2'] == 24
+    usage = lsh.memory_usage()
+    assert usage['buckets'] > 0
+    assert usage['signatures'] >= minhash.signatures.nbytes
+    assert stats.gauges['lsh.memory.buckets'] == usage['buckets']
+    assert LSH().bucket_size_histogram() == {}
+    assert LSH(minhash, labels).memory_usage()['signatures'] == 0
@@ -0,0 +1,116 @@
+import numpy as np
+from snapy.storage import DictStorage, ArrayStorage, SQLiteStorage
+
+labels = ['a', 'b', 'c', 'd']
+bucket_ids = np.array([
+    [1, 10],
+    [2, 10],
+    [1, 11],
+    [3, 12]
+], dtype=np.uint64)
+
+
+def test_dict_storage():
+    storage = DictStorage()
+    storage.add(labels, bucket_ids)
+    assert len(storage) == 4
+    assert 'a' in storage
+    assert storage.labels() == labels
+    assert storage.bucket_ids('c') == [1, 11]
+    assert storage.bucket_ids('e') is None
+    assert list(storage.bucket(10)) == ['a', 'b']
+    assert list(storage.bucket(99)) == []
+    storage.remove('a')
+    assert list(storage.bucket(1)) == ['c']
+    storage.remove('b')
+    assert 10 not in storage._buckets
+    assert 'a' not in storage
+
+
+def test_array_storage_delta():
+    storage = ArrayStorage()
+    storage.add(labels[:2], bucket_ids[:2])
+    storage.add(labels[2:], bucket_ids[2:])
+    assert len(storage._postings) == 0
+    assert len(storage) == 4
+    assert storage.labels() == labels
+    assert storage.bucket_ids('c') == [1, 11]
+    assert storage.bucket_ids('e') is None
+    assert storage.bucket(1) == ['a', 'c']
+    assert storage.bucket(99) == []
+    assert storage.bucket_ids_many(['c', 'e', 'a']) == [[1, 11], None, [1, 10]]
+
+
+def test_array_storage_compaction():
+    storage = ArrayStorage(merge_threshold=4)
+    storage.add(labels[:2], bucket_ids[:2])
+    assert storage._bucket_keys.tolist() == [1, 2, 10]
+    assert storage._offsets.tolist() == [0, 1, 2, 4]
+    assert storage._postings.tolist() == [0, 1, 0, 1]
+    storage.add(labels[2:3], bucket_ids[2:3])
+    assert storage._delta_size == 2
+    assert storage.bucket(1) == ['a', 'c']
+    storage.add(labels[3:], bucket_ids[3:])
+    assert storage._delta_size == 0
+    assert storage.bucket(10) == ['a', 'b']
+    storage.remove('b')
+    assert storage.bucket(10) == ['a']
+    assert storage._dead == 2
+    storage.remove('a')
+    assert storage._dead == 4
+    storage.compact()
+    # Remaining labels are renumbered, reclaiming the rows of removed labels.
+    assert storage._postings.tolist() == [0, 1, 0, 1]
+    assert len(storage._bucket_ids) == 2
+    assert storage._ids == {'c': 0, 'd': 1}
+    assert storage.labels() == ['c', 'd']
+    assert storage.bucket(1) == ['c']
+    assert storage.bucket(10) == []
+    storage.add(labels[:1], bucket_ids[:1])
+    assert storage.bucket(1) == ['c', 'a']
+    assert storage.bucket_ids('a') == [1, 10]
+
+
+def test_array_storage_churn():
+    storage = ArrayStorage(merge_threshold=8)
+    for i in range(1000):
+        storage.add([i], bucket_ids[i % 4:i % 4 + 1])
+        if i >= 4:
+            storage.remove(i - 4)
+    assert storage.labels() == [996, 997, 998, 999]
+    assert storage.bucket(10) == [996, 997]
+    assert storage._size < 20
+
+
+def test_sqlite_storage(tmp_path):
+    storage = SQLiteStorage(cache_size=2)
+    storage.add(labels[:2], bucket_ids[:2])
+    storage.add(labels[2:], bucket_ids[2:])
+    assert len(storage) == 4
+    assert 'a' in storage
+    assert storage.labels() == labels
+    assert storage.bucket_ids('c') == [1, 11]
+    assert storage.bucket_ids('e') is None
+    assert list(storage.bucket(1)) == ['a', 'c']
+    assert list(storage.bucket(99)) == []
+    assert dict(storage.bucket_counts([1, 10, 11])) == {'a': 2, 'c': 2, 'b': 1}
+    assert len(storage._cache) == 2
+    assert storage.bucket_ids_many(['c', 'e', 'a']) == [[1, 11], None, [1, 10]]
+    counts = storage.bucket_counts_many([[1, 10], [3]])
+    assert [dict(count) for count in counts] == [{'a': 2, 'b': 1, 'c': 1}, {'d': 1}]
+    assert sorted(storage.bucket_sizes().tolist()) == [1, 1, 1, 1, 2, 2]
+    _, offsets, postings = storage.postings()
+    assert offsets.tolist() == [0, 2, 3, 4, 6, 7, 8]
+    assert postings.tolist() == [0, 2, 1, 3, 0, 1, 2, 3]
+    storage.discard(10, ['b'])
+    assert list(storage.bucket(10)) == ['a']
+    assert storage.label_bucket_ids()[2][1].tolist() == [True, False]
+    storage.remove('a')
+    assert list(storage.bucket(1)) == ['c']
+    assert list(storage.bucket(10)) == []
+    storage.save(str(tmp_path))
+    storage.close()
+    loaded = SQLiteStorage.load(str(tmp_path))
+    assert loaded.labels() == ['b', 'c', 'd']
+    loaded.add(['e'], bucket_ids[:1])
+    assert list(loaded.bucket(1)) == ['c', 'e']
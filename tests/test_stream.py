@@ -0,0 +1,43 @@
+import pytest
+from snapy import MinHasher, LSH
+from snapy.stream import dedupe
+
+seed = 3
+content = [
+    'Jupiter is primarily composed of hydrogen with a quarter of its mass being helium',
+    'Jupiter moving out of the inner Solar System would have allowed the formation of inner planets.',
+    'A helium atom has about four times as much mass as a hydrogen atom, so the composition changes '
+    'when described as the proportion of mass contributed by different atoms.',
+    'Jupiter is primarily composed of hydrogen and a quarter of its mass being helium',
+    'A helium atom has about four times as much mass as a hydrogen atom and the composition changes '
+    'when described as a proportion of mass contributed by different atoms.',
+    'Theoretical models indicate that if Jupiter had much more mass than it does at present, it would shrink.',
+    'This process causes Jupiter to shrink by about 2 cm each year.',
+    'Jupiter is mostly composed of hydrogen with a quarter of its mass being helium',
+    'The Great Red Spot is large enough to accommodate Earth within its boundaries.'
+]
+documents = list(zip(range(1, 10), content))
+
+
+def test_dedupe():
+    minhasher = MinHasher(seed=seed)
+    lsh = LSH()
+    decisions = list(dedupe(documents, minhasher, lsh, batch_size=4))
+    assert decisions == [
+        (1, True, None), (2, True, None), (3, True, None), (4, False, 1),
+        (5, False, 3), (6, True, None), (7, True, None), (8, False, 1),
+        (9, True, None)
+    ]
+    assert lsh.contains() == [1, 2, 3, 6, 7, 9]
+    assert lsh.fingerprint == minhasher.fingerprint
+    # Texts already in the model are flagged on later passes.
+    assert list(dedupe([(10, content[0])], minhasher, lsh)) == [(10, False, 1)]
+    with pytest.raises(ValueError):
+        list(dedupe([(11, content[0])], MinHasher(seed=1), lsh))
+
+
+def test_dedupe_min_jaccard():
+    lsh = LSH(store_signatures=True)
+    decisions = list(dedupe(documents, MinHasher(seed=seed), lsh, min_jaccard=0.75))
+    assert [label for label, keep, _ in decisions if not keep] == [5]
+    assert len(lsh.contains()) == 8